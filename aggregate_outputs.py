@@ -0,0 +1,374 @@
+import csv
+import math
+import datetime
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import h5py
+
+import gprmax_outputs
+import scenario_plan
+from logger_setup import setup_logger
+
+
+# ! Aggregation settings
+
+# * Model whose scenarios are aggregated, one of the keys of
+# * `scenario_plan.SCENARIOS_FOLDER_NAMES`
+model = "straight_pipe"
+scenarios_folder_name = scenario_plan.SCENARIOS_FOLDER_NAMES[model]
+aggregate_table_filename = "aggregate_table.csv"
+
+# * Scenarios are grouped by these sweep parameters, see the
+# * `MODELS[...]['parameter_names']` of `generate_scenario_files.py`.
+# * Parameters left out are aggregated over, e.g. this groups the burial
+# * depths and pipe lengths together.
+group_by = ("fund_freq", "soil_name", "pipe_diameter", "soil_water_content")
+aggregate_components = ("Ez",)
+
+# * Traces are read this many samples at a time, which bounds the memory of
+# * each worker regardless of the length of the simulation
+chunk_samples = 1 << 20
+
+# * Each worker process reads a batch of output files and returns the merged
+# * statistics of the batch. `None` uses one worker per core.
+max_workers = None
+files_per_batch = 16
+
+# ! Aggregation settings end
+
+
+def empty_stats() -> Dict[str, float]:
+    """Statistics of no values at all, the identity for `merge_stats`"""
+    return {
+        "count": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "min": math.inf,
+        "max": -math.inf,
+    }
+
+
+def add_value(stats: Dict[str, float], value: float) -> None:
+    """Adds one value to running statistics, in place"""
+    stats["count"] += 1
+    delta = value - stats["mean"]
+    stats["mean"] += delta / stats["count"]
+    stats["m2"] += delta * (value - stats["mean"])
+    stats["min"] = min(stats["min"], value)
+    stats["max"] = max(stats["max"], value)
+
+
+def merge_stats(
+    first: Dict[str, float], second: Dict[str, float]
+) -> Dict[str, float]:
+    """Combines the statistics of two disjoint sets of values
+
+    The mean and sum of squared deviations are combined with the pairwise
+    update of Chan et al., so partial results can be merged in any order
+    without losing precision.
+
+    Args:
+        first: Statistics from `empty_stats` and `add_value`
+        second: Statistics of another set of values
+
+    Returns:
+        A new `dict` with the statistics of both sets
+
+    Raises:
+        Nothing
+    """
+    count = first["count"] + second["count"]
+    if count == 0:
+        return empty_stats()
+
+    delta = second["mean"] - first["mean"]
+
+    return {
+        "count": count,
+        "mean": first["mean"] + delta * second["count"] / count,
+        "m2": (
+            first["m2"] + second["m2"] +
+            delta ** 2 * first["count"] * second["count"] / count
+        ),
+        "min": min(first["min"], second["min"]),
+        "max": max(first["max"], second["max"]),
+    }
+
+
+def trace_summary(
+    dataset: h5py.Dataset,
+    dt: float,
+    fund_freq: Optional[float] = None,
+    periods: int = 10,
+    chunk: int = chunk_samples,
+) -> Tuple[float, float]:
+    """Reads a receiver trace in chunks and summarises it
+
+    The level is the same as `gprmax_outputs.receiver_level_db` would give
+    for the whole trace, but only `chunk` samples are in memory at a time.
+
+    Args:
+        dataset: An `h5py` dataset with a single field component
+        dt: The time step of the simulation, in seconds
+        fund_freq: The frequency of the `contsine` excitation, in Hz
+        periods: How many periods at the end of the trace to average over
+        chunk: How many samples to read at a time
+
+    Returns:
+        A `tuple` with the steady-state level in dB and the peak absolute
+        value of the trace
+
+    Raises:
+        Nothing
+    """
+    length = dataset.shape[0]
+
+    if fund_freq is not None:
+        window = int(round(periods / (fund_freq * dt)))
+    else:
+        window = length // 4
+    window = int(np.clip(window, 1, max(length, 1)))
+    window_start = length - window
+
+    sum_squares = 0.0
+    peak = 0.0
+
+    for start in range(0, length, chunk):
+        values = np.asarray(
+            dataset[start:start + chunk], dtype=np.float64
+        )
+        peak = max(peak, float(np.max(np.abs(values), initial=0.0)))
+
+        tail = values[max(window_start - start, 0):]
+        sum_squares += float(np.sum(np.square(tail)))
+
+    rms = math.sqrt(sum_squares / window) if length else 0.0
+
+    return (
+        float(20 * np.log10(np.maximum(rms, np.finfo(np.float64).tiny))),
+        peak,
+    )
+
+
+def aggregate_batch(
+    batch: List[Tuple[str, Tuple, Optional[float]]],
+    components: Tuple[str, ...],
+    chunk: int,
+) -> Dict[Tuple, Dict[str, Dict[str, float]]]:
+    """Reads a batch of output files and merges their statistics
+
+    This runs in a worker process, so it only takes and returns plain,
+    picklable values.
+
+    Args:
+        batch: A `list` of `(output path, group key, fund_freq)` tuples
+        components: The field components to aggregate, e.g. `("Ez",)`
+        chunk: How many samples to read at a time
+
+    Returns:
+        A `dict` keyed by `(group key, receiver, component)`, where each
+        value holds the `level_db` and `peak` statistics of the batch
+
+    Raises:
+        Nothing
+    """
+    partials = {}
+
+    for output_path, group_key, fund_freq in batch:
+        with h5py.File(output_path, "r") as output_file:
+            dt = float(output_file.attrs["dt"])
+
+            for rx_group_name in sorted(
+                output_file.get("rxs", {}),
+                key=gprmax_outputs.natural_sort_key
+            ):
+                rx_group = output_file["rxs"][rx_group_name]
+
+                for component in components:
+                    if component not in rx_group:
+                        continue
+
+                    level_db, peak = trace_summary(
+                        rx_group[component], dt, fund_freq, chunk=chunk
+                    )
+
+                    stats = partials.setdefault(
+                        (group_key, rx_group_name, component),
+                        {"level_db": empty_stats(), "peak": empty_stats()},
+                    )
+                    add_value(stats["level_db"], level_db)
+                    add_value(stats["peak"], peak)
+
+    return partials
+
+
+def group_key(entry: Optional[Dict], parameters: Tuple[str, ...]) -> Tuple:
+    """Picks the values of the grouping parameters from a plan entry
+
+    Scenarios missing from the plan all fall into one group of `None`s.
+    """
+    if entry is None:
+        return tuple(None for _ in parameters)
+
+    return tuple(entry["parameters"][name] for name in parameters)
+
+
+def aggregate_outputs(
+    output_files: List[Path],
+    plan: Dict[str, Dict],
+    parameters: Tuple[str, ...],
+    components: Tuple[str, ...],
+    workers: Optional[int] = None,
+    batch_size: int = 16,
+    chunk: int = chunk_samples,
+) -> Dict[Tuple, Dict[str, Dict[str, float]]]:
+    """Aggregates receiver statistics across many outputs in parallel
+
+    The files are split into batches, each batch is read by a worker
+    process, and the partial statistics returned by the workers are merged
+    as they complete.
+
+    Args:
+        output_files: The gprMax `.out` files to aggregate
+        plan: The scenario plan, see `scenario_plan.py`
+        parameters: The sweep parameters to group by
+        components: The field components to aggregate
+        workers: The number of worker processes, `None` for one per core
+        batch_size: How many files each worker reads per batch
+        chunk: How many samples to read at a time
+
+    Returns:
+        A `dict` with the same layout as `aggregate_batch`, covering all
+        the files
+
+    Raises:
+        Nothing
+    """
+    jobs = []
+    for output_file in output_files:
+        entry = plan.get(output_file.stem)
+        jobs.append(
+            (
+                str(output_file),
+                group_key(entry, parameters),
+                entry["fund_freq"] if entry is not None else None,
+            )
+        )
+
+    batches = [
+        jobs[start:start + batch_size]
+        for start in range(0, len(jobs), batch_size)
+    ]
+
+    totals = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(aggregate_batch, batch, components, chunk)
+            for batch in batches
+        ]
+
+        for future in as_completed(futures):
+            for key, stats in future.result().items():
+                if key not in totals:
+                    totals[key] = stats
+                    continue
+                totals[key] = {
+                    name: merge_stats(totals[key][name], value)
+                    for name, value in stats.items()
+                }
+
+    return totals
+
+
+def aggregate_rows(
+    totals: Dict[Tuple, Dict[str, Dict[str, float]]],
+    parameters: Tuple[str, ...],
+) -> List[Dict]:
+    """Flattens aggregated statistics into rows for the aggregate table"""
+    rows = []
+
+    for key in sorted(
+        totals,
+        key=lambda key: (
+            tuple(str(value) for value in key[0]),
+            gprmax_outputs.natural_sort_key(key[1]),
+            key[2],
+        )
+    ):
+        values, receiver, component = key
+        level, peak = totals[key]["level_db"], totals[key]["peak"]
+
+        row = dict(zip(parameters, values))
+        row.update(
+            {
+                "receiver": receiver,
+                "component": component,
+                "scenarios": level["count"],
+                "mean_level_db": level["mean"],
+                "std_level_db": (
+                    math.sqrt(level["m2"] / (level["count"] - 1))
+                    if level["count"] > 1 else 0.0
+                ),
+                "min_level_db": level["min"],
+                "max_level_db": level["max"],
+                "max_peak": peak["max"],
+            }
+        )
+        rows.append(row)
+
+    return rows
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    aggregate_logger = setup_logger(
+        "gprMax_output_aggregation", global_timestamp
+    )
+
+    scenarios_folder = Path.cwd() / scenarios_folder_name
+    plan = scenario_plan.load_plan(scenarios_folder)
+
+    output_files = sorted(scenarios_folder.glob("*.out"))
+    aggregate_logger.info(
+        "Aggregating %d outputs in %s by %s",
+        len(output_files), scenarios_folder, ", ".join(group_by)
+    )
+
+    missing = [
+        output_file.name for output_file in output_files
+        if output_file.stem not in plan
+    ]
+    if missing:
+        aggregate_logger.warning(
+            "%d outputs are not in the plan and are grouped together",
+            len(missing)
+        )
+
+    totals = aggregate_outputs(
+        output_files, plan, group_by, aggregate_components,
+        max_workers, files_per_batch, chunk_samples
+    )
+
+    rows = aggregate_rows(totals, group_by)
+
+    with open(aggregate_table_filename, "w", newline="") as table_file:
+        writer = csv.DictWriter(
+            table_file,
+            fieldnames=list(group_by) + [
+                "receiver", "component", "scenarios", "mean_level_db",
+                "std_level_db", "min_level_db", "max_level_db", "max_peak"
+            ],
+        )
+        writer.writeheader()
+        writer.writerows(rows)
+
+    aggregate_logger.info(
+        "Wrote %d groups to %s", len(rows), aggregate_table_filename
+    )
+
+    logging.shutdown()
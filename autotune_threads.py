@@ -0,0 +1,248 @@
+import os
+import time
+import socket
+import datetime
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import yaml
+
+import gprmax_jobs
+import grid_estimates
+import scenario_plan
+import generate_scenario_files as generator
+from logger_setup import setup_logger
+
+
+# ! Autotuner settings
+
+# * Model whose scenarios are benchmarked, one of the keys of
+# * `scenario_plan.SCENARIOS_FOLDER_NAMES`
+model = "straight_pipe"
+scenarios_folder_name = scenario_plan.SCENARIOS_FOLDER_NAMES[model]
+autotune_folder_name = "autotune"
+
+# * The runner reads the profile from this file
+thread_profile_filename = "thread_profile.yml"
+
+# * Each benchmark run is truncated to this many iterations, which is long
+# * enough to amortise start-up the same way a full run would
+autotune_iterations = 200
+
+# * One representative scenario per frequency is benchmarked, since the
+# * grid size mostly follows the frequency
+representatives_per_frequency = 1
+
+# ! Autotuner settings end
+
+
+def thread_combinations(cpu_count: int) -> List[Tuple[int, int]]:
+    """Lists the threads per run and concurrent runs to try on this host
+
+    Both are powers of two, plus the full core count, and their product
+    never exceeds the number of cores.
+
+    Args:
+        cpu_count: The number of cores of the host
+
+    Returns:
+        A `list` of `(threads, workers)` tuples
+
+    Raises:
+        Nothing
+    """
+    counts = sorted(
+        {2 ** power for power in range(cpu_count.bit_length())} | {cpu_count}
+    )
+
+    return [
+        (threads, workers)
+        for threads in counts
+        for workers in counts
+        if threads * workers <= cpu_count
+    ]
+
+
+def representative_entries(plan: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Picks median-sized scenarios of each frequency to benchmark
+
+    Args:
+        plan: The scenario plan, see `scenario_plan.py`
+
+    Returns:
+        A `dict` mapping scenario names to their plan entries
+
+    Raises:
+        Nothing
+    """
+    by_frequency = {}
+    for name, entry in plan.items():
+        by_frequency.setdefault(entry["fund_freq"], []).append((name, entry))
+
+    representatives = {}
+    for scenarios in by_frequency.values():
+        scenarios.sort(
+            key=lambda item: grid_estimates.cell_updates(item[1])
+        )
+        middle = len(scenarios) // 2
+        for name, entry in scenarios[
+            middle:middle + representatives_per_frequency
+        ]:
+            representatives[name] = entry
+
+    return representatives
+
+
+def write_truncated_inputs(
+    name: str, entry: Dict, copies: int, folder: Path
+) -> List[Path]:
+    """Writes copies of a scenario truncated to `autotune_iterations`
+
+    Args:
+        name: The scenario name
+        entry: The scenario plan entry
+        copies: How many identical copies to write, one per concurrent run
+        folder: A `Path` to the folder for the truncated inputs
+
+    Returns:
+        A `list` with the `Path` of every copy
+
+    Raises:
+        Nothing
+    """
+    sim_params = generator.entry_sim_params(entry)
+    sim_params.update(
+        {
+            "simulation_runtime": (
+                autotune_iterations * grid_estimates.time_step(entry)
+            ),
+            "output_geometry": False,
+            "output_snapshots": False,
+        }
+    )
+
+    extension = generator.INPUT_EXTENSIONS[entry["input_format"]]
+
+    input_files = []
+    for copy in range(copies):
+        input_file = folder / f"{name}_autotune_{copy}.{extension}"
+        input_file.write_text(
+            generator.render_scenario(sim_params, entry["input_format"])
+        )
+        input_files.append(input_file)
+
+    return input_files
+
+
+def benchmark(
+    input_files: List[Path], threads: int, cell_updates: float
+) -> float:
+    """Runs truncated inputs concurrently and measures the throughput
+
+    Args:
+        input_files: The truncated input files, all run at the same time
+        threads: The number of OpenMP threads of each run
+        cell_updates: Cells times iterations of a single truncated run
+
+    Returns:
+        The aggregate throughput, in cells per second, or 0 if any run
+        failed
+
+    Raises:
+        Nothing
+    """
+    start_time = time.perf_counter()
+
+    jobs = [
+        gprmax_jobs.launch_job(
+            input_file, threads, input_file.with_suffix(".log"),
+            write_processed=False
+        )
+        for input_file in input_files
+    ]
+    return_codes = [job.wait() for job in jobs]
+
+    elapsed = time.perf_counter() - start_time
+
+    if any(return_codes):
+        return 0.0
+
+    return len(input_files) * cell_updates / elapsed
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    autotune_logger = setup_logger("gprMax_thread_autotune", global_timestamp)
+
+    autotune_folder = Path.cwd() / autotune_folder_name
+    autotune_folder.mkdir(exist_ok=True)
+
+    cpu_count = os.cpu_count()
+    combinations = thread_combinations(cpu_count)
+    plan = scenario_plan.load_plan(Path.cwd() / scenarios_folder_name)
+
+    autotune_logger.info(
+        "Tuning %d thread and concurrency combinations on %d cores",
+        len(combinations), cpu_count
+    )
+
+    profiles = []
+
+    for name, entry in representative_entries(plan).items():
+        nx, ny, nz = grid_estimates.grid_cells(entry)
+        cells = nx * ny * nz
+        truncated_updates = float(cells) * autotune_iterations
+
+        results = []
+        for threads, workers in combinations:
+            input_files = write_truncated_inputs(
+                name, entry, workers, autotune_folder
+            )
+            cells_per_second = benchmark(
+                input_files, threads, truncated_updates
+            )
+            results.append(
+                {
+                    "threads": threads,
+                    "workers": workers,
+                    "cells_per_second": cells_per_second,
+                }
+            )
+            autotune_logger.info(
+                "%s, %d threads x %d runs: %.3e cells/s",
+                name, threads, workers, cells_per_second
+            )
+
+        best = max(results, key=lambda result: result["cells_per_second"])
+        profiles.append(
+            {
+                "scenario": name,
+                "fund_freq": entry["fund_freq"],
+                "cells": cells,
+                "threads": best["threads"],
+                "workers": best["workers"],
+                "cells_per_second": best["cells_per_second"],
+                "results": results,
+            }
+        )
+        autotune_logger.info(
+            "Best for %d cells: %d threads x %d runs",
+            cells, best["threads"], best["workers"]
+        )
+
+    with open(thread_profile_filename, "w") as profile_file:
+        yaml.safe_dump(
+            {
+                "host": socket.gethostname(),
+                "cpu_count": cpu_count,
+                "iterations": autotune_iterations,
+                "profiles": profiles,
+            },
+            profile_file,
+            sort_keys=False,
+        )
+
+    autotune_logger.info("Profile written to %s", thread_profile_filename)
+
+    logging.shutdown()
@@ -0,0 +1,335 @@
+import hashlib
+import datetime
+import logging
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+import yaml
+import numpy as np
+from scipy.constants import speed_of_light
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+import gprmax_outputs
+import scenario_plan
+from logger_setup import setup_logger
+
+
+Point = namedtuple('Point', ['x', 'y', 'z'])
+
+# ! Free-space calibration settings
+
+calibration_folder_name = "calibration_cache"
+calibration_index_filename = "calibration_index.yml"
+
+# * Model whose scenarios are calibrated, one of the keys of
+# * `scenario_plan.SCENARIOS_FOLDER_NAMES`
+model = "straight_pipe"
+
+# * Folder with the generated scenarios whose plan lists the references needed
+scenarios_folder_name = scenario_plan.SCENARIOS_FOLDER_NAMES[model]
+
+# * The free-space model mirrors `power_calibration.py`, minus the geometry
+# * view and the snapshots, which are not needed for a reference level. It
+# * is 2D or 3D as the scenario it is a reference for.
+simulation_name = 'Antenna in free space'
+runtime_multiplier = 3
+pml_cells_number = 20
+
+# * Distance from the PML to the transmitter and the receiver, and the
+# * height of the free space region, in base units
+tx_offset = 10e-2
+model_y = 1.0
+
+waveform_type = 'contsine'
+waveform_identifier = 'tx_1'
+dipole_polarisation = 'z'
+
+# * Receiver component the reference level is extracted from
+level_component = "Ez"
+
+# ! Free-space calibration settings end
+
+jinja2_env = Environment(
+    loader=FileSystemLoader('./'), undefined=StrictUndefined,
+    trim_blocks=True, lstrip_blocks=True,
+)
+
+CalibrationKey = namedtuple(
+    'CalibrationKey',
+    [
+        'fund_freq', 'delta_d', 'waveform_amplitude', 'separation_cells',
+        'geometry_mode',
+    ]
+)
+
+
+def calibration_key(
+    fund_freq: float,
+    delta_d: float,
+    waveform_amplitude: float,
+    separation: float,
+    geometry_mode: str,
+) -> CalibrationKey:
+    """Builds the cache key of a free-space reference
+
+    gprMax snaps sources and receivers to the grid, so the separation is
+    stored as a whole number of cells, which also makes the key robust to
+    floating point noise in the positions.
+
+    Args:
+        fund_freq: The frequency of the excitation, in Hz
+        delta_d: The grid spacing, in metres
+        waveform_amplitude: The amplitude of the Hertzian dipole current
+        separation: The distance from the transmitter to the receiver
+        geometry_mode: Either `2D` or `3D`, as levels differ between the two
+
+    Returns:
+        A `CalibrationKey` namedtuple
+
+    Raises:
+        Nothing
+    """
+    return CalibrationKey(
+        float(f"{fund_freq:.6e}"),
+        float(f"{delta_d:.6e}"),
+        float(f"{waveform_amplitude:.6e}"),
+        int(round(separation / delta_d)),
+        geometry_mode,
+    )
+
+
+def key_name(key: CalibrationKey) -> str:
+    """Turns a `CalibrationKey` into a short, filename-safe identifier"""
+    key_string = "_".join(str(value) for value in key)
+
+    return hashlib.sha1(key_string.encode("utf-8")).hexdigest()[:16]
+
+
+def load_index(calibration_folder: Path) -> Dict[str, Dict]:
+    """Reads the cached reference levels
+
+    Args:
+        calibration_folder: A `Path` to the calibration cache folder
+
+    Returns:
+        A `dict` mapping `key_name` identifiers to entries holding the key
+        fields and the reference `level_db`. Empty if there is no cache yet.
+
+    Raises:
+        Nothing
+    """
+    index_file = calibration_folder / calibration_index_filename
+
+    if not index_file.exists():
+        return {}
+
+    with index_file.open(mode="r") as input_file:
+        return yaml.safe_load(input_file) or {}
+
+
+def save_index(calibration_folder: Path, index: Dict[str, Dict]) -> None:
+    """Writes the cached reference levels back to disk"""
+    index_file = calibration_folder / calibration_index_filename
+
+    with index_file.open(mode="w") as output_file:
+        yaml.safe_dump(index, output_file, sort_keys=True)
+
+
+def lookup_reference(
+    index: Dict[str, Dict], key: CalibrationKey
+) -> Optional[float]:
+    """Returns the cached reference level in dB, or `None` if missing"""
+    entry = index.get(key_name(key))
+
+    return None if entry is None else entry["level_db"]
+
+
+def normalise_level(level_db: float, reference_db: float) -> float:
+    """Expresses a receiver level relative to its free-space reference"""
+    return level_db - reference_db
+
+
+def free_space_sim_params(key: CalibrationKey) -> Dict:
+    """Calculates the values the free-space template needs for a key
+
+    Args:
+        key: The `CalibrationKey` of the reference to simulate
+
+    Returns:
+        A `dict` which is passed to `power_calibration.j2` as `params`
+
+    Raises:
+        Nothing
+    """
+    delta_d = key.delta_d
+    separation = key.separation_cells * delta_d
+    geometry_mode = key.geometry_mode
+
+    # * PML command
+    if geometry_mode == '2D':
+        pml_command = '{0} {0} 0 {0} {0} 0'.format(pml_cells_number)
+    elif geometry_mode == '3D':
+        pml_command = '{0} {0} {0} {0} {0} {0}'.format(pml_cells_number)
+
+    # * Model geometry
+    pml_x = pml_cells_number * delta_d
+    pml_y = pml_cells_number * delta_d
+    if geometry_mode == '2D':
+        pml_z = 0
+    elif geometry_mode == '3D':
+        pml_z = pml_cells_number * delta_d
+
+    model_x = separation + 2 * tx_offset
+    if geometry_mode == '2D':
+        model_z = delta_d
+    elif geometry_mode == '3D':
+        model_z = model_y
+
+    domain_x = model_x + 2 * pml_x
+    domain_y = model_y + 2 * pml_y
+    domain_z = model_z + 2 * pml_z
+
+    longest_dimension = np.max([domain_x, domain_y, domain_z])
+    simulation_runtime = (
+        runtime_multiplier * (longest_dimension / speed_of_light)
+    )
+
+    centre_z = 0 if geometry_mode == '2D' else domain_z / 2
+
+    transmitter_position = Point(pml_x + tx_offset, domain_y / 2, centre_z)
+    receiver_position = Point(
+        transmitter_position.x + separation, domain_y / 2, centre_z
+    )
+
+    return {
+        'simulation_name': simulation_name,
+        'simulation_runtime': float(simulation_runtime),
+        'pml_command': pml_command,
+
+        'domain_x': domain_x,
+        'domain_y': domain_y,
+        'domain_z': domain_z,
+
+        'delta_d': delta_d,
+
+        'waveform_type': waveform_type,
+        'waveform_amplitude': key.waveform_amplitude,
+        'waveform_identifier': waveform_identifier,
+
+        'fund_freq': key.fund_freq,
+        'dipole_polarisation': dipole_polarisation,
+
+        'transmitter_position': transmitter_position._asdict(),
+        'receiver_position': receiver_position._asdict(),
+    }
+
+
+def run_reference(
+    calibration_folder: Path, key: CalibrationKey, logger: logging.Logger
+) -> float:
+    """Simulates the free-space reference of a key and extracts its level
+
+    Args:
+        calibration_folder: A `Path` to the calibration cache folder
+        key: The `CalibrationKey` of the reference to simulate
+        logger: The `Logger` to report progress to
+
+    Returns:
+        The level at the receiver, in dB
+
+    Raises:
+        GeneralError: If gprMax fails to run the model
+    """
+    # * Only simulating needs gprMax, looking up cached references does not
+    import gprMax
+
+    simulation_file = calibration_folder / ".".join(
+        ["_".join(["free_space", key_name(key)]), "py"]
+    )
+    output_file = simulation_file.with_suffix(".out")
+
+    if not output_file.exists():
+        template = jinja2_env.get_template('power_calibration.j2')
+        simulation_file.write_text(
+            template.render(params=free_space_sim_params(key))
+        )
+        logger.info("Running free-space reference %s for %s",
+                    simulation_file.name, key)
+        gprMax.gprMax.api(str(simulation_file))
+
+    metadata = gprmax_outputs.read_output_metadata(output_file)
+    receivers = gprmax_outputs.read_receivers(output_file, (level_component,))
+
+    return gprmax_outputs.receiver_level_db(
+        receivers[metadata["receivers"][0]["group"]][level_component],
+        metadata["dt"],
+        key.fund_freq,
+    )
+
+
+def required_keys(plan: Dict[str, Dict]) -> Set[CalibrationKey]:
+    """Lists the free-space references needed to normalise a whole plan"""
+    keys = set()
+
+    for entry in plan.values():
+        for separation in scenario_plan.receiver_separations(entry):
+            keys.add(
+                calibration_key(
+                    entry["fund_freq"], entry["delta_d"],
+                    entry["waveform_amplitude"], separation,
+                    entry["geometry_mode"]
+                )
+            )
+
+    return keys
+
+
+def scenario_references(
+    index: Dict[str, Dict], entry: Dict
+) -> Tuple[Optional[float], ...]:
+    """Looks up the reference level of every receiver of a plan entry"""
+    return tuple(
+        lookup_reference(
+            index,
+            calibration_key(
+                entry["fund_freq"], entry["delta_d"],
+                entry["waveform_amplitude"], separation,
+                entry["geometry_mode"]
+            )
+        )
+        for separation in scenario_plan.receiver_separations(entry)
+    )
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    calibration_logger = setup_logger(
+        "gprMax_power_calibration", global_timestamp
+    )
+
+    calibration_folder = Path.cwd() / calibration_folder_name
+    calibration_folder.mkdir(exist_ok=True)
+
+    plan = scenario_plan.load_plan(Path.cwd() / scenarios_folder_name)
+    index = load_index(calibration_folder)
+
+    missing_keys = sorted(
+        key for key in required_keys(plan) if key_name(key) not in index
+    )
+    calibration_logger.info(
+        "%d scenarios need %d references, %d of them are not cached yet",
+        len(plan), len(required_keys(plan)), len(missing_keys)
+    )
+
+    for key in missing_keys:
+        level_db = run_reference(calibration_folder, key, calibration_logger)
+        index[key_name(key)] = dict(key._asdict(), level_db=level_db)
+
+        # * Save after every reference, so an interrupted run loses nothing
+        save_index(calibration_folder, index)
+        calibration_logger.info("%s: %.3f dB", key, level_db)
+
+    calibration_logger.info("Calibration cache up to date")
+
+    logging.shutdown()
@@ -1,6 +1,9 @@
+import json
+import warnings
 from collections import namedtuple
 from itertools import product
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import yaml
 import numpy as np
@@ -8,29 +11,84 @@ from scipy.constants import speed_of_light
 from jinja2 import Environment, FileSystemLoader, StrictUndefined
 
 import rflib
+import grid_spacing
+import pml_selection
+import scenario_plan
+import symmetry
 from itur import p2040
 from itur import p527
 
 
 Point = namedtuple('Point', ['x', 'y', 'z'])
 
-# ! Read in lists of values for which to generate gprMax input files
-parameters_values_filename = "scenarios_empty_pipe.yml"
+# * Models which can be swept. Each has its own YAML file with the lists of
+# * values to sweep, its own sweep parameters, in the order of the YAML file,
+# * its own templates, and its own output folder.
+MODELS = {
+    'straight_pipe': {
+        'parameters_filename': scenario_plan.PARAMETERS_FILENAMES[
+            'straight_pipe'
+        ],
+        'parameter_names': (
+            'fund_freq', 'pipe_diameter', 'pipe_length',
+            'pipe_burial_depth', 'soil_name', 'soil_water_content'
+        ),
+        'templates': {
+            'python': 'straight_pipe_soil_vertical.j2',
+            'native': 'straight_pipe_soil_vertical_native.j2',
+        },
+        'output_folder_name': scenario_plan.SCENARIOS_FOLDER_NAMES[
+            'straight_pipe'
+        ],
+    },
+    'pipe_to_above_ground': {
+        'parameters_filename': scenario_plan.PARAMETERS_FILENAMES[
+            'pipe_to_above_ground'
+        ],
+        'parameter_names': (
+            'fund_freq', 'pipe_diameter', 'pipe_burial_depth',
+            'soil_name', 'soil_water_content'
+        ),
+        'templates': {
+            'python': 'pipe_to_above_ground.j2',
+            'native': 'pipe_to_above_ground_native.j2',
+        },
+        'output_folder_name': scenario_plan.SCENARIOS_FOLDER_NAMES[
+            'pipe_to_above_ground'
+        ],
+    },
+}
 
-with open(parameters_values_filename, "r") as input_file:
-    all_params_values = yaml.safe_load(input_file)
+# ! Select the model to generate input files for
+model = 'straight_pipe'
 
-all_params_values = product(*all_params_values.values())
+# ! Read in lists of values for which to generate gprMax input files
+parameters_values_filename = MODELS[model]['parameters_filename']
 
-# ! gprMax input file template and corresponding settings
+# ! gprMax input file templates and corresponding settings
 jinja2_env = Environment(
     loader=FileSystemLoader('./'), undefined=StrictUndefined,
     trim_blocks=True, lstrip_blocks=True,
 )
 
-jinja2_template = jinja2_env.get_template('straight_pipe_soil_vertical.j2')
+# * `python` writes a `#python:` block which gprMax executes for every model,
+# * `native` writes the plain hash commands directly, skipping the Python
+# * interpreter and making the input files trivially hashable and diffable
+input_format = 'python'
+INPUT_EXTENSIONS = {'python': 'py', 'native': 'in'}
+
+# * Scenarios which share a domain and grid, and differ only in their
+# * materials, e.g. the same frequency and pipe in soils of the same
+# * permittivity, form a family. With `pack_families` set, each family is
+# * also written as one `#python:` input in `families/`, which gprMax runs
+# * as one model per scenario with `-n`, so start-up is paid once. Each
+# * model picks its scenario by `current_model_run`. The runner only uses
+# * them with its `run_families` set, the individual inputs are still written.
+pack_families = False
+max_family_size = 16
+family_template = 'packed_family.j2'
 
-output_folder_name = "scenarios_empty"
+output_folder_name = MODELS[model]['output_folder_name']
 
 # ! Simulation model parameters - constant across all scenarios
 
@@ -43,10 +101,30 @@ output_geometry = True
 output_snapshots = True
 snapshots_count = 4
 
+# * Scenarios with the same geometry share one geometry view, written by the
+# * first of them. `geometry_view_step` writes the views with a coarser step,
+# * in metres, for visual checks. Coarse views are then shared by every
+# * scenario whose pipe and domain agree to within the step, even if their
+# * grids differ. `None` writes the views at the grid resolution.
+geometry_view_step = None
+
 max_harmonic = 5
 runtime_multiplier = 3
 pml_cells_number = 20
 
+# * `fixed` uses `pml_cells_number` on every side. `auto` picks the thinnest
+# * PML of each side which keeps its reflection below `target_reflection_db`,
+# * using the table written by `pml_calibration.py` and crediting the loss
+# * of any soil between the model and the PML. Sides the table does not
+# * cover fall back to `pml_cells_number`.
+pml_mode = 'fixed'
+target_reflection_db = -50.0
+pml_table = []
+if pml_mode == 'auto':
+    pml_table = pml_selection.load_pml_table(
+        pml_selection.PML_CALIBRATION_FILENAME
+    )
+
 # * Pipe dimensions and properties, in base units
 pipe_material = 'concrete'
 pipe_wall_thickness = 35e-3
@@ -72,13 +150,270 @@ waveform_type = 'contsine'
 waveform_identifier = 'tx_1'
 dipole_polarisation = 'z'
 
+# * Grid density, as cells per shortest wavelength in the model. If a grid
+# * convergence study has been run with `grid_convergence.py`, its results
+# * override this on a per frequency and soil basis.
+cells_per_wavelength = 10
+use_grid_convergence = True
+grid_convergence_filename = 'grid_convergence.yml'
+
+# * `harmonic` takes the shortest wavelength at `max_harmonic` times the
+# * fundamental frequency, which is conservative and suits broadband pulses.
+# * `waveform` takes it at the highest frequency `waveform_type` contains,
+# * see `grid_spacing.WAVEFORM_BANDWIDTH_FACTORS`, so a `contsine` only
+# * needs its own wavelength resolved. The cells per wavelength are then the
+# * fewest which keep the phase velocity error of the grid below
+# * `max_dispersion_error`, or below the error given for the frequency in
+# * `dispersion_errors`. Grid convergence results override them, but only if
+# * the study was made in the same mode.
+grid_spacing_mode = 'harmonic'
+max_dispersion_error = 0.005
+dispersion_errors = {}
+
+# * Constants of the `pipe_to_above_ground` model which differ from those of
+# * the straight pipe above, as in `pipe_to_above_ground.py`. Its transmitter
+# * is driven with the current which radiates `tx_power`, as there.
+above_ground_pipe_wall_thickness = 60e-3
+above_ground_soil_temp = 10.0
+above_ground_soil_depth = 1.0
+
+# * Receiver line of the `pipe_to_above_ground` model. Receivers are spaced
+# * `receiver_line_spacing` apart, rounded to whole cells, across
+# * `receiver_line_width` of the surface centred above the pipe, at
+# * `receiver_height_ratio` of the air depth above ground. Without the line,
+# * there is a single receiver above the pipe.
+receiver_line = True
+receiver_line_width = 2.0
+receiver_line_spacing = 50e-3
+receiver_height_ratio = 0.75
+
+# * The `pipe_to_above_ground` model is mirror-symmetric about the vertical
+# * plane through the pipe axis. With `symmetry_mode` set, only the side with
+# * x below the plane is modelled, ending in a PEC wall for x polarised
+# * dipoles or a PMC wall for y and z polarised ones. The wall is a slab of
+# * `symmetry_wall_cells` cells which starts one cell past the plane, so the
+# * fields on the plane, and its receivers, are still updated. gprMax has no
+# * PMC, so the PMC slab has a very high magnetic conductivity.
+# * `reduce_outputs.py` mirrors the receivers and snapshots back to the full
+# * width.
+symmetry_mode = False
+symmetry_wall_cells = 2
+pmc_magconductivity = 1e12
+
 # ! Simulation model parameters end
 
-# * Set up output folder
-output_folder = Path.cwd() / output_folder_name
-output_folder.mkdir(exist_ok=True)
 
-for params in all_params_values:
+def load_parameter_grid(filename: str) -> List[Tuple]:
+    """Reads the sweep values and expands them into all their combinations
+
+    Args:
+        filename: A `str` with the YAML file listing the values of each
+                  sweep parameter, e.g. `scenarios_empty_pipe.yml`
+
+    Returns:
+        A `list` of `tuple` objects, one per scenario, with the parameter
+        values in the order in which they appear in the YAML file
+
+    Raises:
+        Nothing
+    """
+    with open(filename, "r") as input_file:
+        all_params_values = yaml.safe_load(input_file)
+
+    return list(product(*all_params_values.values()))
+
+
+def load_grid_densities(
+    filename: str,
+    model_name: str = model,
+    spacing_mode: str = grid_spacing_mode,
+) -> Dict[Tuple[float, str], float]:
+    """Reads the grid densities chosen by a grid convergence study
+
+    Args:
+        filename: A `str` with the YAML file written by `grid_convergence.py`
+        model_name: The model the densities are for, one of the keys of
+                    `MODELS`
+        spacing_mode: The `grid_spacing_mode` the densities are used with
+
+    Returns:
+        A `dict` mapping `(fund_freq, soil_name)` to the number of cells per
+        shortest wavelength. The `dict` is empty if the file does not exist,
+        or if the study was made for another model or grid spacing mode,
+        since the same density gives very different grids in each mode.
+        A warning is issued when a study is ignored.
+
+    Raises:
+        Nothing
+    """
+    if not Path(filename).exists():
+        return {}
+
+    with open(filename, "r") as input_file:
+        convergence_results = yaml.safe_load(input_file)
+
+    # * Studies from before models were recorded were all of the straight pipe
+    study_model = convergence_results.get('model', 'straight_pipe')
+    if study_model != model_name:
+        warnings.warn(
+            f"{filename} was made for the {study_model} model, ignoring it "
+            f"for {model_name}"
+        )
+        return {}
+
+    # * Studies from before the modes were recorded were all `harmonic`
+    study_mode = convergence_results.get('grid_spacing_mode', 'harmonic')
+    if study_mode != spacing_mode:
+        warnings.warn(
+            f"{filename} was made in {study_mode} grid spacing mode, "
+            f"ignoring it in {spacing_mode} mode"
+        )
+        return {}
+
+    return {
+        (float(entry['fund_freq']), entry['soil_name']):
+            entry['cells_per_wavelength']
+        for entry in convergence_results['classes']
+    }
+
+
+def scenario_filename(
+    params: Tuple, model_name: str = 'straight_pipe'
+) -> str:
+    """Builds the base filename, without extension, of a scenario"""
+    if model_name == 'pipe_to_above_ground':
+        (fund_freq, pipe_diameter, pipe_burial_depth,
+         soil_name, soil_water_content) = params
+
+        return '_'.join([
+            model_name, str(fund_freq / 1e9), str(pipe_diameter),
+            str(pipe_burial_depth), soil_name, str(soil_water_content)
+        ])
+
+    (fund_freq, pipe_diameter, pipe_length,
+     pipe_burial_depth, soil_name,
+     soil_water_content) = params
+
+    return '_'.join([
+        filename_base, str(fund_freq / 1e9), str(pipe_diameter),
+        str(pipe_length), str(pipe_burial_depth), soil_name,
+        str(soil_water_content)
+    ])
+
+
+def model_pml_cells(
+    fund_freq: float,
+    delta_d: float,
+    geometry_mode: str,
+    sides: List[Tuple[float, float, float]],
+) -> List[int]:
+    """Picks the PML thickness of each side of a model, see `pml_mode`
+
+    Args:
+        fund_freq: The excitation frequency, in Hz
+        delta_d: The grid spacing, in metres
+        geometry_mode: Either `2D` or `3D`
+        sides: One `(er, conductivity, lossy distance)` tuple per side, in
+               the order of the gprMax `#pml_cells` command, see
+               `pml_selection.side_pml_cells`
+
+    Returns:
+        A `list` with the number of PML cells of each side, with no PML on
+        the z sides of 2D models
+
+    Raises:
+        Nothing
+    """
+    if pml_mode == 'auto':
+        pml_cells = pml_selection.side_pml_cells(
+            pml_table, fund_freq, delta_d, sides, target_reflection_db,
+            pml_cells_number
+        )
+    else:
+        pml_cells = [pml_cells_number] * len(sides)
+
+    if geometry_mode == '2D':
+        pml_cells[2] = pml_cells[5] = 0
+
+    return pml_cells
+
+
+def model_delta_d(
+    fund_freq: float,
+    er_max: float,
+    grid_density: Optional[float],
+    geometry_mode: str,
+) -> Tuple[float, float]:
+    """Calculates the grid spacing of a model, see `grid_spacing_mode`
+
+    Args:
+        fund_freq: The excitation frequency, in Hz
+        er_max: The highest relative permittivity in the model
+        grid_density: The number of cells per shortest wavelength, or `None`
+                      for the default of `grid_spacing_mode`
+        geometry_mode: Either `2D` or `3D`
+
+    Returns:
+        A `tuple` with the grid spacing, in metres, and the number of cells
+        per shortest wavelength it was calculated with
+
+    Raises:
+        ValueError: If `grid_spacing_mode` is not a known mode
+    """
+    if grid_spacing_mode == 'harmonic':
+        if grid_density is None:
+            grid_density = cells_per_wavelength
+
+        delta_d = grid_spacing.harmonic_delta_d(
+            fund_freq, er_max, max_harmonic, grid_density
+        )
+    elif grid_spacing_mode == 'waveform':
+        if grid_density is None:
+            grid_density = grid_spacing.dispersion_cells_per_wavelength(
+                dispersion_errors.get(fund_freq, max_dispersion_error),
+                2 if geometry_mode == '2D' else 3
+            )
+
+        delta_d = grid_spacing.waveform_delta_d(
+            fund_freq, er_max, waveform_type, grid_density, max_harmonic
+        )
+    else:
+        raise ValueError(
+            f"Unknown grid spacing mode {grid_spacing_mode}, expected "
+            "harmonic or waveform"
+        )
+
+    return delta_d, grid_density
+
+
+def scenario_sim_params(
+    params: Tuple,
+    grid_density: Optional[float] = None,
+    geometry_mode: str = geometry_mode,
+    soil_depth: float = soil_depth,
+    air_depth: float = air_depth,
+) -> Dict:
+    """Calculates all the values the gprMax template needs for a scenario
+
+    The keyword arguments default to the module settings, and are only
+    overridden by fallbacks such as the runner's memory pre-flight check.
+
+    Args:
+        params: A `tuple` with the sweep parameter values of the scenario,
+                in the order of `scenarios_empty_pipe.yml`
+        grid_density: The number of cells per shortest wavelength, or `None`
+                      for the default of `grid_spacing_mode`
+        geometry_mode: Either `2D` or `3D`
+        soil_depth: Thickness of the soil below the pipe, in metres
+        air_depth: Thickness of the air above the ground, in metres
+        symmetric: Whether to model only the half below the symmetry plane
+
+    Returns:
+        A `dict` which is passed to the Jinja2 template as `params`
+
+    Raises:
+        Nothing
+    """
     (fund_freq, pipe_diameter, pipe_length,
      pipe_burial_depth, soil_name,
      soil_water_content) = params
@@ -88,13 +423,8 @@ for params in all_params_values:
     fund_wavelength = speed_of_light / fund_freq
 
     # * Filenames
-    geometry_filename = '_'.join([
-        filename_base, str(fund_freq_GHz), str(pipe_diameter),
-        str(pipe_length), str(pipe_burial_depth), soil_name,
-        str(soil_water_content)
-    ])
+    geometry_filename = scenario_filename(params)
     snapshot_filename = '_'.join([geometry_filename, 'snapshot'])
-    simulation_filename = ".".join([geometry_filename, 'py'])
 
     # * Pipe material properties
     pipe_material_er = p2040.material_permittivity(
@@ -142,27 +472,30 @@ for params in all_params_values:
     else:
         er_max = np.max([pipe_material_er, soil_er])
 
-    lambda_min = speed_of_light / (max_harmonic * fund_freq)
-    lambda_min_eff = lambda_min / np.sqrt(er_max)
-
-    delta_d = lambda_min_eff / 10
-    round_digits = int(np.ceil(-np.log10(delta_d))) + 1
-    round_digits = np.power(10, round_digits)
-    delta_d = np.trunc(delta_d * round_digits) / round_digits
+    delta_d, grid_density = model_delta_d(
+        fund_freq, er_max, grid_density, geometry_mode
+    )
 
-    # * PML command
-    if geometry_mode == '2D':
-        pml_command = '{0} {0} 0 {0} {0} 0'.format(pml_cells_number)
-    elif geometry_mode == '3D':
-        pml_command = '{0} {0} {0} {0} {0} {0}'.format(pml_cells_number)
+    # * PML thickness of each side. The pipe runs through the x sides and the
+    # * air lies against the top, so only the soil below and beside the pipe
+    # * earns credit for its loss.
+    pml_cells = model_pml_cells(
+        fund_freq, delta_d, geometry_mode,
+        [
+            (er_max, 0.0, 0.0),
+            (soil_er, soil_cond, soil_depth),
+            (soil_er, soil_cond, soil_depth),
+            (er_max, 0.0, 0.0),
+            (1.0, 0.0, 0.0),
+            (soil_er, soil_cond, soil_depth),
+        ]
+    )
+    pml_command = ' '.join(str(cells) for cells in pml_cells)
 
     # * Model geometry
-    pml_x = pml_cells_number * delta_d
-    pml_y = pml_cells_number * delta_d
-    if geometry_mode == '2D':
-        pml_z = 0
-    elif geometry_mode == '3D':
-        pml_z = pml_cells_number * delta_d
+    pml_x_min, pml_y_min, pml_z_min, pml_x_max, pml_y_max, pml_z_max = (
+        cells * delta_d for cells in pml_cells
+    )
 
     model_x = pipe_length
     model_y = (
@@ -174,9 +507,9 @@ for params in all_params_values:
     elif geometry_mode == '3D':
         model_z = pipe_diameter + 2 * pipe_wall_thickness + 2 * soil_depth
 
-    domain_x = model_x + 2 * pml_x
-    domain_y = model_y + 2 * pml_y
-    domain_z = model_z + 2 * pml_z
+    domain_x = model_x + (pml_x_min + pml_x_max)
+    domain_y = model_y + (pml_y_min + pml_y_max)
+    domain_z = model_z + (pml_z_min + pml_z_max)
 
     longest_dimension = np.max([domain_x, domain_y, domain_z])
     simulation_runtime = (
@@ -186,23 +519,27 @@ for params in all_params_values:
     if geometry_mode == '2D':
         pipe_start = Point(
             0,
-            pml_y + soil_depth + pipe_wall_thickness + pipe_diameter / 2,
+            pml_y_min + soil_depth + pipe_wall_thickness +
+            pipe_diameter / 2,
             0
         )
         pipe_end = Point(
             domain_x,
-            pml_y + soil_depth + pipe_wall_thickness + pipe_diameter / 2,
+            pml_y_min + soil_depth + pipe_wall_thickness +
+            pipe_diameter / 2,
             0
         )
     elif geometry_mode == '3D':
         pipe_start = Point(
             0,
-            pml_y + soil_depth + pipe_wall_thickness + pipe_diameter / 2,
+            pml_y_min + soil_depth + pipe_wall_thickness +
+            pipe_diameter / 2,
             domain_z / 2
         )
         pipe_end = Point(
             domain_x,
-            pml_y + soil_depth + pipe_wall_thickness + pipe_diameter / 2,
+            pml_y_min + soil_depth + pipe_wall_thickness +
+            pipe_diameter / 2,
             domain_z / 2
         )
 
@@ -215,13 +552,13 @@ for params in all_params_values:
     waveform_amplitude = 1.0
 
     transmitter_position = Point(
-        pipe_start.x + (pml_x + tx_offset.x),
+        pipe_start.x + (pml_x_min + tx_offset.x),
         pipe_start.y + tx_offset.y + fill_depth / 2.0,
         pipe_start.z + tx_offset.z
     )
 
     receiver_position = Point(
-        pipe_end.x - (pml_x + rx_offset.x),
+        pipe_end.x - (pml_x_max + rx_offset.x),
         pipe_end.y + rx_offset.y + fill_depth / 2.0,
         pipe_end.z + rx_offset.z
     )
@@ -240,7 +577,10 @@ for params in all_params_values:
         receiver_position.z
     )
 
+    view_half_height = pipe_diameter / 2 + pipe_wall_thickness + 0.25
+
     sim_params = {
+        'model': 'straight_pipe',
         'simulation_name': simulation_name,
         'simulation_runtime': simulation_runtime,
         'geometry_filename': geometry_filename,
@@ -253,13 +593,15 @@ for params in all_params_values:
         'geometry_mode': geometry_mode,
 
         'pml_command': pml_command,
-        'pml_y': pml_y,
+        # * Thickness of the PML on top, above the air
+        'pml_y': pml_y_max,
 
         'domain_x': domain_x,
         'domain_y': domain_y,
         'domain_z': domain_z,
 
         'delta_d': delta_d,
+        'cells_per_wavelength': grid_density,
 
         'pipe_material_er': pipe_material_er,
         'pipe_material_conductivity': pipe_material_conductivity,
@@ -272,6 +614,7 @@ for params in all_params_values:
         'pipe_wall_thickness': pipe_wall_thickness,
 
         'air_depth': air_depth,
+        'soil_depth': soil_depth,
 
         'waveform_type': waveform_type,
         'waveform_amplitude': waveform_amplitude,
@@ -283,7 +626,17 @@ for params in all_params_values:
         'transmitter_position': transmitter_position._asdict(),
         'receiver_position': receiver_position._asdict(),
         'observer_rx_1': observer_rx_1._asdict(),
-        'observer_rx_2': observer_rx_2._asdict()
+        'observer_rx_2': observer_rx_2._asdict(),
+        'receivers': [
+            receiver_position._asdict(),
+            observer_rx_1._asdict(),
+            observer_rx_2._asdict(),
+        ],
+
+        # * Both the geometry view and the snapshots cover this band of y
+        'view_y': [
+            pipe_start.y - view_half_height, pipe_start.y + view_half_height
+        ],
     }
 
     if include_water:
@@ -294,12 +647,675 @@ for params in all_params_values:
                 'fill_depth': fill_depth,
                 'central_angle_deg': central_angle_deg,
                 'central_angle': central_angle,
+                # * Corners of the triangle which restores the air above the
+                # * water in 3D, as evaluated by the `#python:` template
+                'refill_triangle': {
+                    'y2': (pipe_start.y - pipe_diameter) / 2 *
+                    np.cos(central_angle / 2),
+                    'z2': (pipe_start.z - pipe_diameter) / 2 *
+                    np.sin(central_angle / 2),
+                    'y3': (pipe_start.y - pipe_diameter) / 2 *
+                    np.cos(central_angle / 2),
+                    'z3': (pipe_start.z + pipe_diameter) / 2 *
+                    np.sin(central_angle / 2),
+                },
+            }
+        )
+
+    sim_params.update(geometry_view_params(sim_params))
+
+    return sim_params
+
+
+def above_ground_sim_params(
+    params: Tuple,
+    grid_density: Optional[float] = None,
+    geometry_mode: str = geometry_mode,
+    soil_depth: float = above_ground_soil_depth,
+    air_depth: float = air_depth,
+    symmetric: bool = symmetry_mode,
+) -> Dict:
+    """Calculates the template values of a `pipe_to_above_ground` scenario
+
+    The model is a cross-section through a buried pipe, with the transmitter
+    inside the pipe and the receivers in the air above the ground. With
+    `receiver_line` set, the domain is widened so the whole line fits.
+
+    Args:
+        params: A `tuple` with the sweep parameter values of the scenario,
+                in the order of `scenarios_above_ground.yml`
+        grid_density: The number of cells per shortest wavelength, or `None`
+                      for the default of `grid_spacing_mode`
+        geometry_mode: Either `2D` or `3D`
+        soil_depth: Thickness of the soil around the pipe, in metres
+        air_depth: Thickness of the air above the ground, in metres
+
+    Returns:
+        A `dict` which is passed to the Jinja2 template as `params`
+
+    Raises:
+        Nothing
+    """
+    (fund_freq, pipe_diameter, pipe_burial_depth,
+     soil_name, soil_water_content) = params
+    pipe_wall_thickness = above_ground_pipe_wall_thickness
+
+    fund_freq_GHz = fund_freq / 1e9
+
+    geometry_filename = scenario_filename(params, 'pipe_to_above_ground')
+    snapshot_filename = '_'.join([geometry_filename, 'snapshot'])
+
+    pipe_material_er = p2040.material_permittivity(
+        fund_freq_GHz, pipe_material
+    )
+    pipe_material_conductivity = p2040.material_conductivity(
+        fund_freq_GHz, pipe_material
+    )
+
+    soil_constituents = p527.SOILS[soil_name]
+    soil_complex_er = p527.soil_permittivity(
+        fund_freq_GHz,
+        above_ground_soil_temp,
+        soil_constituents.p_sand,
+        soil_constituents.p_clay,
+        soil_constituents.p_silt,
+        soil_water_content
+    )
+    soil_cond = rflib.dielectrics.imaginary_permittivity_to_conductivity(
+        fund_freq_GHz, np.abs(soil_complex_er.imag)
+    )
+    soil_er = np.real(soil_complex_er)
+
+    er_max = np.max([pipe_material_er, soil_er])
+    delta_d, grid_density = model_delta_d(
+        fund_freq, er_max, grid_density, geometry_mode
+    )
+
+    # * The ground surface and the pipe reach the x and z sides, so only the
+    # * soil below the pipe earns credit for its loss
+    pml_cells = model_pml_cells(
+        fund_freq, delta_d, geometry_mode,
+        [
+            (soil_er, 0.0, 0.0),
+            (soil_er, soil_cond, soil_depth),
+            (er_max, 0.0, 0.0),
+            (soil_er, 0.0, 0.0),
+            (1.0, 0.0, 0.0),
+            (er_max, 0.0, 0.0),
+        ]
+    )
+
+    pml_x_min, pml_y_min, pml_z_min, pml_x_max, pml_y_max, pml_z_max = (
+        cells * delta_d for cells in pml_cells
+    )
+
+    # * There is no PML behind the symmetry wall
+    if symmetric:
+        pml_cells[3] = 0
+    pml_command = ' '.join(str(cells) for cells in pml_cells)
+
+    pipe_outer_diameter = pipe_diameter + 2 * pipe_wall_thickness
+
+    # * The receiver line keeps `soil_depth` clear of the PML on both sides
+    line_cells = 0
+    line_spacing_cells = max(int(round(receiver_line_spacing / delta_d)), 1)
+    if receiver_line:
+        line_cells = (
+            int(receiver_line_width / (line_spacing_cells * delta_d)) *
+            line_spacing_cells
+        )
+
+    model_x = max(pipe_outer_diameter, line_cells * delta_d) + 2 * soil_depth
+    model_y = (
+        pipe_outer_diameter + soil_depth + pipe_burial_depth + air_depth
+    )
+    if geometry_mode == '2D':
+        model_z = delta_d
+    elif geometry_mode == '3D':
+        model_z = 2 * soil_depth
+
+    domain_x = model_x + (pml_x_min + pml_x_max)
+    domain_y = model_y + (pml_y_min + pml_y_max)
+    domain_z = model_z + (pml_z_min + pml_z_max)
+
+    # * The runtime is that of the full model, so the half model sees the
+    # * same reflections from the PML
+    longest_dimension = np.max([domain_x, domain_y, domain_z])
+    simulation_runtime = (
+        runtime_multiplier * (longest_dimension / speed_of_light)
+    )
+
+    # * The symmetry plane lies on a grid line, so the pipe axis, the
+    # * transmitter, and the plane all coincide
+    plane_x = np.round((pml_x_min + model_x / 2) / delta_d) * delta_d
+    boundary = None
+    if symmetric:
+        boundary = symmetry.symmetry_boundary(dipole_polarisation)
+        domain_x = plane_x + (1 + symmetry_wall_cells) * delta_d
+
+    # * The pipe runs along z, so 2D models are a cross-section through it
+    pipe_start = Point(
+        plane_x,
+        pml_y_min + soil_depth + pipe_wall_thickness + pipe_diameter / 2,
+        0
+    )
+    pipe_end = Point(pipe_start.x, pipe_start.y, domain_z)
+
+    # * Calculate Hertzian dipole current from required power
+    waveform_amplitude = rflib.antennas.hertzian_dipole_current(
+        fund_freq_GHz, tx_power, delta_d
+    )
+
+    # * `tx_offset` and `rx_offset` are along the pipe of the straight pipe
+    # * model, so the transmitter sits on the axis of the pipe here
+    transmitter_position = Point(pipe_start.x, pipe_start.y, domain_z / 2)
+
+    ground_y = (
+        pipe_start.y + pipe_diameter / 2 + pipe_wall_thickness +
+        pipe_burial_depth
+    )
+    receiver_y = ground_y + air_depth * receiver_height_ratio
+
+    line_start = Point(
+        pipe_start.x - line_cells * delta_d / 2, receiver_y, domain_z / 2
+    )
+    receivers = [
+        Point(
+            line_start.x + cell * delta_d, line_start.y, line_start.z
+        )._asdict()
+        for cell in range(0, line_cells + 1, line_spacing_cells)
+        if not symmetric or
+        line_start.x + cell * delta_d <= plane_x + delta_d / 2
+    ]
+
+    sim_params = {
+        'model': 'pipe_to_above_ground',
+        'simulation_name': simulation_name,
+        'simulation_runtime': simulation_runtime,
+        'geometry_filename': geometry_filename,
+        'snapshots_count': snapshots_count,
+        'snapshot_filename': snapshot_filename,
+
+        'include_water': False,
+        'output_snapshots': output_snapshots,
+        'output_geometry': output_geometry,
+        'geometry_mode': geometry_mode,
+
+        'pml_command': pml_command,
+        # * Thickness of the PML on top, above the air
+        'pml_y': pml_y_max,
+
+        'domain_x': domain_x,
+        'domain_y': domain_y,
+        'domain_z': domain_z,
+
+        'delta_d': delta_d,
+        'cells_per_wavelength': grid_density,
+
+        'pipe_material_er': pipe_material_er,
+        'pipe_material_conductivity': pipe_material_conductivity,
+        'soil_er': soil_er,
+        'soil_conductivity': soil_cond,
+
+        'pipe_start': pipe_start._asdict(),
+        'pipe_end': pipe_end._asdict(),
+        'pipe_diameter': pipe_diameter,
+        'pipe_wall_thickness': pipe_wall_thickness,
+
+        'air_depth': air_depth,
+        'soil_depth': soil_depth,
+
+        'waveform_type': waveform_type,
+        'waveform_amplitude': waveform_amplitude,
+        'waveform_identifier': waveform_identifier,
+
+        'fund_freq': fund_freq,
+        'dipole_polarisation': dipole_polarisation,
+
+        'transmitter_position': transmitter_position._asdict(),
+        'receivers': receivers,
+
+        # * Receivers along x, written as one `#rx_array` command
+        'receiver_line': {
+            'start': receivers[0],
+            'end': receivers[-1],
+            'spacing': line_spacing_cells * delta_d,
+        },
+
+        # * The geometry view and the snapshots cover the whole domain
+        'view_y': [0.0, domain_y],
+
+        'symmetry': None if boundary is None else {
+            'plane_x': plane_x,
+            'boundary': boundary,
+        },
+        'pmc_magconductivity': pmc_magconductivity,
+    }
+
+    sim_params.update(geometry_view_params(sim_params))
+
+    return sim_params
+
+
+def geometry_view_params(
+    sim_params: Dict, step: float = geometry_view_step
+) -> Dict:
+    """Picks the step and the shared filename of a geometry view
+
+    The filename is keyed on everything the view shows: the model, the pipe,
+    the domain, the transmitter and receivers, and the grid. At the grid
+    resolution positions are compared in whole cells of identical grids, as
+    gprMax builds them. With a coarser `step` they are compared in whole
+    steps, regardless of the grid.
+
+    Args:
+        sim_params: The `dict` being built by `scenario_sim_params` or
+                    `above_ground_sim_params`
+        step: The step of the view, in metres, or `None` for the grid
+              resolution
+
+    Returns:
+        A `dict` with the `geometry_filename` and the `geometry_step` of the
+        view along each axis, to update `sim_params` with
+
+    Raises:
+        Nothing
+    """
+    delta_d = sim_params['delta_d']
+    step_cells = 1 if step is None else max(1, int(round(step / delta_d)))
+    resolution = delta_d if step is None else step
+
+    def in_steps(value: float) -> int:
+        return int(round(float(value) / resolution))
+
+    def point_in_steps(point: Dict) -> List[int]:
+        return [in_steps(point[axis]) for axis in ('x', 'y', 'z')]
+
+    symmetry_plane = sim_params.get('symmetry')
+    key_fields = {
+        'model': sim_params['model'],
+        'geometry_mode': sim_params['geometry_mode'],
+        # * Coarse views do not depend on the grid, only on the step
+        'delta_d': float(delta_d) if step is None else None,
+        'step': None if step is None else float(step),
+        'domain': [
+            in_steps(sim_params[name])
+            for name in ('domain_x', 'domain_y', 'domain_z')
+        ],
+        'view_y': [in_steps(value) for value in sim_params['view_y']],
+        'pipe': [
+            point_in_steps(sim_params['pipe_start']),
+            point_in_steps(sim_params['pipe_end']),
+            in_steps(sim_params['pipe_diameter']),
+            in_steps(sim_params['pipe_wall_thickness']),
+        ],
+        'fill_depth': (
+            in_steps(sim_params['fill_depth'])
+            if sim_params['include_water'] else None
+        ),
+        'transmitter': point_in_steps(sim_params['transmitter_position']),
+        'receivers': [
+            point_in_steps(receiver) for receiver in sim_params['receivers']
+        ],
+        'symmetry': None if symmetry_plane is None else [
+            in_steps(symmetry_plane['plane_x']), symmetry_plane['boundary']
+        ],
+    }
+    key = scenario_plan.content_hash(
+        json.dumps(key_fields, sort_keys=True)
+    )[:12]
+
+    return {
+        'geometry_filename': f"{sim_params['model']}_geometry_{key}",
+        'geometry_step': {
+            'x': step_cells * delta_d,
+            'y': step_cells * delta_d,
+            # * A 2D model is a single cell thick
+            'z': (
+                delta_d if sim_params['geometry_mode'] == '2D'
+                else step_cells * delta_d
+            ),
+        },
+    }
+
+
+def plan_entry(params: Tuple, sim_params: Dict) -> Dict:
+    """Summarises a scenario for the plan written next to the input files
+
+    Args:
+        params: A `tuple` with the sweep parameter values of the scenario
+        sim_params: The `dict` returned by `scenario_sim_params` or
+                    `above_ground_sim_params`
+
+    Returns:
+        A `dict` with only plain Python types, which later stages use
+        instead of parsing the input files
+
+    Raises:
+        Nothing
+    """
+    def as_point(point: Dict) -> Dict[str, float]:
+        return {axis: float(value) for axis, value in point.items()}
+
+    parameter_names = MODELS[sim_params['model']]['parameter_names']
+
+    return {
+        'model': sim_params['model'],
+        'parameters': {
+            name: (value if isinstance(value, str) else float(value))
+            for name, value in zip(parameter_names, params)
+        },
+        'fund_freq': float(sim_params['fund_freq']),
+        'geometry_mode': sim_params['geometry_mode'],
+        'delta_d': float(sim_params['delta_d']),
+        'cells_per_wavelength': float(sim_params['cells_per_wavelength']),
+        'soil_depth': float(sim_params['soil_depth']),
+        'air_depth': float(sim_params['air_depth']),
+        'pml_cells': [
+            int(cells) for cells in sim_params['pml_command'].split()
+        ],
+        'domain': {
+            'x': float(sim_params['domain_x']),
+            'y': float(sim_params['domain_y']),
+            'z': float(sim_params['domain_z']),
+        },
+        'simulation_runtime': float(sim_params['simulation_runtime']),
+        'waveform_type': sim_params['waveform_type'],
+        'waveform_amplitude': float(sim_params['waveform_amplitude']),
+        'transmitter_position': as_point(sim_params['transmitter_position']),
+        'receivers': [
+            as_point(receiver) for receiver in sim_params['receivers']
+        ],
+        'input_format': input_format,
+        'output_geometry': bool(sim_params['output_geometry']),
+        # * Shared by every scenario with the same geometry, but only written
+        # * by the one with `output_geometry` set
+        'geometry_view': {
+            'filename': sim_params['geometry_filename'],
+            'step': {
+                axis: float(value)
+                for axis, value in sim_params['geometry_step'].items()
+            },
+        },
+        'output_snapshots': bool(sim_params['output_snapshots']),
+        'snapshots_count': int(sim_params['snapshots_count']),
+        'view_y': [float(value) for value in sim_params['view_y']],
+        'symmetry': (
+            None if sim_params.get('symmetry') is None else {
+                'plane_x': float(sim_params['symmetry']['plane_x']),
+                'boundary': sim_params['symmetry']['boundary'],
             }
+        ),
+    }
+
+
+def family_key(sim_params: Dict) -> str:
+    """Keys the scenarios which gprMax can run as models of one input
+
+    Everything but the materials has to match: the grid, the domain and its
+    PML, the time window, the excitation, the geometry, and the outputs.
+
+    Args:
+        sim_params: The `dict` returned by `scenario_sim_params` or
+                    `above_ground_sim_params`
+
+    Returns:
+        A short hash, equal for scenarios of the same family
+
+    Raises:
+        Nothing
+    """
+    excluded = {
+        'simulation_name', 'snapshot_filename', 'output_geometry',
+        'pipe_material_er', 'pipe_material_conductivity',
+        'soil_er', 'soil_conductivity', 'sw_er', 'sw_conductivity',
+    }
+    key_fields = {
+        name: value for name, value in sim_params.items()
+        if name not in excluded
+    }
+
+    return scenario_plan.content_hash(
+        json.dumps(key_fields, sort_keys=True, default=float)
+    )[:12]
+
+
+def render_family(members: List[Tuple[str, Dict]]) -> str:
+    """Renders the packed input of a family of scenarios
+
+    Each scenario is rendered as native hash commands, and gprMax picks the
+    ones of the current model from a `#python:` block. With `-n` set to the
+    number of scenarios, model `n` writes `<family>n.out`, see
+    `gprmax_jobs.split_family_outputs`.
+
+    Args:
+        members: A `list` of `(scenario name, sim_params)` tuples, in the
+                 order of the models
+
+    Returns:
+        The contents of the packed input file
+
+    Raises:
+        Nothing
+    """
+    template = jinja2_env.get_template(family_template)
+
+    return template.render(
+        members=[
+            {'name': name, 'text': render_scenario(sim_params, 'native')}
+            for name, sim_params in members
+        ]
+    )
+
+
+def render_scenario(sim_params: Dict, format_name: str = input_format) -> str:
+    """Renders the gprMax input file of a scenario
+
+    The template is picked by the model recorded in `sim_params`.
+
+    Args:
+        sim_params: The `dict` returned by `scenario_sim_params` or
+                    `above_ground_sim_params`
+        format_name: Either `python` or `native`, see `input_format`
+
+    Returns:
+        The contents of the input file
+
+    Raises:
+        KeyError: If `format_name` is not a known input format
+    """
+    template = jinja2_env.get_template(
+        MODELS[sim_params['model']]['templates'][format_name]
+    )
+
+    return template.render(params=sim_params)
+
+
+def model_sim_params(model_name: str, params: Tuple, **overrides) -> Dict:
+    """Calculates the template values of a scenario of any model
+
+    Args:
+        model_name: One of the keys of `MODELS`
+        params: A `tuple` with the sweep parameter values of the scenario
+        overrides: Keyword arguments passed on, see `scenario_sim_params`
+
+    Returns:
+        A `dict` which is passed to the Jinja2 template as `params`
+
+    Raises:
+        KeyError: If `model_name` is not one of `MODELS`
+    """
+    return {
+        'straight_pipe': scenario_sim_params,
+        'pipe_to_above_ground': above_ground_sim_params,
+    }[model_name](params, **overrides)
+
+
+def entry_params(entry: Dict) -> Tuple:
+    """Gets the sweep parameter values of a plan entry, in YAML order"""
+    parameter_names = MODELS[
+        entry.get('model', 'straight_pipe')
+    ]['parameter_names']
+
+    return tuple(entry['parameters'][name] for name in parameter_names)
+
+
+def entry_sim_params(entry: Dict, **overrides) -> Dict:
+    """Recalculates the template parameters of a scenario from its plan
+
+    Args:
+        entry: A scenario plan entry, as returned by `plan_entry`
+        overrides: Keyword arguments which replace the values recorded in
+                   the plan entry, see `scenario_sim_params`
+
+    Returns:
+        The `dict` returned by `model_sim_params`, including any fallbacks
+        recorded in the plan entry
+
+    Raises:
+        Nothing
+    """
+    settings = {
+        'grid_density': entry['cells_per_wavelength'],
+        'geometry_mode': entry['geometry_mode'],
+        'soil_depth': entry['soil_depth'],
+        'air_depth': entry['air_depth'],
+    }
+    settings.update(overrides)
+
+    sim_params = model_sim_params(
+        entry.get('model', 'straight_pipe'), entry_params(entry), **settings
+    )
+
+    # * Only the scenario which the plan picked writes a shared geometry
+    # * view, unless the overrides gave this one a geometry of its own
+    geometry_view = entry.get('geometry_view')
+    if geometry_view is not None and (
+        geometry_view['filename'] == sim_params['geometry_filename']
+    ):
+        sim_params['output_geometry'] = entry['output_geometry']
+
+    return sim_params
+
+
+if __name__ == '__main__':
+    all_params_values = load_parameter_grid(parameters_values_filename)
+
+    grid_densities = {}
+    if use_grid_convergence:
+        grid_densities = load_grid_densities(grid_convergence_filename)
+
+    # * Set up output folder
+    output_folder = Path.cwd() / output_folder_name
+    output_folder.mkdir(exist_ok=True)
+
+    # * Only scenarios which are new, or whose input file would change, are
+    # * written. Everything else is left byte-identical.
+    previous_plan = scenario_plan.load_plan(output_folder)
+    plan = {}
+    new_scenarios = []
+    changed_scenarios = []
+
+    parameter_names = MODELS[model]['parameter_names']
+
+    # * Geometry views already written by an earlier scenario of the sweep
+    geometry_views = set()
+
+    # * Scenarios of each family, by family key, in sweep order
+    families = {}
+
+    for params in all_params_values:
+        named_params = dict(zip(parameter_names, params))
+        sim_params = model_sim_params(
+            model,
+            params,
+            grid_density=grid_densities.get(
+                (named_params['fund_freq'], named_params['soil_name'])
+            ),
         )
 
-    template_output = jinja2_template.render(params=sim_params)
+        if sim_params['geometry_filename'] in geometry_views:
+            sim_params['output_geometry'] = False
+        elif sim_params['output_geometry']:
+            geometry_views.add(sim_params['geometry_filename'])
 
-    simulation_file = output_folder / simulation_filename
+        template_output = render_scenario(sim_params)
 
-    with simulation_file.open(mode='w') as out_file:
-        out_file.write(template_output)
+        name = scenario_filename(params, model)
+        simulation_file = output_folder / '.'.join(
+            [name, INPUT_EXTENSIONS[input_format]]
+        )
+
+        if scenario_plan.write_if_changed(simulation_file, template_output):
+            if name in previous_plan:
+                changed_scenarios.append(name)
+            else:
+                new_scenarios.append(name)
+
+        plan[name] = plan_entry(params, sim_params)
+        plan[name]['content_hash'] = scenario_plan.content_hash(
+            template_output
+        )
+
+        if pack_families:
+            families.setdefault(family_key(sim_params), []).append(
+                (name, sim_params)
+            )
+
+    packed_families = 0
+    if families:
+        families_folder = output_folder / scenario_plan.FAMILIES_FOLDER_NAME
+        families_folder.mkdir(exist_ok=True)
+
+    for key, members in families.items():
+        for start in range(0, len(members), max_family_size):
+            family_members = members[start:start + max_family_size]
+            if len(family_members) < 2:
+                continue
+
+            family_name = f'{model}_family_{key}'
+            if len(members) > max_family_size:
+                family_name += f'_{start // max_family_size}'
+
+            scenario_plan.write_if_changed(
+                families_folder / f'{family_name}.py',
+                render_family(family_members)
+            )
+            for index, (name, _) in enumerate(family_members, start=1):
+                plan[name]['family'] = {
+                    'name': family_name,
+                    'index': index,
+                    'size': len(family_members),
+                }
+            packed_families += 1
+
+    removed_scenarios = sorted(set(previous_plan) - set(plan))
+
+    scenario_plan.save_plan(output_folder, plan)
+    delta_file = scenario_plan.save_delta(
+        output_folder, new_scenarios + changed_scenarios
+    )
+
+    print(
+        f"{len(new_scenarios)} new, {len(changed_scenarios)} changed, "
+        f"{len(plan) - len(new_scenarios) - len(changed_scenarios)} "
+        f"unchanged scenarios, delta written to {delta_file}"
+    )
+    if packed_families:
+        print(
+            f"{packed_families} families of "
+            f"{sum('family' in entry for entry in plan.values())} "
+            f"scenarios packed into {scenario_plan.FAMILIES_FOLDER_NAME}"
+        )
+    if geometry_views:
+        print(
+            f"{len(geometry_views)} geometry views shared by "
+            f"{len(plan)} scenarios"
+        )
+    if removed_scenarios:
+        print(
+            f"{len(removed_scenarios)} scenarios are no longer in "
+            f"{parameters_values_filename}, their files were left in place:"
+        )
+        for name in removed_scenarios:
+            print(f"  {name}")
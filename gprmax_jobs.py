@@ -0,0 +1,341 @@
+import os
+import sys
+import math
+import shutil
+import hashlib
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+
+# * gprMax writes the processed input next to the input, with this suffix
+PROCESSED_SUFFIX = "_processed"
+
+
+def discover_scenarios(scenarios_folder: Path) -> List[Path]:
+    """Finds the scenario input files in a folder
+
+    Both `#python:` inputs (`.py`) and native hash command inputs (`.in`)
+    are found. Processed inputs written by gprMax are not scenarios. If a
+    `.py` and a `.in` file share a name, the `.in` file is a leftover
+    processed input from an interrupted run, so the `.py` file is used.
+
+    Args:
+        scenarios_folder: A `Path` to the folder with the input files
+
+    Returns:
+        A `list` of `Path` objects, one per scenario, sorted by name
+
+    Raises:
+        Nothing
+    """
+    scenarios = {}
+
+    for suffix in (".in", ".py"):
+        for input_file in scenarios_folder.glob("*" + suffix):
+            if not input_file.stem.endswith(PROCESSED_SUFFIX):
+                scenarios[input_file.stem] = input_file
+
+    return [scenarios[name] for name in sorted(scenarios)]
+
+
+def processed_cache_key(scenario_file: Path) -> str:
+    """Hashes the contents of an input file to key its processed input"""
+    return hashlib.sha256(scenario_file.read_bytes()).hexdigest()
+
+
+def prepare_run_file(scenario_file: Path, cache_folder: Path) -> Path:
+    """Picks the file gprMax should run for a scenario
+
+    Native inputs are run as they are. For a `#python:` input whose
+    processed input is already cached, the cached copy is placed next to
+    it with the same name and a `.in` extension, so that gprMax skips the
+    Python interpreter but still names all the outputs after the scenario.
+
+    Args:
+        scenario_file: A `Path` to the scenario input file
+        cache_folder: A `Path` to the processed input cache
+
+    Returns:
+        The `Path` of the file to run
+
+    Raises:
+        Nothing
+    """
+    if scenario_file.suffix != ".py":
+        return scenario_file
+
+    cached_file = cache_folder / ".".join(
+        [processed_cache_key(scenario_file), "in"]
+    )
+    if not cached_file.exists():
+        return scenario_file
+
+    run_file = scenario_file.with_suffix(".in")
+    shutil.copyfile(cached_file, run_file)
+
+    return run_file
+
+
+def finish_run_file(
+    scenario_file: Path, run_file: Path, cache_folder: Path
+) -> None:
+    """Caches the processed input of a run, or removes a temporary copy
+
+    Args:
+        scenario_file: A `Path` to the scenario input file
+        run_file: The `Path` returned by `prepare_run_file`
+        cache_folder: A `Path` to the processed input cache
+
+    Returns:
+        Nothing
+
+    Raises:
+        Nothing
+    """
+    if run_file != scenario_file:
+        run_file.unlink()
+        return
+
+    processed_file = scenario_file.with_name(
+        scenario_file.stem + PROCESSED_SUFFIX + ".in"
+    )
+    if scenario_file.suffix == ".py" and processed_file.exists():
+        cache_folder.mkdir(exist_ok=True)
+        shutil.move(
+            str(processed_file),
+            str(
+                cache_folder / ".".join(
+                    [processed_cache_key(scenario_file), "in"]
+                )
+            )
+        )
+
+
+def gprmax_command(
+    scenario_file: Path, write_processed: bool = True, model_runs: int = 1
+) -> List[str]:
+    """Builds the command line which runs gprMax on one input file
+
+    Args:
+        scenario_file: A `Path` to a gprMax input file
+        write_processed: Whether gprMax should also write the processed
+                         input file, i.e. with Python blocks executed
+        model_runs: How many models gprMax runs from the input file, e.g.
+                    the scenarios of a packed family
+
+    Returns:
+        A `list` of `str` to pass to `subprocess`
+
+    Raises:
+        Nothing
+    """
+    command = [sys.executable, "-m", "gprMax", str(scenario_file)]
+
+    if write_processed:
+        command.append("--write-processed")
+
+    if model_runs > 1:
+        command.extend(["-n", str(model_runs)])
+
+    return command
+
+
+def launch_job(
+    scenario_file: Path,
+    threads: Optional[int],
+    log_file: Path,
+    write_processed: bool = True,
+    model_runs: int = 1,
+) -> subprocess.Popen:
+    """Starts gprMax on one input file in a separate process
+
+    Running each model in its own process is what allows several models to
+    run at once, each with its own number of OpenMP threads.
+
+    Args:
+        scenario_file: A `Path` to a gprMax input file
+        threads: The number of OpenMP threads, or `None` to let gprMax use
+                 all the cores of the node
+        log_file: A `Path` where the gprMax console output is written
+        write_processed: Whether gprMax should also write the processed
+                         input file
+        model_runs: How many models gprMax runs from the input file
+
+    Returns:
+        The `subprocess.Popen` object of the running job
+
+    Raises:
+        Nothing
+    """
+    environment = dict(os.environ)
+    if threads is not None:
+        environment["OMP_NUM_THREADS"] = str(threads)
+
+    with log_file.open(mode="w") as log_handle:
+        return subprocess.Popen(
+            gprmax_command(scenario_file, write_processed, model_runs),
+            stdout=log_handle,
+            stderr=subprocess.STDOUT,
+            cwd=str(scenario_file.parent),
+            env=environment,
+        )
+
+
+def split_family_outputs(
+    family_file: Path,
+    members: List[Path],
+    geometry_views: List[Optional[str]],
+) -> List[Path]:
+    """Moves the outputs of a packed family run to its scenarios
+
+    gprMax appends the model number to the outputs of each model of a
+    multi-model run, i.e. `<family>n.out`, `<family>_snapsn`, and the
+    geometry views. Each is moved next to the input file of its scenario,
+    under the name a run of that input on its own would have given it.
+
+    Args:
+        family_file: A `Path` to the packed input file
+        members: The scenario input files, in the order of the models
+        geometry_views: The filename of the shared geometry view each
+                        scenario writes, or `None`, in the same order
+
+    Returns:
+        A `list` with the `.out` file of every scenario which has one
+
+    Raises:
+        Nothing
+    """
+    output_files = []
+
+    for index, (scenario_file, geometry_view) in enumerate(
+        zip(members, geometry_views), start=1
+    ):
+        family_output = family_file.with_name(
+            f"{family_file.stem}{index}.out"
+        )
+        if family_output.exists():
+            output_file = scenario_file.with_suffix(".out")
+            shutil.move(str(family_output), str(output_file))
+            output_files.append(output_file)
+
+        family_snapshots = family_file.with_name(
+            f"{family_file.stem}_snaps{index}"
+        )
+        if family_snapshots.is_dir():
+            snapshots_folder = scenario_file.with_name(
+                f"{scenario_file.stem}_snaps"
+            )
+            if snapshots_folder.is_dir():
+                shutil.rmtree(snapshots_folder)
+            shutil.move(str(family_snapshots), str(snapshots_folder))
+
+        if geometry_view is not None:
+            family_view = family_file.with_name(f"{geometry_view}{index}.vti")
+            if family_view.exists():
+                shutil.move(
+                    str(family_view),
+                    str(scenario_file.with_name(f"{geometry_view}.vti"))
+                )
+
+    return output_files
+
+
+def load_thread_profile(filename: str) -> List[Dict]:
+    """Reads the thread and concurrency profile written by the autotuner
+
+    Args:
+        filename: A `str` with the YAML file written by `autotune_threads.py`
+
+    Returns:
+        A `list` of profile entries, each with the number of `cells` of the
+        benchmarked grid and the best `threads` and `workers` for it. The
+        `list` is empty if the file does not exist, or was written on a
+        machine with a different number of cores.
+
+    Raises:
+        Nothing
+    """
+    if not Path(filename).exists():
+        return []
+
+    with open(filename, "r") as input_file:
+        thread_profile = yaml.safe_load(input_file) or {}
+
+    if thread_profile.get("cpu_count") != os.cpu_count():
+        return []
+
+    return sorted(thread_profile.get("profiles", []), key=lambda p: p["cells"])
+
+
+def closest_profile(profiles: List[Dict], cells: float) -> Optional[Dict]:
+    """Finds the profile entry whose benchmarked grid is closest in size
+
+    Sizes are compared on a logarithmic scale.
+
+    Args:
+        profiles: The `list` returned by `load_thread_profile`
+        cells: The number of cells of the grid to run
+
+    Returns:
+        The closest profile entry, or `None` without a profile
+
+    Raises:
+        Nothing
+    """
+    if not profiles:
+        return None
+
+    return min(
+        profiles,
+        key=lambda profile: abs(
+            math.log(max(profile["cells"], 1)) - math.log(max(cells, 1))
+        )
+    )
+
+
+def profile_for_cells(
+    profiles: List[Dict], cells: float
+) -> Tuple[Optional[int], int]:
+    """Picks the threads and concurrency for a grid of a given size
+
+    Args:
+        profiles: The `list` returned by `load_thread_profile`
+        cells: The number of cells of the grid to run
+
+    Returns:
+        A `tuple` with the number of OpenMP threads per run and the number
+        of concurrent runs. Without a profile, this is `(None, 1)`, i.e. a
+        single run using all the cores.
+
+    Raises:
+        Nothing
+    """
+    closest = closest_profile(profiles, cells)
+    if closest is None:
+        return None, 1
+
+    return closest["threads"], closest["workers"]
+
+
+def profile_job_rate(profiles: List[Dict], cells: float) -> Optional[float]:
+    """Estimates the throughput of a single run from the thread profile
+
+    Args:
+        profiles: The `list` returned by `load_thread_profile`
+        cells: The number of cells of the grid to run
+
+    Returns:
+        The cells per second of one of the concurrent runs, or `None` without
+        a profile
+
+    Raises:
+        Nothing
+    """
+    closest = closest_profile(profiles, cells)
+    if closest is None or not closest.get("cells_per_second"):
+        return None
+
+    return closest["cells_per_second"] / closest["workers"]
@@ -0,0 +1,410 @@
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import h5py
+
+
+# * Field components gprMax stores for every receiver
+RX_COMPONENTS = ("Ex", "Ey", "Ez", "Hx", "Hy", "Hz")
+
+# * Mapping of VTK data type names to `numpy` dtypes, used for snapshots
+VTK_DTYPES = {
+    "Float32": "f4",
+    "Float64": "f8",
+    "Int8": "i1",
+    "Int16": "i2",
+    "Int32": "i4",
+    "UInt8": "u1",
+    "UInt16": "u2",
+    "UInt32": "u4",
+}
+
+
+def read_output_metadata(output_path: Path) -> Dict:
+    """Reads the model metadata stored in a gprMax output file
+
+    Args:
+        output_path: A `Path` to a gprMax `.out` HDF5 file
+
+    Returns:
+        A `dict` with the title, number of iterations, time step `dt`, the
+        spatial resolution, and a `list` of receivers. Each receiver is a
+        `dict` with its HDF5 group name, `Name` attribute, and position.
+
+    Raises:
+        Nothing
+    """
+    with h5py.File(output_path, "r") as output_file:
+        metadata = {
+            "title": output_file.attrs.get("Title", ""),
+            "iterations": int(output_file.attrs["Iterations"]),
+            "dt": float(output_file.attrs["dt"]),
+            "dx_dy_dz": tuple(
+                float(value) for value in output_file.attrs["dx_dy_dz"]
+            ),
+            "receivers": [],
+        }
+
+        for rx_group_name in sorted(
+            output_file.get("rxs", {}), key=natural_sort_key
+        ):
+            rx_group = output_file["rxs"][rx_group_name]
+            metadata["receivers"].append(
+                {
+                    "group": rx_group_name,
+                    "name": rx_group.attrs.get("Name", rx_group_name),
+                    "position": tuple(
+                        float(value) for value in rx_group.attrs["Position"]
+                    ),
+                }
+            )
+
+    return metadata
+
+
+def read_receivers(
+    output_path: Path, components: Optional[Tuple[str, ...]] = None
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """Reads receiver field components from a gprMax output file
+
+    Args:
+        output_path: A `Path` to a gprMax `.out` HDF5 file
+        components: An optional `tuple` of component names, e.g. `("Ez",)`.
+                    All six field components are read if it is not given.
+
+    Returns:
+        A `dict` keyed by receiver group name, e.g. `rx1`, where each value
+        is a `dict` mapping component names to 1D `numpy` arrays.
+
+    Raises:
+        Nothing
+    """
+    if components is None:
+        components = RX_COMPONENTS
+
+    receivers = {}
+
+    with h5py.File(output_path, "r") as output_file:
+        for rx_group_name in sorted(
+            output_file.get("rxs", {}), key=natural_sort_key
+        ):
+            rx_group = output_file["rxs"][rx_group_name]
+            receivers[rx_group_name] = {
+                component: rx_group[component][()]
+                for component in components
+                if component in rx_group
+            }
+
+    return receivers
+
+
+def receiver_level_db(
+    trace: np.ndarray,
+    dt: float,
+    fund_freq: Optional[float] = None,
+    periods: int = 10,
+) -> float:
+    """Extracts the steady-state level of a continuous-wave receiver trace
+
+    The level is the RMS value over the end of the trace, expressed in dB.
+    When the fundamental frequency is known an integer number of periods is
+    used, which removes the ripple from a partial period. Otherwise, the
+    last quarter of the trace is used.
+
+    Only the end of the trace is read, so a view from `map_receivers` only
+    loads those samples from disk.
+
+    Args:
+        trace: A 1D `numpy` array with a single field component, or a view
+               returned by `map_receivers`
+        dt: The time step of the simulation, in seconds
+        fund_freq: The frequency of the `contsine` excitation, in Hz
+        periods: How many periods at the end of the trace to average over
+
+    Returns:
+        The RMS level of the trace in dB, i.e. `20 * log10(rms)`
+
+    Raises:
+        Nothing
+    """
+    if fund_freq is not None:
+        window = int(round(periods / (fund_freq * dt)))
+    else:
+        window = len(trace) // 4
+
+    window = int(np.clip(window, 1, len(trace)))
+    tail = np.asarray(trace[len(trace) - window:], dtype=np.float64)
+    rms = np.sqrt(np.mean(np.square(tail)))
+
+    return float(20 * np.log10(np.maximum(rms, np.finfo(np.float64).tiny)))
+
+
+def receiver_phasor(
+    trace: np.ndarray, dt: float, fund_freq: float, periods: int = 10
+) -> complex:
+    """Extracts the steady-state phasor of a continuous-wave receiver trace
+
+    The trace is correlated with the excitation frequency over an integer
+    number of periods at its end. The phase is relative to the start of
+    the simulation.
+
+    Args:
+        trace: A 1D `numpy` array with a single field component, or a view
+               returned by `map_receivers`
+        dt: The time step of the simulation, in seconds
+        fund_freq: The frequency of the `contsine` excitation, in Hz
+        periods: How many periods at the end of the trace to use
+
+    Returns:
+        The complex amplitude of the trace at `fund_freq`, i.e. the peak
+        value and phase of the sine wave
+
+    Raises:
+        Nothing
+    """
+    window = int(np.clip(round(periods / (fund_freq * dt)), 1, len(trace)))
+    tail = np.asarray(trace[len(trace) - window:], dtype=np.float64)
+    times = np.arange(len(trace) - window, len(trace)) * dt
+
+    return complex(
+        2 / window * np.sum(tail * np.exp(-2j * np.pi * fund_freq * times))
+    )
+
+
+class LazyComponent:
+    """A receiver component which is only read from disk when sliced
+
+    Used for datasets which cannot be memory-mapped, e.g. compressed ones.
+    The file is opened for each read, so no handle is kept open.
+
+    Args:
+        output_path: A `Path` to the HDF5 file
+        dataset_name: The full name of the dataset, e.g. `/rxs/rx1/Ez`
+        shape: The shape of the dataset
+        dtype: The `numpy` dtype of the dataset
+    """
+
+    def __init__(
+        self, output_path: Path, dataset_name: str, shape: Tuple, dtype
+    ):
+        self.output_path = output_path
+        self.dataset_name = dataset_name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.ndim = len(self.shape)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        with h5py.File(self.output_path, "r") as output_file:
+            return output_file[self.dataset_name][key]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        values = self[()]
+        return values if dtype is None else values.astype(dtype)
+
+
+def map_receivers(
+    output_path: Path, components: Optional[Tuple[str, ...]] = None
+) -> Dict[str, Dict[str, Union[np.memmap, LazyComponent]]]:
+    """Opens receiver components without reading them into memory
+
+    gprMax stores receiver components as contiguous, uncompressed datasets,
+    which are returned as read-only `numpy.memmap` views of the file, so
+    slicing one only reads the bytes of that slice. Datasets stored any
+    other way, e.g. the compressed ones of reduced files, are returned as a
+    `LazyComponent`, which reads only the requested slice through `h5py`.
+    The metadata is in `read_output_metadata`, which only reads attributes.
+
+    Args:
+        output_path: A `Path` to a gprMax `.out` HDF5 file
+        components: An optional `tuple` of component names, e.g. `("Ez",)`.
+                    All six field components are opened if it is not given.
+
+    Returns:
+        A `dict` with the same layout as `read_receivers`
+
+    Raises:
+        Nothing
+    """
+    if components is None:
+        components = RX_COMPONENTS
+
+    receivers = {}
+
+    with h5py.File(output_path, "r") as output_file:
+        for rx_group_name in sorted(
+            output_file.get("rxs", {}), key=natural_sort_key
+        ):
+            rx_group = output_file["rxs"][rx_group_name]
+            receivers[rx_group_name] = {}
+
+            for component in components:
+                if component not in rx_group:
+                    continue
+
+                dataset = rx_group[component]
+                offset = dataset.id.get_offset()
+
+                if (
+                    dataset.chunks is None and offset is not None and
+                    dataset.dtype.kind in "fiuc" and dataset.size > 0
+                ):
+                    values = np.memmap(
+                        output_path, dtype=dataset.dtype, mode="r",
+                        offset=offset, shape=dataset.shape,
+                    )
+                else:
+                    values = LazyComponent(
+                        output_path, dataset.name, dataset.shape,
+                        dataset.dtype
+                    )
+
+                receivers[rx_group_name][component] = values
+
+    return receivers
+
+
+def iter_chunks(
+    values: Union[np.ndarray, LazyComponent],
+    chunk_samples: int,
+    start: int = 0,
+) -> Iterator[np.ndarray]:
+    """Reads a long receiver component a chunk at a time
+
+    Args:
+        values: An array, or a view returned by `map_receivers`
+        chunk_samples: How many samples to read at a time
+        start: The first sample to read
+
+    Returns:
+        An iterator over `float64` arrays of at most `chunk_samples` samples
+
+    Raises:
+        Nothing
+    """
+    for chunk_start in range(start, len(values), chunk_samples):
+        yield np.asarray(
+            values[chunk_start:chunk_start + chunk_samples], dtype=np.float64
+        )
+
+
+def find_snapshot_files(
+    output_folder: Path, scenario_name: str, model_runs: int = 1
+) -> List[Path]:
+    """Finds the snapshot `.vti` files gprMax wrote for a scenario
+
+    Depending on the gprMax version, snapshots are either written next to
+    the input file, or inside a `<input name>_snaps` folder. Each model of a
+    multi-model run has its own `<input name>_snaps<n>` folder.
+
+    Args:
+        output_folder: A `Path` to the folder with the scenario input file
+        scenario_name: The scenario input filename without its extension
+        model_runs: The number of models the input was run with, see
+                    `gprmax_jobs.launch_job`
+
+    Returns:
+        A sorted `list` of `Path` objects, possibly empty
+
+    Raises:
+        Nothing
+    """
+    snapshot_files = set(output_folder.glob(f"{scenario_name}_snapshot*.vti"))
+
+    folder_names = [f"{scenario_name}_snaps"]
+    if model_runs > 1:
+        folder_names = [
+            f"{scenario_name}_snaps{index}"
+            for index in range(1, model_runs + 1)
+        ]
+
+    for folder_name in folder_names:
+        snapshots_folder = output_folder / folder_name
+        if snapshots_folder.is_dir():
+            snapshot_files.update(snapshots_folder.glob("*.vti"))
+
+    return sorted(snapshot_files, key=lambda path: natural_sort_key(path.name))
+
+
+def read_vti_arrays(vti_path: Path) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """Reads a VTK ImageData file with raw appended data, as used by gprMax
+
+    Args:
+        vti_path: A `Path` to a `.vti` snapshot or geometry file
+
+    Returns:
+        A `tuple` with a `dict` holding the `WholeExtent`, `Origin`, and
+        `Spacing` of the image, and a `dict` mapping each data array name to
+        a `numpy` array of shape `(nz, ny, nx, components)`.
+
+    Raises:
+        ValueError: If the file does not contain raw appended data
+    """
+    raw = vti_path.read_bytes()
+
+    appended_start = raw.find(b"<AppendedData")
+    if appended_start < 0:
+        raise ValueError(f"{vti_path} has no appended data section")
+    data_start = raw.index(b"_", raw.index(b">", appended_start)) + 1
+
+    header = raw[:appended_start].decode("utf-8")
+
+    byte_order = "<"
+    if 'byte_order="BigEndian"' in header:
+        byte_order = ">"
+
+    header_type = _xml_attributes(
+        re.search(r"<VTKFile[^>]*>", header).group(0)
+    ).get("header_type", "UInt32")
+    size_dtype = np.dtype(byte_order + VTK_DTYPES[header_type])
+
+    image_attributes = _xml_attributes(
+        re.search(r"<ImageData[^>]*>", header).group(0)
+    )
+    extent = [int(value) for value in image_attributes["WholeExtent"].split()]
+    cells = (
+        max(extent[5] - extent[4], 1),
+        max(extent[3] - extent[2], 1),
+        max(extent[1] - extent[0], 1),
+    )
+
+    image_info = {
+        "WholeExtent": extent,
+        "Origin": [float(v) for v in image_attributes["Origin"].split()],
+        "Spacing": [float(v) for v in image_attributes["Spacing"].split()],
+    }
+
+    arrays = {}
+    for tag in re.findall(r"<DataArray[^>]*>", header):
+        attributes = _xml_attributes(tag)
+        if attributes.get("format") != "appended":
+            continue
+
+        offset = data_start + int(attributes["offset"])
+        nbytes = int(np.frombuffer(raw, size_dtype, 1, offset)[0])
+        dtype = np.dtype(byte_order + VTK_DTYPES[attributes["type"]])
+        components = int(attributes.get("NumberOfComponents", 1))
+
+        values = np.frombuffer(
+            raw, dtype, nbytes // dtype.itemsize, offset + size_dtype.itemsize
+        )
+        arrays[attributes["Name"]] = values.reshape(cells + (components,))
+
+    return image_info, arrays
+
+
+def _xml_attributes(tag: str) -> Dict[str, str]:
+    """Extracts the attributes of a single XML tag into a `dict`"""
+    return dict(re.findall(r'(\w+)="([^"]*)"', tag))
+
+
+def natural_sort_key(name: str) -> List:
+    """Sort key which orders `rx2` before `rx10`, used for receiver groups"""
+    return [
+        int(part) if part.isdigit() else part
+        for part in re.split(r"(\d+)", name)
+    ]
@@ -0,0 +1,332 @@
+import datetime
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import yaml
+import numpy as np
+
+import gprMax
+from gprMax.exceptions import GeneralError
+
+import grid_spacing
+import gprmax_outputs
+import generate_scenario_files as generator
+from logger_setup import setup_logger
+
+
+# ! Grid convergence study settings
+
+convergence_folder_name = "grid_convergence"
+
+# * Grid densities to try in `harmonic` grid spacing mode, as cells per
+# * shortest wavelength. The first one is the reference all the others are
+# * compared to, so it should be the finest, normally the generator's
+# * default of 10.
+grid_densities = [10, 8, 7, 6, 5, 4]
+
+# * In `waveform` mode, the densities to try are these multiples of the
+# * density the dispersion target of each frequency needs, see
+# * `class_grid_densities`, so no grid is coarser than that target allows
+waveform_density_factors = [2.0, 1.5, 1.25, 1.0]
+
+# * The largest change in receiver level, in dB, relative to the reference
+# * grid that is still considered converged
+tolerance_db = 0.5
+
+# * The representative subset of the model selected in the generator. Each
+# * frequency and soil class is simulated with these pipe parameters, at the
+# * driest and the wettest soil, since the permittivity of wet soil sets the
+# * finest grid spacing. Models without a parameter ignore it.
+representative_pipe_diameter = 225e-3
+representative_pipe_length = 2.0
+representative_pipe_burial_depth = 0.5
+
+# * Receiver component used to compare the different grids
+level_component = "Ez"
+
+# ! Grid convergence study settings end
+
+
+def representative_scenarios(
+    all_params_values: List[Tuple], model_name: str
+) -> Dict[Tuple[float, str], List[Tuple]]:
+    """Selects the scenarios used to study each frequency and soil class
+
+    Args:
+        all_params_values: The full sweep, as returned by
+                           `generate_scenario_files.load_parameter_grid`
+        model_name: One of the keys of `generate_scenario_files.MODELS`
+
+    Returns:
+        A `dict` mapping `(fund_freq, soil_name)` to a `list` of scenario
+        parameter `tuple` objects to simulate for that class
+
+    Raises:
+        KeyError: If `model_name` is not a known model
+    """
+    parameter_names = generator.MODELS[model_name]["parameter_names"]
+    representative_params = {
+        "pipe_diameter": representative_pipe_diameter,
+        "pipe_length": representative_pipe_length,
+        "pipe_burial_depth": representative_pipe_burial_depth,
+    }
+
+    classes = {}
+
+    for params in all_params_values:
+        named_params = dict(zip(parameter_names, params))
+        classes.setdefault(
+            (named_params["fund_freq"], named_params["soil_name"]), set()
+        ).add(named_params["soil_water_content"])
+
+    subset = {}
+    for (fund_freq, soil_name), water_contents in classes.items():
+        subset[(fund_freq, soil_name)] = []
+
+        for soil_water_content in sorted(
+            {min(water_contents), max(water_contents)}
+        ):
+            class_params = dict(
+                representative_params,
+                fund_freq=fund_freq,
+                soil_name=soil_name,
+                soil_water_content=soil_water_content,
+            )
+            subset[(fund_freq, soil_name)].append(
+                tuple(class_params[name] for name in parameter_names)
+            )
+
+    return subset
+
+
+def class_grid_densities(fund_freq: float) -> List[float]:
+    """Lists the grid densities to try for one frequency, finest first
+
+    Args:
+        fund_freq: The frequency of the class, in Hz
+
+    Returns:
+        `grid_densities` in `harmonic` mode. In `waveform` mode, the
+        `waveform_density_factors` multiples of the density which keeps the
+        dispersion of the generator's geometry mode below its target for
+        this frequency.
+
+    Raises:
+        Nothing
+    """
+    if generator.grid_spacing_mode != "waveform":
+        return list(grid_densities)
+
+    dispersion_density = grid_spacing.dispersion_cells_per_wavelength(
+        generator.dispersion_errors.get(
+            fund_freq, generator.max_dispersion_error
+        ),
+        2 if generator.geometry_mode == "2D" else 3
+    )
+
+    return [
+        round(factor * dispersion_density, 2)
+        for factor in waveform_density_factors
+    ]
+
+
+def simulate_levels(
+    model_name: str,
+    params: Tuple,
+    grid_density: float,
+    folder: Path,
+    logger: logging.Logger,
+) -> List[float]:
+    """Runs one scenario at a given grid density and extracts its levels
+
+    Args:
+        model_name: One of the keys of `generate_scenario_files.MODELS`
+        params: A `tuple` with the sweep parameter values of the scenario
+        grid_density: The number of cells per shortest wavelength
+        folder: A `Path` to the folder for the input and output files
+        logger: The `Logger` to report progress to
+
+    Returns:
+        A `list` with the level, in dB, at each receiver in the model
+
+    Raises:
+        GeneralError: If gprMax fails to run the model
+    """
+    sim_params = generator.model_sim_params(
+        model_name, params, grid_density=grid_density
+    )
+    simulation_name = "_".join(
+        [generator.scenario_filename(params, model_name), f"cpw{grid_density}"]
+    )
+
+    # * Geometry views and snapshots are not needed to compare levels
+    sim_params.update(
+        {
+            "geometry_filename": simulation_name,
+            "output_geometry": False,
+            "output_snapshots": False,
+        }
+    )
+
+    simulation_file = folder / ".".join([simulation_name, "py"])
+    output_file = folder / ".".join([simulation_name, "out"])
+
+    if not output_file.exists():
+        simulation_file.write_text(
+            generator.render_scenario(sim_params, "python")
+        )
+        logger.info(
+            "Running %s, delta_d %.4g m", simulation_file.name,
+            sim_params["delta_d"]
+        )
+        gprMax.gprMax.api(str(simulation_file))
+    else:
+        logger.info("Reusing %s", output_file.name)
+
+    metadata = gprmax_outputs.read_output_metadata(output_file)
+    receivers = gprmax_outputs.read_receivers(output_file, (level_component,))
+
+    return [
+        gprmax_outputs.receiver_level_db(
+            receivers[receiver["group"]][level_component],
+            metadata["dt"],
+            sim_params["fund_freq"],
+        )
+        for receiver in metadata["receivers"]
+    ]
+
+
+def coarsest_converged_density(
+    level_changes: Dict[float, float], tolerance: float
+) -> float:
+    """Picks the coarsest grid density whose level change is in tolerance
+
+    Densities are tested from the finest downwards, and the search stops at
+    the first one out of tolerance, so a coarse grid which happens to agree
+    with the reference by chance is never chosen.
+
+    Args:
+        level_changes: A `dict` mapping grid density to the largest level
+                       change, in dB, relative to the reference grid
+        tolerance: The largest acceptable level change, in dB
+
+    Returns:
+        The smallest acceptable number of cells per shortest wavelength
+
+    Raises:
+        Nothing
+    """
+    densities = sorted(level_changes, reverse=True)
+    chosen = densities[0]
+
+    for density in densities[1:]:
+        if level_changes[density] > tolerance:
+            break
+        chosen = density
+
+    return chosen
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    convergence_logger = setup_logger(
+        "gprMax_grid_convergence", global_timestamp
+    )
+
+    convergence_folder = Path.cwd() / convergence_folder_name
+    convergence_folder.mkdir(exist_ok=True)
+
+    subset = representative_scenarios(
+        generator.load_parameter_grid(generator.parameters_values_filename),
+        generator.model
+    )
+    convergence_logger.info(
+        "Studying %d classes of the %s model in %s grid spacing mode",
+        len(subset), generator.model, generator.grid_spacing_mode
+    )
+
+    classes = []
+
+    for (fund_freq, soil_name), class_scenarios in subset.items():
+        densities = class_grid_densities(fund_freq)
+        reference_density = densities[0]
+        level_changes = {density: 0.0 for density in densities}
+
+        try:
+            for params in class_scenarios:
+                reference_levels = np.array(
+                    simulate_levels(
+                        generator.model, params, reference_density,
+                        convergence_folder, convergence_logger
+                    )
+                )
+                for density in densities[1:]:
+                    try:
+                        levels = np.array(
+                            simulate_levels(
+                                generator.model, params, density,
+                                convergence_folder, convergence_logger
+                            )
+                        )
+                    except GeneralError:
+                        # * A grid gprMax refuses to run is never acceptable
+                        convergence_logger.exception(
+                            "gprMax error at %s cells per wavelength", density
+                        )
+                        level_changes[density] = float("inf")
+                        continue
+
+                    level_changes[density] = max(
+                        level_changes[density],
+                        float(np.max(np.abs(levels - reference_levels)))
+                    )
+        except GeneralError:
+            convergence_logger.exception(
+                "gprMax error, keeping %s cells per wavelength for %g Hz %s",
+                reference_density, fund_freq, soil_name
+            )
+            level_changes = {reference_density: 0.0}
+
+        chosen_density = coarsest_converged_density(
+            level_changes, tolerance_db
+        )
+        convergence_logger.info(
+            "%g Hz %s: %s cells per wavelength, level changes %s",
+            fund_freq, soil_name, chosen_density, level_changes
+        )
+
+        classes.append(
+            {
+                "fund_freq": float(fund_freq),
+                "soil_name": soil_name,
+                "cells_per_wavelength": chosen_density,
+                "reference_density": reference_density,
+                "level_changes_db": {
+                    density: (
+                        round(change, 4) if np.isfinite(change) else None
+                    )
+                    for density, change in level_changes.items()
+                },
+            }
+        )
+
+    with open(generator.grid_convergence_filename, "w") as results_file:
+        yaml.safe_dump(
+            {
+                "model": generator.model,
+                "grid_spacing_mode": generator.grid_spacing_mode,
+                "max_dispersion_error": generator.max_dispersion_error,
+                "dispersion_errors": generator.dispersion_errors,
+                "tolerance_db": tolerance_db,
+                "classes": classes,
+            },
+            results_file,
+            sort_keys=False,
+        )
+
+    convergence_logger.info(
+        "Grid densities written to %s", generator.grid_convergence_filename
+    )
+
+    logging.shutdown()
@@ -0,0 +1,162 @@
+import math
+from typing import Dict, Tuple
+
+
+# * Speed of light in vacuum, in m/s, as used by gprMax. Kept here so that
+# * estimates do not need to import `scipy`.
+SPEED_OF_LIGHT = 299792458.0
+
+# * gprMax reports a fixed overhead on top of the arrays it allocates
+GPRMAX_OVERHEAD_BYTES = 50e6
+
+
+def grid_cells(entry: Dict) -> Tuple[int, int, int]:
+    """Calculates the number of cells along each axis of a scenario
+
+    Args:
+        entry: A scenario plan entry, see `scenario_plan.py`
+
+    Returns:
+        A `tuple` with the number of cells along x, y, and z
+
+    Raises:
+        Nothing
+    """
+    delta_d = entry["delta_d"]
+
+    return tuple(
+        max(int(round(entry["domain"][axis] / delta_d)), 1)
+        for axis in ("x", "y", "z")
+    )
+
+
+def time_step(entry: Dict) -> float:
+    """Calculates the time step gprMax uses, i.e. the Courant limit
+
+    For 2D models, gprMax ignores the axis that is one cell thick.
+
+    Args:
+        entry: A scenario plan entry, see `scenario_plan.py`
+
+    Returns:
+        The time step, in seconds
+
+    Raises:
+        Nothing
+    """
+    delta_d = entry["delta_d"]
+    active_axes = sum(1 for cells in grid_cells(entry) if cells > 1)
+
+    return 1 / (SPEED_OF_LIGHT * math.sqrt(active_axes / delta_d ** 2))
+
+
+def iterations(entry: Dict) -> int:
+    """Calculates the number of iterations of a scenario"""
+    return int(math.ceil(entry["simulation_runtime"] / time_step(entry))) + 1
+
+
+def cell_updates(entry: Dict) -> float:
+    """Calculates the total work of a scenario, i.e. cells times iterations"""
+    nx, ny, nz = grid_cells(entry)
+
+    return float(nx * ny * nz) * iterations(entry)
+
+
+def snapshot_cells(entry: Dict) -> int:
+    """Calculates the number of cells inside one snapshot of a scenario"""
+    nx, ny, nz = grid_cells(entry)
+    y_min, y_max = entry["view_y"]
+    view_ny = min(int(round((y_max - y_min) / entry["delta_d"])), ny)
+
+    return nx * max(view_ny, 1) * nz
+
+
+def estimate_memory_bytes(entry: Dict, float_bytes: int = 4) -> float:
+    """Estimates the memory gprMax needs to run a scenario
+
+    This follows the estimate gprMax prints before a run, i.e. the field,
+    ID, solid, and rigid arrays plus the PML update arrays, and adds the
+    receiver histories and one snapshot buffer, both of which gprMax keeps
+    in memory while running.
+
+    Args:
+        entry: A scenario plan entry, see `scenario_plan.py`
+        float_bytes: Size of the floating point type gprMax was built with,
+                     4 for single and 8 for double precision
+
+    Returns:
+        The estimated peak memory usage, in bytes
+
+    Raises:
+        Nothing
+    """
+    nx, ny, nz = grid_cells(entry)
+
+    # * 6 field arrays and 6 ID arrays, one cell larger along every axis
+    field_arrays = (6 * float_bytes + 6 * 4) * (nx + 1) * (ny + 1) * (nz + 1)
+
+    # * The solid array and the 12 + 6 rigid edge arrays
+    solid_arrays = (4 + 18) * nx * ny * nz
+
+    # * Each PML slab holds two auxiliary arrays per tangential component
+    # * of both the electric and the magnetic field
+    pml_cells = entry["pml_cells"]
+    cross_sections = {0: ny * nz, 1: nx * nz, 2: nx * ny}
+    pml_arrays = 0
+    for side, thickness in enumerate(pml_cells):
+        if thickness > 0:
+            pml_arrays += 8 * (thickness + 1) * cross_sections[side % 3]
+    pml_arrays *= float_bytes
+
+    receiver_arrays = (
+        6 * len(entry["receivers"]) * iterations(entry) * float_bytes
+    )
+
+    snapshot_arrays = 0
+    if entry["output_snapshots"]:
+        snapshot_arrays = 6 * snapshot_cells(entry) * 4
+
+    return float(
+        GPRMAX_OVERHEAD_BYTES + field_arrays + solid_arrays + pml_arrays +
+        receiver_arrays + snapshot_arrays
+    )
+
+
+def estimate_output_bytes(entry: Dict, float_bytes: int = 4) -> float:
+    """Estimates the disk space the outputs of a scenario take up
+
+    This covers the receiver histories of the `.out` file, the E and H
+    fields of every snapshot, and the material, source, and receiver IDs of
+    the geometry view.
+
+    Args:
+        entry: A scenario plan entry, see `scenario_plan.py`
+        float_bytes: Size of the floating point type gprMax was built with,
+                     4 for single and 8 for double precision
+
+    Returns:
+        The estimated size of the outputs, in bytes
+
+    Raises:
+        Nothing
+    """
+    output_bytes = (
+        6 * len(entry["receivers"]) * iterations(entry) * float_bytes
+    )
+
+    if entry["output_snapshots"]:
+        output_bytes += (
+            entry["snapshots_count"] * 6 * snapshot_cells(entry) * 4
+        )
+
+    if entry["output_geometry"]:
+        # * Only the scenario which writes a shared view counts it, at the
+        # * step of the view
+        view_cells = float(snapshot_cells(entry))
+        geometry_view = entry.get("geometry_view")
+        if geometry_view is not None:
+            for axis_step in geometry_view["step"].values():
+                view_cells /= max(round(axis_step / entry["delta_d"]), 1)
+        output_bytes += (4 + 1 + 1) * view_cells
+
+    return float(output_bytes)
@@ -0,0 +1,182 @@
+import numpy as np
+from scipy.constants import speed_of_light
+
+
+# * The highest frequency each gprMax waveform contains, as a multiple of its
+# * frequency. `contsine` ramps up linearly over its first four periods,
+# * which spreads its spectrum by about a quarter of its frequency. The
+# * pulses are resolved up to three times their centre frequency, as the
+# * gprMax documentation recommends. Any other waveform, e.g. the single
+# * period `sine`, is treated as broadband and falls back to `max_harmonic`.
+WAVEFORM_BANDWIDTH_FACTORS = {
+    'contsine': 1.25,
+    'gaussian': 3.0,
+    'gaussiandot': 3.0,
+    'gaussiandotnorm': 3.0,
+    'gaussiandotdot': 3.0,
+    'gaussiandotdotnorm': 3.0,
+    'ricker': 3.0,
+}
+
+
+def round_down_spacing(delta_d: float) -> float:
+    """Truncates a grid spacing to two significant digits
+
+    Copied from SO, this rounds `delta_d` down to a reasonable width so
+    that the domain dimensions and positions in the input files stay short.
+
+    Args:
+        delta_d: The grid spacing, in metres
+
+    Returns:
+        The truncated grid spacing, never larger than `delta_d`
+
+    Raises:
+        Nothing
+    """
+    round_digits = int(np.ceil(-np.log10(delta_d))) + 1
+    round_digits = np.power(10, round_digits)
+
+    return float(np.trunc(delta_d * round_digits) / round_digits)
+
+
+def harmonic_delta_d(
+    fund_freq: float,
+    er_max: float,
+    max_harmonic: int = 5,
+    cells_per_wavelength: float = 10,
+) -> float:
+    """Calculates the grid spacing from the highest harmonic of interest
+
+    The shortest wavelength is taken at `max_harmonic` times the fundamental
+    frequency, inside the material with the highest permittivity, and is
+    then split into `cells_per_wavelength` cells.
+
+    Args:
+        fund_freq: The frequency of the excitation, in Hz
+        er_max: The highest relative permittivity in the model
+        max_harmonic: The highest harmonic of `fund_freq` to resolve
+        cells_per_wavelength: How many cells per shortest wavelength
+
+    Returns:
+        The grid spacing, in metres, rounded down with `round_down_spacing`
+
+    Raises:
+        Nothing
+    """
+    lambda_min = speed_of_light / (max_harmonic * fund_freq)
+    lambda_min_eff = lambda_min / np.sqrt(er_max)
+
+    return round_down_spacing(lambda_min_eff / cells_per_wavelength)
+
+
+def waveform_max_frequency(
+    waveform_type: str, fund_freq: float, max_harmonic: int = 5
+) -> float:
+    """Finds the highest frequency a gprMax waveform contains, in Hz
+
+    See `WAVEFORM_BANDWIDTH_FACTORS`. Unknown waveforms are assumed to
+    reach `max_harmonic` times their frequency, as `harmonic_delta_d` does.
+    """
+    return fund_freq * WAVEFORM_BANDWIDTH_FACTORS.get(
+        waveform_type, max_harmonic
+    )
+
+
+def yee_phase_velocity_error(
+    cells_per_wavelength: float, dimensions: int = 2
+) -> float:
+    """Calculates the numerical dispersion of the Yee scheme
+
+    gprMax runs at the Courant limit, i.e. with a Courant number of
+    `1 / sqrt(dimensions)` on a uniform grid. For that time step, waves
+    travelling along a grid axis are the slowest, so their phase velocity
+    error bounds the error in every direction.
+
+    Args:
+        cells_per_wavelength: How many cells per wavelength, in the material
+                              the wave travels through
+        dimensions: Either 2 or 3, the number of dimensions of the grid
+
+    Returns:
+        The relative phase velocity error, i.e. `1 - v_numerical / v`, or
+        infinity if the grid is too coarse for the wave to propagate
+
+    Raises:
+        Nothing
+    """
+    courant = 1 / np.sqrt(dimensions)
+    half_phase = np.pi / cells_per_wavelength
+
+    numerical_argument = np.sin(courant * half_phase) / courant
+    if numerical_argument >= 1:
+        return float('inf')
+
+    return float(1 - half_phase / np.arcsin(numerical_argument))
+
+
+def dispersion_cells_per_wavelength(
+    max_error: float, dimensions: int = 2
+) -> float:
+    """Finds the coarsest grid which keeps the dispersion below a target
+
+    Args:
+        max_error: The largest acceptable relative phase velocity error, see
+                   `yee_phase_velocity_error`, e.g. `0.005` for 0.5 %
+        dimensions: Either 2 or 3, the number of dimensions of the grid
+
+    Returns:
+        The number of cells per wavelength, to two decimal places, rounded
+        up
+
+    Raises:
+        Nothing
+    """
+    coarse, fine = 2.0, 1e4
+
+    # * The error falls monotonically as the grid gets finer
+    while fine - coarse > 1e-3:
+        middle = (coarse + fine) / 2
+        if yee_phase_velocity_error(middle, dimensions) > max_error:
+            coarse = middle
+        else:
+            fine = middle
+
+    return float(np.ceil(fine * 100) / 100)
+
+
+def waveform_delta_d(
+    fund_freq: float,
+    er_max: float,
+    waveform_type: str,
+    cells_per_wavelength: float,
+    max_harmonic: int = 5,
+) -> float:
+    """Calculates the grid spacing from the spectrum of the excitation
+
+    Unlike `harmonic_delta_d`, the shortest wavelength is taken at the
+    highest frequency the waveform actually contains, so a continuous sine
+    only needs its own wavelength resolved. Pair it with
+    `dispersion_cells_per_wavelength` to pick the number of cells from a
+    target dispersion error.
+
+    Args:
+        fund_freq: The frequency of the excitation, in Hz
+        er_max: The highest relative permittivity in the model
+        waveform_type: The gprMax waveform type, e.g. `contsine`
+        cells_per_wavelength: How many cells per shortest wavelength
+        max_harmonic: The highest harmonic to resolve for waveforms whose
+                      bandwidth is not known
+
+    Returns:
+        The grid spacing, in metres, rounded down with `round_down_spacing`
+
+    Raises:
+        Nothing
+    """
+    lambda_min = speed_of_light / waveform_max_frequency(
+        waveform_type, fund_freq, max_harmonic
+    )
+    lambda_min_eff = lambda_min / np.sqrt(er_max)
+
+    return round_down_spacing(lambda_min_eff / cells_per_wavelength)
@@ -0,0 +1,202 @@
+import re
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import gprmax_outputs
+
+
+# * gprMax reports the iterations of a model with a `tqdm` progress bar, e.g.
+# * `Running simulation, model 1/1:  42%|####   | 420/1000 [00:03<00:04, ...]`
+PROGRESS_PATTERN = re.compile(r"(\d+)/(\d+) \[")
+
+# * Only the end of the log is read, since `tqdm` keeps appending to it
+PROGRESS_TAIL_BYTES = 8192
+
+
+def read_progress(log_file: Path) -> Optional[Tuple[int, int]]:
+    """Reads the latest iteration count from the console log of a run
+
+    Args:
+        log_file: A `Path` to the log `launch_job` writes the output of gprMax
+                  to
+
+    Returns:
+        A `tuple` with the iterations done and the total iterations, or
+        `None` if the log has no progress bar yet
+
+    Raises:
+        Nothing
+    """
+    try:
+        with log_file.open(mode="rb") as log_handle:
+            log_handle.seek(0, 2)
+            log_handle.seek(max(log_handle.tell() - PROGRESS_TAIL_BYTES, 0))
+            tail = log_handle.read().decode("utf-8", errors="ignore")
+    except OSError:
+        return None
+
+    matches = PROGRESS_PATTERN.findall(tail)
+    if not matches:
+        return None
+
+    done, total = matches[-1]
+    return int(done), int(total)
+
+
+def non_finite_arrays(vti_path: Path) -> List[str]:
+    """Lists the arrays of a snapshot which contain NaN or Inf values
+
+    Args:
+        vti_path: A `Path` to a `.vti` snapshot
+
+    Returns:
+        A `list` with the names of the offending arrays, empty if all the
+        values are finite
+
+    Raises:
+        ValueError: If the file is incomplete, e.g. still being written
+    """
+    _, arrays = gprmax_outputs.read_vti_arrays(vti_path)
+
+    return [
+        name for name, values in arrays.items()
+        if values.dtype.kind == "f" and not np.isfinite(values).all()
+    ]
+
+
+def non_finite_receivers(output_file: Path) -> List[str]:
+    """Lists the receivers of an output file with NaN or Inf values
+
+    Args:
+        output_file: A `Path` to a gprMax `.out` file
+
+    Returns:
+        A `list` with the names of the offending receiver groups, empty if
+        all the values are finite
+
+    Raises:
+        Nothing
+    """
+    return [
+        group for group, traces in
+        gprmax_outputs.read_receivers(output_file).items()
+        if not all(np.isfinite(values).all() for values in traces.values())
+    ]
+
+
+class JobWatchdog:
+    """Watches one running gprMax job for stalls, divergence, and overruns
+
+    A job is stalled if its iteration count has not moved for
+    `stall_timeout` seconds, or if no progress bar appeared within
+    `startup_timeout` seconds, which covers building the geometry. It has
+    diverged if a snapshot written so far contains NaN or Inf values. It
+    overruns if it takes more than `runtime_factor` times the runtime
+    predicted from its cell updates, though never less than
+    `startup_timeout`.
+
+    Args:
+        scenario_file: A `Path` to the scenario input file
+        log_file: A `Path` to the console log of the job
+        cell_updates: Cells times iterations of the scenario, or 0 if
+                      unknown, which disables the runtime check
+        stall_timeout: Seconds without progress before the job is stalled
+        startup_timeout: Seconds allowed before the first progress report
+        runtime_factor: How many times the predicted runtime a job may take,
+                        or `None` to disable the runtime check
+        check_snapshots: Whether to check snapshots for NaN or Inf values
+        model_runs: The number of models the job runs, e.g. the size of a
+                    packed family, whose snapshots are numbered
+    """
+
+    def __init__(
+        self,
+        scenario_file: Path,
+        log_file: Path,
+        cell_updates: float,
+        stall_timeout: float,
+        startup_timeout: float,
+        runtime_factor: Optional[float],
+        check_snapshots: bool = True,
+        model_runs: int = 1,
+    ):
+        self.scenario_file = scenario_file
+        self.log_file = log_file
+        self.cell_updates = cell_updates
+        self.stall_timeout = stall_timeout
+        self.startup_timeout = startup_timeout
+        self.runtime_factor = runtime_factor
+        self.check_snapshots = check_snapshots
+        self.model_runs = model_runs
+
+        self.start_time = time.time()
+        self.last_progress_time = self.start_time
+        self.progress = None
+        self.checked_snapshots = set()
+
+    def check(self, cells_per_second: Optional[float] = None) -> Optional[str]:
+        """Checks the job once, meant to be called from a polling loop
+
+        Args:
+            cells_per_second: The throughput expected of a single job, used
+                              to predict its runtime, or `None` if not known
+                              yet
+
+        Returns:
+            The reason to kill the job, or `None` if it looks healthy
+
+        Raises:
+            Nothing
+        """
+        now = time.time()
+        elapsed = now - self.start_time
+
+        progress = read_progress(self.log_file)
+        if progress is not None and progress != self.progress:
+            self.progress = progress
+            self.last_progress_time = now
+
+        if self.progress is None:
+            if elapsed > self.startup_timeout:
+                return (
+                    f"no progress reported within {self.startup_timeout:.0f} s"
+                )
+        elif now - self.last_progress_time > self.stall_timeout:
+            return (
+                f"stalled at iteration {self.progress[0]} of "
+                f"{self.progress[1]} for {now - self.last_progress_time:.0f} s"
+            )
+
+        if self.check_snapshots:
+            for snapshot_file in gprmax_outputs.find_snapshot_files(
+                self.scenario_file.parent, self.scenario_file.stem,
+                self.model_runs
+            ):
+                if snapshot_file in self.checked_snapshots:
+                    continue
+
+                try:
+                    bad_arrays = non_finite_arrays(snapshot_file)
+                except (OSError, ValueError):
+                    # * Probably still being written, try again next time
+                    continue
+
+                self.checked_snapshots.add(snapshot_file)
+                if bad_arrays:
+                    return (
+                        f"NaN or Inf in {', '.join(bad_arrays)} of "
+                        f"{snapshot_file.name}"
+                    )
+
+        if self.runtime_factor and self.cell_updates and cells_per_second:
+            predicted = self.cell_updates / cells_per_second
+            limit = max(self.runtime_factor * predicted, self.startup_timeout)
+            if elapsed > limit:
+                return (
+                    f"running for {elapsed:.0f} s, predicted {predicted:.0f} s"
+                )
+
+        return None
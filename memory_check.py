@@ -0,0 +1,158 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import grid_estimates
+
+
+# * Environment variable which overrides the detected memory, in bytes
+MEMORY_LIMIT_VARIABLE = "GPRMAX_MEMORY_LIMIT"
+
+# * Fallbacks the runner knows how to apply, see `plan_fallback`
+FALLBACKS = ("2D", "smaller_domain", "coarser_grid")
+
+
+def available_memory_bytes() -> float:
+    """Finds how much memory a gprMax run on this node can use
+
+    The smallest of the following limits wins: an explicit override in the
+    `GPRMAX_MEMORY_LIMIT` environment variable, the memory Slurm allocated
+    to the job, the cgroup limit of the container, and the memory the
+    kernel reports as available.
+
+    Args:
+        Nothing
+
+    Returns:
+        The available memory, in bytes, or infinity if nothing is known
+
+    Raises:
+        Nothing
+    """
+    limits = []
+
+    if os.environ.get(MEMORY_LIMIT_VARIABLE):
+        limits.append(float(os.environ[MEMORY_LIMIT_VARIABLE]))
+
+    # * Slurm reports the allocation in megabytes
+    if os.environ.get("SLURM_MEM_PER_NODE"):
+        limits.append(float(os.environ["SLURM_MEM_PER_NODE"]) * 2 ** 20)
+
+    for cgroup_file in (
+        Path("/sys/fs/cgroup/memory.max"),
+        Path("/sys/fs/cgroup/memory/memory.limit_in_bytes"),
+    ):
+        try:
+            value = cgroup_file.read_text().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            limits.append(float(value))
+
+    try:
+        with open("/proc/meminfo", "r") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    limits.append(float(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+
+    return min(limits) if limits else float("inf")
+
+
+def check_memory(
+    entry: Dict, available: float, safety_factor: float
+) -> Tuple[bool, float]:
+    """Compares the memory a scenario needs with what is available
+
+    Args:
+        entry: A scenario plan entry, see `scenario_plan.py`
+        available: The available memory, in bytes
+        safety_factor: Margin applied to the estimate, e.g. `1.2`
+
+    Returns:
+        A `tuple` with a `bool` which is `True` if the scenario fits, and
+        the estimated memory requirement in bytes, including the margin
+
+    Raises:
+        Nothing
+    """
+    required = grid_estimates.estimate_memory_bytes(entry) * safety_factor
+
+    return required <= available, required
+
+
+def plan_fallback(
+    entry: Dict,
+    available: float,
+    safety_factor: float,
+    fallbacks: List[str],
+    smaller_domain_factor: float,
+    coarser_grid_factor: float,
+) -> Optional[Tuple[Dict, Dict, List[str]]]:
+    """Applies fallbacks in order until a scenario fits in memory
+
+    Fallbacks are cumulative, so with `["2D", "coarser_grid"]` a 3D
+    scenario which is still too big in 2D is also made coarser. A fallback
+    may be listed more than once to apply it repeatedly.
+
+    Args:
+        entry: A scenario plan entry, see `scenario_plan.py`
+        available: The available memory, in bytes
+        safety_factor: Margin applied to the memory estimate
+        fallbacks: An ordered `list` of names from `FALLBACKS`
+        smaller_domain_factor: Scaling applied to the soil and air depths by
+                               the `smaller_domain` fallback
+        coarser_grid_factor: Scaling applied to the cells per wavelength by
+                             the `coarser_grid` fallback
+
+    Returns:
+        `None` if the scenario does not fit even with all fallbacks applied.
+        Otherwise, a `tuple` with the new plan entry, the template
+        parameters to render the new input file, and the `list` of
+        fallbacks which were applied.
+
+    Raises:
+        ValueError: If a fallback name is not one of `FALLBACKS`
+    """
+    # * The generator pulls in the dielectric models, so only import it
+    # * when a scenario actually needs to be regenerated
+    import generate_scenario_files as generator
+
+    params = generator.entry_params(entry)
+    overrides = {
+        "grid_density": entry["cells_per_wavelength"],
+        "geometry_mode": entry["geometry_mode"],
+        "soil_depth": entry["soil_depth"],
+        "air_depth": entry["air_depth"],
+    }
+    applied = []
+
+    for fallback in fallbacks:
+        if fallback == "2D":
+            if overrides["geometry_mode"] == "2D":
+                continue
+            overrides["geometry_mode"] = "2D"
+        elif fallback == "smaller_domain":
+            overrides["soil_depth"] *= smaller_domain_factor
+            overrides["air_depth"] *= smaller_domain_factor
+        elif fallback == "coarser_grid":
+            overrides["grid_density"] *= coarser_grid_factor
+        else:
+            raise ValueError(
+                f"Unknown fallback {fallback}, expected one of "
+                f"{', '.join(FALLBACKS)}"
+            )
+        applied.append(fallback)
+
+        sim_params = generator.entry_sim_params(entry, **overrides)
+        new_entry = generator.plan_entry(params, sim_params)
+
+        fits, required = check_memory(new_entry, available, safety_factor)
+        if fits:
+            new_entry["fallbacks"] = applied
+            new_entry["memory_estimate"] = required
+            return new_entry, sim_params, applied
+
+    return None
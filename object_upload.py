@@ -0,0 +1,298 @@
+import time
+import hashlib
+import datetime
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+from s3transfer.utils import ChunksizeAdjuster
+
+from logger_setup import setup_logger
+
+
+# ! Object upload settings
+
+# * Used when this file is run on its own, to upload e.g. the reduced
+# * outputs and the results table after `reduce_outputs.py`
+upload_paths = ["scenarios_reduced", "results_table.csv"]
+
+# * Leave `endpoint_url` as `None` for AWS, or point it at any S3-compatible
+# * store, e.g. `http://127.0.0.1:9000` for a local MinIO server
+bucket_name = "pipebots-gprmax"
+key_prefix = "sweeps"
+endpoint_url = None
+
+upload_workers = 4
+part_size = 64 * 1024 * 1024
+part_threads = 4
+upload_retries = 3
+retry_backoff = 2.0
+
+# ! Object upload settings end
+
+
+def expected_etag(path: Path, part_size: int) -> str:
+    """Calculates the ETag an S3 store reports for an uploaded file
+
+    A single-part upload has the MD5 of the file as its ETag. A multipart
+    upload has the MD5 of the concatenated MD5s of its parts, followed by
+    the number of parts. The part size is adjusted the same way `boto3`
+    does for very large or very small parts.
+
+    Args:
+        path: A `Path` to the file
+        part_size: The multipart threshold and part size, in bytes
+
+    Returns:
+        The expected ETag, without quotes
+
+    Raises:
+        Nothing
+    """
+    size = path.stat().st_size
+
+    if size < part_size:
+        md5 = hashlib.md5()
+        with path.open(mode="rb") as input_file:
+            for block in iter(lambda: input_file.read(1 << 20), b""):
+                md5.update(block)
+        return md5.hexdigest()
+
+    chunk_size = ChunksizeAdjuster().adjust_chunksize(part_size, size)
+
+    part_digests = []
+    with path.open(mode="rb") as input_file:
+        for part in iter(lambda: input_file.read(chunk_size), b""):
+            part_digests.append(hashlib.md5(part).digest())
+
+    combined = hashlib.md5(b"".join(part_digests)).hexdigest()
+
+    return f"{combined}-{len(part_digests)}"
+
+
+def stored_etag(client, bucket: str, key: str) -> Optional[str]:
+    """Gets the ETag of an object without quotes, or `None` if it is missing
+
+    Raises:
+        BotoCoreError, ClientError: If the store fails for another reason
+    """
+    try:
+        etag = client.head_object(Bucket=bucket, Key=key)["ETag"]
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            return None
+        raise
+
+    return etag.strip('"')
+
+
+def upload_file(
+    client,
+    path: Path,
+    bucket: str,
+    key: str,
+    part_size: int,
+    part_threads: int = 4,
+    retries: int = 3,
+    backoff: float = 2.0,
+) -> int:
+    """Uploads a file, in parts if it is large, and verifies its checksum
+
+    A file whose object already has the expected ETag is not uploaded again,
+    so re-running an interrupted upload only sends what is missing.
+
+    Args:
+        client: A `boto3` S3 client
+        path: A `Path` to the file to upload
+        bucket: The name of the bucket
+        key: The object key
+        part_size: The multipart threshold and part size, in bytes
+        part_threads: The number of parts uploaded at the same time
+        retries: How many times to try the upload
+        backoff: Seconds to wait before the first retry, doubled after each
+
+    Returns:
+        The number of bytes uploaded, 0 if the object was already up to date
+
+    Raises:
+        ValueError: If the checksum still differs after the last try
+        BotoCoreError, ClientError: If the last try failed
+    """
+    config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=part_threads,
+    )
+    expected = expected_etag(path, part_size)
+
+    if stored_etag(client, bucket, key) == expected:
+        return 0
+
+    for attempt in range(retries):
+        try:
+            client.upload_file(str(path), bucket, key, Config=config)
+            etag = stored_etag(client, bucket, key)
+            if etag == expected:
+                return path.stat().st_size
+
+            error = ValueError(
+                f"Checksum of {key} is {etag}, expected {expected}"
+            )
+        except (BotoCoreError, ClientError) as upload_error:
+            error = upload_error
+
+        if attempt + 1 < retries:
+            time.sleep(backoff * 2 ** attempt)
+
+    raise error
+
+
+def object_key(prefix: str, relative: Path) -> str:
+    """Joins a key prefix and a relative path with forward slashes"""
+    return "/".join(
+        part for part in (prefix.strip("/"), relative.as_posix()) if part
+    )
+
+
+class UploadSink:
+    """Uploads files to S3-compatible object storage in background threads
+
+    Each submitted batch, e.g. the outputs of one scenario, is uploaded by
+    one worker, with large files split into parts uploaded concurrently.
+
+    Args:
+        bucket: The name of the bucket
+        prefix: Prepended to the path of each file relative to its root
+        endpoint_url: The URL of an S3-compatible store, or `None` for AWS
+        workers: The number of batches uploaded at the same time
+        part_size: The multipart threshold and part size, in bytes
+        part_threads: The number of parts of a file uploaded at the same time
+        retries: How many times to try each file
+        backoff: Seconds to wait before the first retry, doubled after each
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        workers: int = 4,
+        part_size: int = 64 * 1024 * 1024,
+        part_threads: int = 4,
+        retries: int = 3,
+        backoff: float = 2.0,
+    ):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.part_size = part_size
+        self.part_threads = part_threads
+        self.retries = retries
+        self.backoff = backoff
+
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._futures: Dict[str, Future] = {}
+
+    def _upload_batch(self, paths: List[Path], root: Path) -> Tuple[int, int]:
+        uploaded = 0
+        for path in paths:
+            uploaded += upload_file(
+                self._client, path, self.bucket,
+                object_key(self.prefix, path.relative_to(root)),
+                self.part_size, self.part_threads, self.retries, self.backoff
+            )
+
+        return len(paths), uploaded
+
+    def submit(self, name: str, paths: List[Path], root: Path) -> None:
+        """Queues a batch of files for upload
+
+        Args:
+            name: A name for the batch, e.g. the scenario name
+            paths: The files to upload, all inside `root`
+            root: The folder the object keys are relative to
+
+        Returns:
+            Nothing
+        """
+        with self._lock:
+            self._futures[name] = self._executor.submit(
+                self._upload_batch, list(paths), root
+            )
+
+    def busy(self) -> bool:
+        """Whether any batch is still queued or being uploaded"""
+        with self._lock:
+            return any(not future.done() for future in self._futures.values())
+
+    def collect(self) -> List[Tuple[str, Future]]:
+        """Removes and returns the batches whose upload has finished
+
+        Returns:
+            A `list` of `(batch name, future)` tuples. The result of each
+            future is a `tuple` with the number of files and bytes uploaded,
+            or the exception that stopped the batch.
+        """
+        with self._lock:
+            done = [
+                (name, future) for name, future in self._futures.items()
+                if future.done()
+            ]
+            for name, _ in done:
+                del self._futures[name]
+
+        return done
+
+    def shutdown(self) -> None:
+        """Waits for all the queued batches to be uploaded"""
+        self._executor.shutdown(wait=True)
+
+
+def log_uploaded(logger: logging.Logger, name: str, future: Future) -> None:
+    """Reports the outcome of uploading a batch of files"""
+    if future.exception() is not None:
+        logger.error("Uploading %s failed: %s", name, future.exception())
+        return
+
+    files, uploaded = future.result()
+    logger.info(
+        "Uploaded %d files of %s, %.2f GB", files, name, uploaded / 1e9
+    )
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    upload_logger = setup_logger("gprMax_object_upload", global_timestamp)
+
+    sink = UploadSink(
+        bucket_name, key_prefix, endpoint_url, upload_workers, part_size,
+        part_threads, upload_retries, retry_backoff
+    )
+
+    for upload_path in upload_paths:
+        upload_path = Path.cwd() / upload_path
+        if upload_path.is_dir():
+            # * One batch per file, so large folders upload concurrently
+            for path in sorted(upload_path.rglob("*")):
+                if path.is_file():
+                    sink.submit(
+                        str(path.relative_to(Path.cwd())), [path], Path.cwd()
+                    )
+        elif upload_path.is_file():
+            sink.submit(upload_path.name, [upload_path], Path.cwd())
+        else:
+            upload_logger.warning("%s does not exist, skipping", upload_path)
+
+    sink.shutdown()
+    for batch_name, batch_future in sink.collect():
+        log_uploaded(upload_logger, batch_name, batch_future)
+
+    upload_logger.info("Uploads to %s finished", bucket_name)
+
+    logging.shutdown()
@@ -0,0 +1,344 @@
+import os
+import gzip
+import logging
+import shutil
+import threading
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import h5py
+
+import gprmax_outputs
+
+
+# * `.out` files stay HDF5 files with compressed datasets, so they can be
+# * read from the archive as they are. Everything else is gzipped.
+GZIP_SUFFIX = ".gz"
+
+
+def entry_geometry_view(entry: Optional[Dict]) -> Optional[str]:
+    """Gets the filename of the shared geometry view a scenario writes
+
+    Args:
+        entry: A scenario plan entry, or `None` for unplanned scenarios
+
+    Returns:
+        The filename, without its extension, or `None` if the scenario does
+        not write a shared view
+
+    Raises:
+        Nothing
+    """
+    if not entry or not entry.get("output_geometry"):
+        return None
+
+    geometry_view = entry.get("geometry_view")
+    if geometry_view is None:
+        return None
+
+    return geometry_view["filename"]
+
+
+def scenario_output_files(
+    scenario_file: Path, geometry_view: Optional[str] = None
+) -> List[Path]:
+    """Lists the outputs gprMax wrote for a scenario so far
+
+    Args:
+        scenario_file: A `Path` to the scenario input file
+        geometry_view: The filename of the shared geometry view the scenario
+                       writes, see `entry_geometry_view`
+
+    Returns:
+        A `list` with the `.out` file, the geometry view, and the snapshots
+        which exist. Inputs and logs are not included.
+
+    Raises:
+        Nothing
+    """
+    candidates = [
+        scenario_file.with_suffix(".out"),
+        scenario_file.with_suffix(".vti"),
+    ]
+    if geometry_view is not None:
+        candidates.append(scenario_file.with_name(f"{geometry_view}.vti"))
+    candidates.extend(
+        gprmax_outputs.find_snapshot_files(
+            scenario_file.parent, scenario_file.stem
+        )
+    )
+
+    return [path for path in candidates if path.is_file()]
+
+
+def family_output_files(
+    family_file: Path, geometry_views: List[Optional[str]]
+) -> List[Path]:
+    """Lists the outputs a packed family run wrote so far
+
+    These are the numbered outputs of every model of the run, before
+    `gprmax_jobs.split_family_outputs` moves them to their scenarios.
+
+    Args:
+        family_file: A `Path` to the packed input file
+        geometry_views: The filename of the shared geometry view each
+                        scenario of the family writes, or `None`, in the
+                        order of the models
+
+    Returns:
+        A `list` with the `.out` files, geometry views, and snapshots which
+        exist
+
+    Raises:
+        Nothing
+    """
+    candidates = []
+    for index, geometry_view in enumerate(geometry_views, start=1):
+        candidates.append(
+            family_file.with_name(f"{family_file.stem}{index}.out")
+        )
+        if geometry_view is not None:
+            candidates.append(
+                family_file.with_name(f"{geometry_view}{index}.vti")
+            )
+    candidates.extend(
+        gprmax_outputs.find_snapshot_files(
+            family_file.parent, family_file.stem, len(geometry_views)
+        )
+    )
+
+    return [path for path in candidates if path.is_file()]
+
+
+def files_bytes(paths: List[Path]) -> int:
+    """Adds up the size of files, ignoring any which no longer exist"""
+    total = 0
+    for path in paths:
+        try:
+            total += path.stat().st_size
+        except OSError:
+            pass
+
+    return total
+
+
+def folder_bytes(folder: Path) -> int:
+    """Adds up the size of all the files below a folder"""
+    total = 0
+    for root, _, filenames in os.walk(folder):
+        for filename in filenames:
+            try:
+                total += os.stat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+
+    return total
+
+
+def compress_hdf5(source: Path, target: Path, level: int) -> None:
+    """Copies an HDF5 file, compressing every dataset with gzip
+
+    Args:
+        source: A `Path` to the HDF5 file to copy
+        target: A `Path` to the compressed copy
+        level: The gzip compression level, from 0 to 9
+
+    Returns:
+        Nothing
+
+    Raises:
+        Nothing
+    """
+    with h5py.File(source, "r") as source_file, \
+            h5py.File(target, "w") as target_file:
+        target_file.attrs.update(source_file.attrs)
+
+        def copy_item(name, item):
+            if isinstance(item, h5py.Group):
+                group = target_file.require_group(name)
+                group.attrs.update(item.attrs)
+                return
+
+            if item.shape:
+                dataset = target_file.create_dataset(
+                    name, data=item[()], compression="gzip",
+                    compression_opts=level, shuffle=True,
+                )
+            else:
+                dataset = target_file.create_dataset(name, data=item[()])
+            dataset.attrs.update(item.attrs)
+
+        source_file.visititems(copy_item)
+
+
+def gzip_file(source: Path, target: Path, level: int) -> None:
+    """Compresses a file with gzip"""
+    with source.open(mode="rb") as source_handle, \
+            gzip.open(target, "wb", compresslevel=level) as target_handle:
+        shutil.copyfileobj(source_handle, target_handle, 1 << 20)
+
+
+def archive_scenario(
+    scenario_file: Path,
+    archive_folder: Path,
+    level: int = 6,
+    geometry_view: Optional[str] = None,
+) -> Tuple[int, int]:
+    """Compresses the outputs of a scenario into the archive and deletes them
+
+    The archive keeps the layout of the scenario folder, e.g. snapshots in
+    a `<scenario>_snaps` folder stay in one. Each file is written under a
+    temporary name and renamed once complete, and the original is only
+    deleted after that, so an interrupted archive never loses data.
+
+    Args:
+        scenario_file: A `Path` to the scenario input file
+        archive_folder: A `Path` to the folder to archive into, possibly on
+                        another volume
+        level: The gzip compression level, from 0 to 9
+        geometry_view: The filename of the shared geometry view the scenario
+                       writes, see `entry_geometry_view`
+
+    Returns:
+        A `tuple` with the bytes freed on the scratch volume and the bytes
+        written to the archive
+
+    Raises:
+        OSError: If the archive cannot be written
+    """
+    freed, written = 0, 0
+
+    for output_file in scenario_output_files(scenario_file, geometry_view):
+        relative = output_file.relative_to(scenario_file.parent)
+        if output_file.suffix == ".out":
+            target = archive_folder / relative
+            compress = compress_hdf5
+        else:
+            target = archive_folder / relative.with_name(
+                relative.name + GZIP_SUFFIX
+            )
+            compress = gzip_file
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".partial")
+        compress(output_file, partial, level)
+        partial.replace(target)
+
+        freed += output_file.stat().st_size
+        written += target.stat().st_size
+        output_file.unlink()
+
+    snapshots_folder = scenario_file.parent / f"{scenario_file.stem}_snaps"
+    if snapshots_folder.is_dir() and not any(snapshots_folder.iterdir()):
+        snapshots_folder.rmdir()
+
+    return freed, written
+
+
+def archived_output_files(
+    archive_folder: Path,
+    scenario_name: str,
+    geometry_view: Optional[str] = None,
+) -> List[Path]:
+    """Lists the archived outputs of a scenario
+
+    Args:
+        archive_folder: A `Path` to the folder the outputs were archived into
+        scenario_name: The scenario input filename without its extension
+        geometry_view: The filename of the shared geometry view the scenario
+                       writes, see `entry_geometry_view`
+
+    Returns:
+        A sorted `list` of `Path` objects inside `archive_folder`, possibly
+        empty
+
+    Raises:
+        Nothing
+    """
+    archived_files = set(archive_folder.glob(f"{scenario_name}.out"))
+    archived_files.update(
+        archive_folder.glob(f"{scenario_name}.vti{GZIP_SUFFIX}")
+    )
+    archived_files.update(
+        archive_folder.glob(f"{scenario_name}_snapshot*.vti{GZIP_SUFFIX}")
+    )
+    archived_files.update(
+        archive_folder.glob(f"{scenario_name}_snaps/*.vti{GZIP_SUFFIX}")
+    )
+    if geometry_view is not None:
+        archived_files.update(
+            archive_folder.glob(f"{geometry_view}.vti{GZIP_SUFFIX}")
+        )
+
+    return sorted(archived_files)
+
+
+class OutputArchiver:
+    """Archives the outputs of completed scenarios in background threads
+
+    Args:
+        archive_folder: A `Path` to the folder to archive into
+        workers: The number of scenarios archived at the same time
+        level: The gzip compression level, from 0 to 9
+    """
+
+    def __init__(self, archive_folder: Path, workers: int = 2, level: int = 6):
+        self.archive_folder = archive_folder
+        self.level = level
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._futures: Dict[str, Future] = {}
+
+    def submit(
+        self, scenario_file: Path, geometry_view: Optional[str] = None
+    ) -> None:
+        """Queues the outputs of a completed scenario for archiving"""
+        with self._lock:
+            self._futures[scenario_file.stem] = self._executor.submit(
+                archive_scenario, scenario_file, self.archive_folder,
+                self.level, geometry_view
+            )
+
+    def busy(self) -> bool:
+        """Whether any scenario is still queued or being archived"""
+        with self._lock:
+            return any(not future.done() for future in self._futures.values())
+
+    def collect(self) -> List[Tuple[str, Future]]:
+        """Removes and returns the scenarios whose archiving has finished
+
+        Returns:
+            A `list` of `(scenario name, future)` tuples. The result of each
+            future is the `tuple` returned by `archive_scenario`, or the
+            exception it raised.
+        """
+        with self._lock:
+            done = [
+                (name, future) for name, future in self._futures.items()
+                if future.done()
+            ]
+            for name, _ in done:
+                del self._futures[name]
+
+        return done
+
+    def shutdown(self) -> None:
+        """Waits for all the queued scenarios to be archived"""
+        self._executor.shutdown(wait=True)
+
+
+def log_archived(logger: logging.Logger, name: str, future: Future) -> None:
+    """Reports the outcome of archiving the outputs of a scenario"""
+    if future.exception() is not None:
+        logger.error(
+            "Archiving the outputs of %s failed: %s", name, future.exception()
+        )
+        return
+
+    freed, written = future.result()
+    logger.info(
+        "Archived %s, freed %.2f GB, wrote %.2f GB",
+        name, freed / 1e9, written / 1e9
+    )
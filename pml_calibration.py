@@ -0,0 +1,230 @@
+import math
+import datetime
+import logging
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict
+
+import yaml
+import numpy as np
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+import gprMax
+from gprMax.exceptions import GeneralError
+
+import gprmax_outputs
+import pml_selection
+from logger_setup import setup_logger
+
+
+Point = namedtuple('Point', ['x', 'y', 'z'])
+
+# ! PML calibration settings
+
+pml_calibration_folder_name = "pml_calibration"
+
+# * Reflections depend on the grid density next to the PML and on the PML
+# * thickness, not on the frequency itself, so one frequency is enough
+calibration_frequency = 1e9
+calibration_densities = [10, 15, 20, 30, 50]
+calibration_thicknesses = [4, 6, 8, 10, 12, 15, 20]
+
+# * The transmitter sits `source_cells` from the PML on every side of a small
+# * free space test domain, and the receiver `probe_cells` from the PML.
+# * The reference run moves the PML far enough away that its reflections
+# * cannot reach the receiver within the time window.
+source_cells = 30
+probe_cells = 5
+calibration_periods = 20
+reference_pml_cells = 20
+
+simulation_name = 'PML reflection test'
+waveform_type = 'contsine'
+waveform_identifier = 'tx_1'
+dipole_polarisation = 'z'
+level_component = "Ez"
+
+# ! PML calibration settings end
+
+jinja2_env = Environment(
+    loader=FileSystemLoader('./'), undefined=StrictUndefined,
+    trim_blocks=True, lstrip_blocks=True,
+)
+
+
+def test_domain_sim_params(
+    density: float, pml_cells: int, margin_cells: int = 0
+) -> Dict:
+    """Calculates the values `power_calibration.j2` needs for a test domain
+
+    Args:
+        density: Cells per wavelength of the grid
+        pml_cells: The PML thickness on every side, in cells
+        margin_cells: Extra free space between the test region and the PML,
+                      in cells, only used by the reference run
+
+    Returns:
+        A `dict` which is passed to `power_calibration.j2` as `params`
+
+    Raises:
+        Nothing
+    """
+    delta_d = pml_selection.SPEED_OF_LIGHT / calibration_frequency / density
+    offset_cells = pml_cells + margin_cells
+
+    domain_cells = 2 * (offset_cells + source_cells)
+
+    transmitter_position = Point(
+        (offset_cells + source_cells) * delta_d,
+        (offset_cells + source_cells) * delta_d,
+        0
+    )
+    receiver_position = Point(
+        (offset_cells + probe_cells) * delta_d,
+        transmitter_position.y,
+        0
+    )
+
+    return {
+        'simulation_name': simulation_name,
+        'simulation_runtime': calibration_periods / calibration_frequency,
+        'pml_command': '{0} {0} 0 {0} {0} 0'.format(pml_cells),
+
+        'domain_x': domain_cells * delta_d,
+        'domain_y': domain_cells * delta_d,
+        'domain_z': delta_d,
+
+        'delta_d': delta_d,
+
+        'waveform_type': waveform_type,
+        'waveform_amplitude': 1.0,
+        'waveform_identifier': waveform_identifier,
+
+        'fund_freq': calibration_frequency,
+        'dipole_polarisation': dipole_polarisation,
+
+        'transmitter_position': transmitter_position._asdict(),
+        'receiver_position': receiver_position._asdict(),
+    }
+
+
+def run_trace(
+    folder: Path, name: str, sim_params: Dict, logger: logging.Logger
+) -> np.ndarray:
+    """Runs one test domain and returns the trace at its receiver
+
+    Args:
+        folder: A `Path` to the folder for the input and output files
+        name: The base filename of the test domain
+        sim_params: The `dict` returned by `test_domain_sim_params`
+        logger: The `Logger` to report progress to
+
+    Returns:
+        The `level_component` trace of the receiver
+
+    Raises:
+        GeneralError: If gprMax fails to run the model
+    """
+    simulation_file = folder / ".".join([name, "py"])
+    output_file = simulation_file.with_suffix(".out")
+
+    if not output_file.exists():
+        template = jinja2_env.get_template('power_calibration.j2')
+        simulation_file.write_text(template.render(params=sim_params))
+        logger.info("Running %s", simulation_file.name)
+        gprMax.gprMax.api(str(simulation_file))
+
+    metadata = gprmax_outputs.read_output_metadata(output_file)
+    receivers = gprmax_outputs.read_receivers(output_file, (level_component,))
+
+    return receivers[metadata["receivers"][0]["group"]][level_component]
+
+
+def reflection_db(trace: np.ndarray, reference: np.ndarray) -> float:
+    """Expresses the difference to the reference trace in dB of its peak"""
+    error = np.max(np.abs(np.asarray(trace) - np.asarray(reference)))
+    peak = np.max(np.abs(reference))
+
+    return float(
+        20 * np.log10(
+            np.maximum(error, np.finfo(np.float64).tiny) /
+            np.maximum(peak, np.finfo(np.float64).tiny)
+        )
+    )
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    pml_logger = setup_logger("gprMax_pml_calibration", global_timestamp)
+
+    pml_folder = Path.cwd() / pml_calibration_folder_name
+    pml_folder.mkdir(exist_ok=True)
+
+    reflections = []
+
+    for density in calibration_densities:
+        # * Light travels `calibration_periods * density` cells within the
+        # * time window, so reflections from a PML over half that far away
+        # * never come back to the receiver
+        margin_cells = int(math.ceil(calibration_periods * density / 2)) + 1
+
+        try:
+            reference = run_trace(
+                pml_folder, f"pml_reference_cpw{density}",
+                test_domain_sim_params(
+                    density, reference_pml_cells, margin_cells
+                ),
+                pml_logger
+            )
+        except GeneralError:
+            pml_logger.exception(
+                "gprMax error in the reference at %s cells per wavelength",
+                density
+            )
+            continue
+
+        for thickness in calibration_thicknesses:
+            try:
+                trace = run_trace(
+                    pml_folder, f"pml_test_cpw{density}_pml{thickness}",
+                    test_domain_sim_params(density, thickness),
+                    pml_logger
+                )
+            except GeneralError:
+                pml_logger.exception(
+                    "gprMax error with %s PML cells at %s cells per "
+                    "wavelength", thickness, density
+                )
+                continue
+
+            reflection = reflection_db(trace, reference)
+            reflections.append(
+                {
+                    "cells_per_wavelength": density,
+                    "pml_cells": thickness,
+                    "reflection_db": round(reflection, 2),
+                }
+            )
+            pml_logger.info(
+                "%s cells per wavelength, %s PML cells: %.2f dB",
+                density, thickness, reflection
+            )
+
+    with open(pml_selection.PML_CALIBRATION_FILENAME, "w") as table_file:
+        yaml.safe_dump(
+            {
+                "frequency": calibration_frequency,
+                "source_cells": source_cells,
+                "probe_cells": probe_cells,
+                "reflections": reflections,
+            },
+            table_file,
+            sort_keys=False,
+        )
+
+    pml_logger.info(
+        "PML reflections written to %s",
+        pml_selection.PML_CALIBRATION_FILENAME
+    )
+
+    logging.shutdown()
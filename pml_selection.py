@@ -0,0 +1,160 @@
+import math
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import yaml
+
+
+# * Written by `pml_calibration.py`, read by `generate_scenario_files.py`
+PML_CALIBRATION_FILENAME = "pml_calibration.yml"
+
+# * Vacuum constants, in SI units. Kept here so the selection does not need
+# * to import `scipy`.
+SPEED_OF_LIGHT = 299792458.0
+VACUUM_PERMITTIVITY = 8.8541878128e-12
+VACUUM_PERMEABILITY = 1.25663706212e-6
+
+# * Order of the sides in the gprMax `#pml_cells` command
+PML_SIDES = ("x_min", "y_min", "z_min", "x_max", "y_max", "z_max")
+
+
+def load_pml_table(filename: str) -> List[Dict]:
+    """Reads the PML reflection table written by `pml_calibration.py`
+
+    Args:
+        filename: A `str` with the YAML file of the calibration
+
+    Returns:
+        A `list` of `dict` objects, each with the `cells_per_wavelength` of
+        the grid next to the PML, the PML thickness in `pml_cells`, and the
+        measured `reflection_db`. The `list` is empty if the file does not
+        exist.
+
+    Raises:
+        Nothing
+    """
+    if not Path(filename).exists():
+        return []
+
+    with open(filename, "r") as input_file:
+        calibration = yaml.safe_load(input_file) or {}
+
+    return calibration.get("reflections", [])
+
+
+def attenuation_db(
+    fund_freq: float, er: float, conductivity: float, distance: float
+) -> float:
+    """Calculates the one-way attenuation of a plane wave in a lossy medium
+
+    Args:
+        fund_freq: The frequency, in Hz
+        er: The relative permittivity of the medium
+        conductivity: The conductivity of the medium, in S/m
+        distance: The path length through the medium, in metres
+
+    Returns:
+        The attenuation, in dB, as a positive number
+
+    Raises:
+        Nothing
+    """
+    omega = 2 * math.pi * fund_freq
+    permittivity = er * VACUUM_PERMITTIVITY
+    loss_tangent = conductivity / (omega * permittivity)
+
+    alpha = omega * math.sqrt(VACUUM_PERMEABILITY * permittivity / 2) * (
+        math.sqrt(math.sqrt(1 + loss_tangent ** 2) - 1)
+    )
+
+    return 20 * math.log10(math.e) * alpha * distance
+
+
+def select_pml_cells(
+    table: List[Dict],
+    cells_per_wavelength: float,
+    target_reflection_db: float,
+    credit_db: float,
+    fallback_cells: int,
+) -> int:
+    """Picks the thinnest calibrated PML which meets a reflection target
+
+    The calibration of the finest grid which is no finer than the one next
+    to the PML is used, i.e. the most cells per wavelength up to the local
+    density. Reflections grow as the grid gets coarser, so a calibration at
+    the same or a coarser grid never understates them. The reflection only
+    has to meet the target after the credit, i.e. the attenuation of the
+    wave on its way to the PML and back.
+
+    Args:
+        table: The `list` returned by `load_pml_table`
+        cells_per_wavelength: Cells per wavelength next to the PML
+        target_reflection_db: The largest acceptable reflection, in dB
+        credit_db: The two-way attenuation in front of the PML, in dB
+        fallback_cells: The thickness used without a suitable calibration
+
+    Returns:
+        The number of PML cells for this side
+
+    Raises:
+        Nothing
+    """
+    densities = [
+        row["cells_per_wavelength"] for row in table
+        if row["cells_per_wavelength"] <= cells_per_wavelength
+    ]
+    if not densities:
+        return fallback_cells
+
+    density = max(densities)
+    thicknesses = [
+        row["pml_cells"] for row in table
+        if row["cells_per_wavelength"] == density and
+        row["reflection_db"] - credit_db <= target_reflection_db
+    ]
+
+    return min(thicknesses) if thicknesses else fallback_cells
+
+
+def side_pml_cells(
+    table: List[Dict],
+    fund_freq: float,
+    delta_d: float,
+    sides: Sequence[Tuple[float, float, float]],
+    target_reflection_db: float,
+    fallback_cells: int,
+) -> List[int]:
+    """Picks the PML thickness of every side of a model
+
+    Args:
+        table: The `list` returned by `load_pml_table`
+        fund_freq: The excitation frequency, in Hz
+        delta_d: The grid spacing, in metres
+        sides: One `(er, conductivity, lossy distance)` tuple per side, in
+               the order of `PML_SIDES`. `er` is the highest permittivity
+               next to the side, and the lossy distance is how much of the
+               medium lies between the model and the PML, in metres.
+        target_reflection_db: The largest acceptable reflection, in dB
+        fallback_cells: The thickness used without a suitable calibration
+
+    Returns:
+        A `list` with the number of PML cells of each side
+
+    Raises:
+        Nothing
+    """
+    cells = []
+
+    for er, conductivity, distance in sides:
+        cells_per_wavelength = (
+            SPEED_OF_LIGHT / (fund_freq * math.sqrt(er)) / delta_d
+        )
+        credit_db = 2 * attenuation_db(fund_freq, er, conductivity, distance)
+        cells.append(
+            select_pml_cells(
+                table, cells_per_wavelength, target_reflection_db,
+                credit_db, fallback_cells
+            )
+        )
+
+    return cells
@@ -0,0 +1,588 @@
+import csv
+import random
+import datetime
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import h5py
+
+import symmetry
+import gprmax_outputs
+import scenario_plan
+import calibration_cache
+from logger_setup import setup_logger
+
+
+# ! Output reduction settings
+
+# * Model whose scenarios are reduced, one of the keys of
+# * `scenario_plan.SCENARIOS_FOLDER_NAMES`
+model = "straight_pipe"
+
+# * Folder with the gprMax outputs and the folder for the reduced copies
+scenarios_folder_name = scenario_plan.SCENARIOS_FOLDER_NAMES[model]
+reduced_folder_name = "scenarios_reduced"
+results_table_filename = "results_table.csv"
+
+# * One of `full`, `single` (float32), or `quantised` (scaled integers)
+precision_mode = "single"
+quantisation_bits = 16  # 8, 16, or 32
+
+# * The dB levels in the results table are rounded to this many decimals
+results_decimals = 3
+results_components = ("Ez",)
+
+# * A random sample of scenarios is read back from disk and compared to the
+# * full precision data. The reduction fails if any receiver level differs
+# * by more than `level_tolerance_db`.
+validation_sample_size = 5
+validation_seed = 0
+level_tolerance_db = 1e-3
+
+# * Setting this to `False` deletes the full precision `.out` and snapshot
+# * files once their reduced copy has been written and checked.
+keep_full_precision = True
+
+# ! Output reduction settings end
+
+PRECISION_MODES = ("full", "single", "quantised")
+
+# * Widths of the unsigned integers quantised values are stored in. 64 bits
+# * would need more levels than a `float64` can count exactly.
+QUANTISATION_BITS = (8, 16, 32)
+
+
+def reduce_array(
+    values: np.ndarray, precision: str, bits: int = 16
+) -> Tuple[np.ndarray, Dict]:
+    """Converts an array to the requested storage precision
+
+    Args:
+        values: A `numpy` array with full precision data
+        precision: One of `full`, `single`, or `quantised`
+        bits: The width of the unsigned integers used for `quantised`
+
+    Returns:
+        A `tuple` with the array to store, and a `dict` of attributes which
+        are needed to restore it. The attributes always include the
+        `error_bound`, i.e. the largest absolute difference between the
+        stored and the original values.
+
+    Raises:
+        ValueError: If `precision` is not one of the supported modes, or
+                    `bits` is not one of `QUANTISATION_BITS`
+    """
+    values = np.asarray(values)
+
+    if precision == "full":
+        return values, {"precision": precision, "error_bound": 0.0}
+
+    if precision == "single":
+        stored = values.astype(np.float32)
+        if values.dtype == np.float32 or values.size == 0:
+            error_bound = 0.0
+        else:
+            # * Round-to-nearest has a relative error of at most 2 ** -24,
+            # * the extra term covers values that become subnormal
+            error_bound = float(
+                np.max(np.abs(values)) * 2.0 ** -24 + 2.0 ** -149
+            )
+        return stored, {"precision": precision, "error_bound": error_bound}
+
+    if precision == "quantised":
+        if bits not in QUANTISATION_BITS:
+            raise ValueError(
+                f"Cannot quantise to {bits} bits, expected one of "
+                f"{', '.join(str(width) for width in QUANTISATION_BITS)}"
+            )
+
+        values = values.astype(np.float64)
+        offset = float(np.min(values)) if values.size else 0.0
+        span = float(np.max(values)) - offset if values.size else 0.0
+        levels = 2 ** bits - 1
+        scale = span / levels if span > 0 else 1.0
+
+        stored = np.round((values - offset) / scale).astype(
+            np.dtype(f"u{bits // 8}")
+        )
+        return stored, {
+            "precision": precision,
+            "scale": scale,
+            "offset": offset,
+            "error_bound": scale / 2 if span > 0 else 0.0,
+        }
+
+    raise ValueError(
+        f"Unknown precision mode {precision}, expected one of "
+        f"{', '.join(PRECISION_MODES)}"
+    )
+
+
+def restore_array(stored: np.ndarray, attributes: Dict) -> np.ndarray:
+    """Reverses `reduce_array`, returning `float64` values
+
+    Args:
+        stored: The array as stored in a reduced file
+        attributes: The attributes returned by `reduce_array`
+
+    Returns:
+        A `float64` `numpy` array
+
+    Raises:
+        Nothing
+    """
+    values = np.asarray(stored, dtype=np.float64)
+
+    if attributes.get("precision") == "quantised":
+        values = attributes["offset"] + values * attributes["scale"]
+
+    return values
+
+
+def reduce_scenario(
+    output_path: Path,
+    reduced_path: Path,
+    snapshot_files: List[Path],
+    precision: str,
+    bits: int = 16,
+    mirror: Optional[Dict] = None,
+) -> Dict[str, float]:
+    """Writes a reduced precision copy of one scenario's outputs
+
+    Receiver traces go under `/rxs`, same as in the gprMax output file, and
+    snapshots go under `/snapshots`, one group per `.vti` file. Every
+    dataset is checked against its error bound before it is written.
+
+    Half-domain outputs are reconstructed to the full width first. The
+    mirrored receivers follow the simulated ones, with a `MirrorOf`
+    attribute naming the receiver they were mirrored from.
+
+    Args:
+        output_path: A `Path` to the gprMax `.out` file
+        reduced_path: A `Path` for the reduced HDF5 file
+        snapshot_files: A `list` of snapshot `.vti` files to include
+        precision: One of `full`, `single`, or `quantised`
+        bits: The width of the unsigned integers used for `quantised`
+        mirror: The `symmetry` of the scenario plan entry, i.e. a `dict` with
+                the `plane_x` and `boundary` of a half-domain model, or
+                `None` for a full model
+
+    Returns:
+        A `dict` with the number of bytes before and after the reduction and
+        the largest error bound of all the datasets written.
+
+    Raises:
+        ValueError: If a stored dataset violates its own error bound
+    """
+    metadata = gprmax_outputs.read_output_metadata(output_path)
+    receivers = gprmax_outputs.read_receivers(output_path)
+
+    if mirror is not None:
+        metadata["receivers"], receivers = symmetry.mirror_receivers(
+            metadata["receivers"], receivers,
+            mirror["plane_x"], mirror["boundary"]
+        )
+
+    max_error_bound = 0.0
+
+    with h5py.File(reduced_path, "w") as reduced_file:
+        reduced_file.attrs["Title"] = metadata["title"]
+        reduced_file.attrs["Iterations"] = metadata["iterations"]
+        reduced_file.attrs["dt"] = metadata["dt"]
+        reduced_file.attrs["dx_dy_dz"] = metadata["dx_dy_dz"]
+        reduced_file.attrs["precision"] = precision
+        reduced_file.attrs["source_file"] = output_path.name
+        if mirror is not None:
+            reduced_file.attrs["symmetry_plane_x"] = mirror["plane_x"]
+            reduced_file.attrs["symmetry_boundary"] = mirror["boundary"]
+
+        for receiver in metadata["receivers"]:
+            rx_group = reduced_file.create_group(
+                f"rxs/{receiver['group']}"
+            )
+            rx_group.attrs["Name"] = receiver["name"]
+            rx_group.attrs["Position"] = receiver["position"]
+            if "mirror_of" in receiver:
+                rx_group.attrs["MirrorOf"] = receiver["mirror_of"]
+
+            for component, values in receivers[receiver["group"]].items():
+                error_bound = _write_reduced_dataset(
+                    rx_group, component, values, precision, bits
+                )
+                max_error_bound = max(max_error_bound, error_bound)
+
+        for snapshot_file in snapshot_files:
+            image_info, arrays = gprmax_outputs.read_vti_arrays(snapshot_file)
+            if mirror is not None:
+                image_info, arrays = symmetry.mirror_snapshot(
+                    image_info, arrays, mirror["plane_x"], mirror["boundary"]
+                )
+            snapshot_group = reduced_file.create_group(
+                f"snapshots/{snapshot_file.stem}"
+            )
+            for key, value in image_info.items():
+                snapshot_group.attrs[key] = value
+
+            for name, values in arrays.items():
+                error_bound = _write_reduced_dataset(
+                    snapshot_group, name, values, precision, bits
+                )
+                max_error_bound = max(max_error_bound, error_bound)
+
+    full_bytes = output_path.stat().st_size + sum(
+        snapshot_file.stat().st_size for snapshot_file in snapshot_files
+    )
+
+    return {
+        "full_bytes": full_bytes,
+        "reduced_bytes": reduced_path.stat().st_size,
+        "max_error_bound": max_error_bound,
+    }
+
+
+def _write_reduced_dataset(
+    group: h5py.Group, name: str, values: np.ndarray, precision: str, bits: int
+) -> float:
+    """Reduces, checks, and writes a single dataset, returns its bound"""
+    stored, attributes = reduce_array(values, precision, bits)
+
+    error = np.max(
+        np.abs(restore_array(stored, attributes) - values), initial=0.0
+    )
+    tolerance = 4 * np.finfo(np.float64).eps * np.max(
+        np.abs(values), initial=0.0
+    )
+    # * NaN errors fail every comparison, so they are checked for first
+    if not np.isfinite(error) or (
+        error > attributes["error_bound"] + tolerance
+    ):
+        raise ValueError(
+            f"{group.name}/{name} error {error:.3e} exceeds the bound of "
+            f"{attributes['error_bound']:.3e}"
+        )
+
+    dataset = group.create_dataset(
+        name,
+        data=stored,
+        compression="gzip",
+        shuffle=True,
+        chunks=True if stored.size else None,
+    )
+    for key, value in attributes.items():
+        dataset.attrs[key] = value
+
+    return attributes["error_bound"]
+
+
+def read_reduced_receivers(
+    reduced_path: Path,
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """Reads receiver traces from a reduced file, restoring `float64` values
+
+    Args:
+        reduced_path: A `Path` to a file written by `reduce_scenario`
+
+    Returns:
+        A `dict` with the same layout as `gprmax_outputs.read_receivers`
+
+    Raises:
+        Nothing
+    """
+    receivers = {}
+
+    with h5py.File(reduced_path, "r") as reduced_file:
+        for rx_group_name in sorted(
+            reduced_file.get("rxs", {}), key=gprmax_outputs.natural_sort_key
+        ):
+            rx_group = reduced_file["rxs"][rx_group_name]
+            receivers[rx_group_name] = {
+                component: restore_array(
+                    dataset[()], dict(dataset.attrs)
+                )
+                for component, dataset in rx_group.items()
+            }
+
+    return receivers
+
+
+def validate_reduced(
+    output_path: Path,
+    reduced_path: Path,
+    level_tolerance: float,
+    fund_freq: Optional[float] = None,
+) -> Dict[str, float]:
+    """Compares a reduced file read back from disk to the full outputs
+
+    Args:
+        output_path: A `Path` to the full precision gprMax `.out` file
+        reduced_path: A `Path` to the corresponding reduced file
+        level_tolerance: The largest allowed receiver level error, in dB
+        fund_freq: The excitation frequency, if known, in Hz, so the levels
+                   checked are those `results_rows` publishes
+
+    Returns:
+        A `dict` with the largest absolute trace error, the largest error
+        bound recorded in the reduced file, and the largest level error in dB
+
+    Raises:
+        ValueError: If any error exceeds its bound or the level tolerance
+    """
+    metadata = gprmax_outputs.read_output_metadata(output_path)
+    full_receivers = gprmax_outputs.read_receivers(output_path)
+    reduced_receivers = read_reduced_receivers(reduced_path)
+
+    summary = {"max_error": 0.0, "max_error_bound": 0.0, "max_level_db": 0.0}
+
+    with h5py.File(reduced_path, "r") as reduced_file:
+        for rx_group_name, components in full_receivers.items():
+            for component, full_values in components.items():
+                reduced_values = reduced_receivers[rx_group_name][component]
+                error_bound = float(
+                    reduced_file["rxs"][rx_group_name][component].attrs[
+                        "error_bound"
+                    ]
+                )
+
+                error = float(
+                    np.max(np.abs(reduced_values - full_values), initial=0.0)
+                )
+                level_error = abs(
+                    gprmax_outputs.receiver_level_db(
+                        reduced_values, metadata["dt"], fund_freq
+                    ) -
+                    gprmax_outputs.receiver_level_db(
+                        full_values, metadata["dt"], fund_freq
+                    )
+                )
+
+                # * Traces that are zero throughout carry no level information
+                if not np.any(full_values):
+                    level_error = 0.0
+
+                tolerance = 4 * np.finfo(np.float64).eps * np.max(
+                    np.abs(full_values), initial=0.0
+                )
+                if not np.isfinite(error) or error > error_bound + tolerance:
+                    raise ValueError(
+                        f"{reduced_path.name} {rx_group_name}/{component} "
+                        f"error {error:.3e} exceeds bound {error_bound:.3e}"
+                    )
+                if not np.isfinite(level_error) or (
+                    level_error > level_tolerance
+                ):
+                    raise ValueError(
+                        f"{reduced_path.name} {rx_group_name}/{component} "
+                        f"level error {level_error:.3e} dB exceeds "
+                        f"{level_tolerance:.3e} dB"
+                    )
+
+                summary["max_error"] = max(summary["max_error"], error)
+                summary["max_error_bound"] = max(
+                    summary["max_error_bound"], error_bound
+                )
+                summary["max_level_db"] = max(
+                    summary["max_level_db"], level_error
+                )
+
+    return summary
+
+
+def results_rows(
+    scenario_name: str,
+    reduced_path: Path,
+    components: Tuple[str, ...],
+    decimals: int,
+    fund_freq: Optional[float] = None,
+    references: Optional[Tuple[Optional[float], ...]] = None,
+) -> List[Dict]:
+    """Builds the results table rows for one scenario
+
+    Args:
+        scenario_name: The scenario input filename without its extension
+        reduced_path: A `Path` to the reduced file of the scenario
+        components: The field components to tabulate, e.g. `("Ez",)`
+        decimals: How many decimals to keep for the levels in dB
+        fund_freq: The excitation frequency, if known, in Hz
+        references: The free-space reference level of each receiver, in dB,
+                    in receiver order. Missing references are `None`.
+                    Mirrored receivers use the reference of the receiver
+                    they were mirrored from.
+
+    Returns:
+        A `list` of `dict` objects, one per receiver and component. The
+        `normalised_db` level is left empty when there is no reference.
+
+    Raises:
+        Nothing
+    """
+    rows = []
+
+    with h5py.File(reduced_path, "r") as reduced_file:
+        dt = float(reduced_file.attrs["dt"])
+
+        rx_group_names = sorted(
+            reduced_file.get("rxs", {}), key=gprmax_outputs.natural_sort_key
+        )
+        simulated_names = [
+            rx_group_name for rx_group_name in rx_group_names
+            if "MirrorOf" not in reduced_file["rxs"][rx_group_name].attrs
+        ]
+
+        for rx_group_name in rx_group_names:
+            rx_group = reduced_file["rxs"][rx_group_name]
+            position = [float(value) for value in rx_group.attrs["Position"]]
+            rx_index = simulated_names.index(
+                rx_group.attrs.get("MirrorOf", rx_group_name)
+            )
+
+            reference_db = None
+            if references is not None and rx_index < len(references):
+                reference_db = references[rx_index]
+
+            for component in components:
+                if component not in rx_group:
+                    continue
+                dataset = rx_group[component]
+                values = restore_array(dataset[()], dict(dataset.attrs))
+                level_db = gprmax_outputs.receiver_level_db(
+                    values, dt, fund_freq
+                )
+                rows.append(
+                    {
+                        "scenario": scenario_name,
+                        "receiver": rx_group_name,
+                        "x": position[0],
+                        "y": position[1],
+                        "z": position[2],
+                        "component": component,
+                        "level_db": round(level_db, decimals),
+                        "reference_db": (
+                            "" if reference_db is None
+                            else round(reference_db, decimals)
+                        ),
+                        "normalised_db": (
+                            "" if reference_db is None
+                            else round(
+                                calibration_cache.normalise_level(
+                                    level_db, reference_db
+                                ),
+                                decimals,
+                            )
+                        ),
+                    }
+                )
+
+    return rows
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    reduce_logger = setup_logger("gprMax_output_reduction", global_timestamp)
+
+    scenarios_folder = Path.cwd() / scenarios_folder_name
+    reduced_folder = Path.cwd() / reduced_folder_name
+    reduced_folder.mkdir(exist_ok=True)
+
+    plan = scenario_plan.load_plan(scenarios_folder)
+    calibration_index = calibration_cache.load_index(
+        Path.cwd() / calibration_cache.calibration_folder_name
+    )
+
+    output_files = sorted(scenarios_folder.glob("*.out"))
+    reduce_logger.info(
+        "Reducing %d outputs in %s to %s precision",
+        len(output_files), scenarios_folder, precision_mode
+    )
+
+    reduced_files = {}
+    total_full_bytes = 0
+    total_reduced_bytes = 0
+
+    for output_file in output_files:
+        snapshot_files = gprmax_outputs.find_snapshot_files(
+            scenarios_folder, output_file.stem
+        )
+        reduced_file = reduced_folder / f"{output_file.stem}_reduced.h5"
+
+        entry = plan.get(output_file.stem)
+        summary = reduce_scenario(
+            output_file, reduced_file, snapshot_files,
+            precision_mode, quantisation_bits,
+            entry.get("symmetry") if entry is not None else None
+        )
+        reduced_files[output_file] = reduced_file
+        total_full_bytes += summary["full_bytes"]
+        total_reduced_bytes += summary["reduced_bytes"]
+
+        reduce_logger.info(
+            "%s: %d -> %d bytes, error bound %.3e",
+            output_file.name, summary["full_bytes"],
+            summary["reduced_bytes"], summary["max_error_bound"]
+        )
+
+    # * Read a sample of the reduced files back and compare them with the
+    # * full precision outputs before anything gets deleted
+    sample = random.Random(validation_seed).sample(
+        sorted(reduced_files), min(validation_sample_size, len(reduced_files))
+    )
+    for output_file in sample:
+        entry = plan.get(output_file.stem)
+        summary = validate_reduced(
+            output_file, reduced_files[output_file], level_tolerance_db,
+            entry["fund_freq"] if entry is not None else None
+        )
+        reduce_logger.info(
+            "Validated %s: max error %.3e (bound %.3e), level error %.3e dB",
+            output_file.name, summary["max_error"],
+            summary["max_error_bound"], summary["max_level_db"]
+        )
+
+    results_table = reduced_folder / results_table_filename
+    with results_table.open(mode="w", newline="") as table_file:
+        writer = csv.DictWriter(
+            table_file,
+            fieldnames=[
+                "scenario", "receiver", "x", "y", "z", "component",
+                "level_db", "reference_db", "normalised_db"
+            ],
+        )
+        writer.writeheader()
+        for output_file, reduced_file in reduced_files.items():
+            entry = plan.get(output_file.stem)
+            fund_freq, references = None, None
+            if entry is not None:
+                fund_freq = entry["fund_freq"]
+                references = calibration_cache.scenario_references(
+                    calibration_index, entry
+                )
+                if None in references:
+                    reduce_logger.warning(
+                        "%s has no cached free-space reference for some "
+                        "receivers, run calibration_cache.py first",
+                        output_file.name
+                    )
+
+            writer.writerows(
+                results_rows(
+                    output_file.stem, reduced_file,
+                    results_components, results_decimals,
+                    fund_freq, references
+                )
+            )
+
+    if not keep_full_precision:
+        for output_file in reduced_files:
+            for snapshot_file in gprmax_outputs.find_snapshot_files(
+                scenarios_folder, output_file.stem
+            ):
+                snapshot_file.unlink()
+            output_file.unlink()
+            reduce_logger.info("Removed full precision %s", output_file.name)
+
+    reduce_logger.info(
+        "Reduced %d bytes to %d bytes", total_full_bytes, total_reduced_bytes
+    )
+
+    logging.shutdown()
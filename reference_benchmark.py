@@ -0,0 +1,454 @@
+import os
+import sys
+import time
+import socket
+import datetime
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+import numpy as np
+
+import gprmax_jobs
+import gprmax_outputs
+import grid_estimates
+import output_archive
+import symmetry
+import generate_scenario_files as generator
+from logger_setup import setup_logger
+
+
+# ! Reference benchmark settings
+
+benchmark_folder_name = "reference_benchmark"
+
+# * Receiver levels of a trusted run, and the history of every run since
+golden_filename = "reference_golden.yml"
+history_filename = "reference_history.yml"
+
+# * Set to `True` to accept the levels of the next run as the new golden
+# * values, e.g. after a change which is meant to alter the results
+update_golden = False
+
+# * The largest change in receiver level, in dB, relative to the golden
+# * values that still counts as the same answer
+tolerance_db = 0.5
+level_component = "Ez"
+
+# * The reference sweep, as sweep parameter values of each model in the
+# * order of its YAML file. Scenarios are reduced in size by thinner soil
+# * and air layers, but otherwise use the generator settings as they are,
+# * so any change to the grid, time window, or PML shows up here.
+REFERENCE_SCENARIOS = {
+    "straight_pipe": [
+        (868.0e6, 100.0e-3, 2.0, 0.5, "sand", 0.1),
+        (2.45e9, 225.0e-3, 2.0, 0.5, "clay", 0.2),
+    ],
+    "pipe_to_above_ground": [
+        (868.0e6, 100.0e-3, 0.5, "loam", 0.1),
+        (2.45e9, 225.0e-3, 0.5, "silt", 0.2),
+    ],
+}
+
+# * Scenarios which also run as a half-domain model, see `symmetry_mode` of
+# * the generator. The mirrored levels of the half model must be within
+# * `tolerance_db` of those of the full model.
+SYMMETRY_SCENARIOS = {
+    "pipe_to_above_ground": [
+        (868.0e6, 100.0e-3, 0.5, "loam", 0.1),
+    ],
+}
+
+reference_soil_depth = 0.25
+reference_air_depth = 0.25
+reference_geometry_mode = "2D"
+
+# * `None` lets gprMax use all the cores, as a lone sweep run would
+benchmark_threads = None
+
+# ! Reference benchmark settings end
+
+
+def reference_sim_params(
+    model_name: str, params: Tuple, grid_densities: Dict, **overrides
+) -> Dict:
+    """Calculates the template values of a reduced-size reference scenario
+
+    Args:
+        model_name: One of the keys of `generate_scenario_files.MODELS`
+        params: A `tuple` with the sweep parameter values of the scenario
+        grid_densities: The `dict` returned by
+                        `generate_scenario_files.load_grid_densities`
+        overrides: Further keyword arguments of the model, e.g. `symmetric`
+
+    Returns:
+        The `dict` returned by `generate_scenario_files.model_sim_params`
+
+    Raises:
+        KeyError: If `model_name` is not a known model
+    """
+    named_params = dict(
+        zip(generator.MODELS[model_name]["parameter_names"], params)
+    )
+
+    return generator.model_sim_params(
+        model_name,
+        params,
+        grid_density=grid_densities.get(
+            (named_params["fund_freq"], named_params["soil_name"])
+        ),
+        geometry_mode=reference_geometry_mode,
+        soil_depth=reference_soil_depth,
+        air_depth=reference_air_depth,
+        **overrides,
+    )
+
+
+def write_input(
+    benchmark_folder: Path, name: str, params: Tuple, sim_params: Dict
+) -> Tuple[Dict, Path]:
+    """Writes the input file of a reference scenario
+
+    Outputs left over from an earlier run are removed, as they would inflate
+    the output size.
+
+    Args:
+        benchmark_folder: A `Path` to the folder of the input files
+        name: The name of the scenario, without the extension
+        params: A `tuple` with the sweep parameter values of the scenario
+        sim_params: The `dict` returned by `reference_sim_params`
+
+    Returns:
+        A `tuple` with the scenario plan entry and the `Path` to the input
+        file
+
+    Raises:
+        Nothing
+    """
+    entry = generator.plan_entry(params, sim_params)
+
+    input_file = benchmark_folder / ".".join(
+        [name, generator.INPUT_EXTENSIONS[entry["input_format"]]]
+    )
+    input_file.write_text(
+        generator.render_scenario(sim_params, entry["input_format"])
+    )
+
+    for output_file in output_archive.scenario_output_files(
+        input_file, output_archive.entry_geometry_view(entry)
+    ):
+        output_file.unlink()
+
+    return entry, input_file
+
+
+def run_measured(
+    input_file: Path, threads: Optional[int]
+) -> Tuple[int, float, float]:
+    """Runs gprMax on one input file and measures its cost
+
+    Args:
+        input_file: A `Path` to the gprMax input file
+        threads: The number of OpenMP threads, or `None` for all the cores
+
+    Returns:
+        A `tuple` with the return code, the wall time in seconds, and the
+        peak resident memory of the run in bytes
+
+    Raises:
+        Nothing
+    """
+    start_time = time.perf_counter()
+    job = gprmax_jobs.launch_job(
+        input_file, threads, input_file.with_suffix(".log"),
+        write_processed=False
+    )
+
+    # * `wait4` reports the resource usage of this run alone
+    _, wait_status, usage = os.wait4(job.pid, 0)
+    job.returncode = os.waitstatus_to_exitcode(wait_status)
+
+    elapsed = time.perf_counter() - start_time
+
+    # * Linux reports the peak resident memory in kB
+    return job.returncode, elapsed, usage.ru_maxrss * 1024.0
+
+
+def receiver_levels(
+    output_file: Path, fund_freq: float, mirror: Optional[Dict] = None
+) -> List[float]:
+    """Extracts the level of `level_component` at every receiver, in dB
+
+    Args:
+        output_file: A `Path` to the gprMax output file
+        fund_freq: The frequency of the level, in Hz
+        mirror: The `symmetry` of the scenario plan entry, to add the mirror
+                image of every receiver and order them all by x, or `None`
+                to keep the receivers as they are
+
+    Returns:
+        The level of every receiver, in dB
+
+    Raises:
+        Nothing
+    """
+    metadata = gprmax_outputs.read_output_metadata(output_file)
+    receivers = gprmax_outputs.map_receivers(output_file, (level_component,))
+    positions = metadata["receivers"]
+
+    if mirror is not None:
+        positions, receivers = symmetry.mirror_receivers(
+            positions, receivers, mirror["plane_x"], mirror["boundary"]
+        )
+        positions = sorted(
+            positions, key=lambda receiver: receiver["position"][0]
+        )
+
+    return [
+        gprmax_outputs.receiver_level_db(
+            receivers[receiver["group"]][level_component],
+            metadata["dt"],
+            fund_freq,
+        )
+        for receiver in positions
+    ]
+
+
+def compare_levels(
+    levels: List[float], golden_levels: Optional[List[float]]
+) -> Optional[float]:
+    """Finds the largest change in receiver level from the golden values
+
+    Args:
+        levels: The levels of this run, in dB
+        golden_levels: The golden levels, in dB, or `None` if there are none
+
+    Returns:
+        The largest absolute change, in dB, infinity if the receivers do not
+        match, or `None` without golden levels
+
+    Raises:
+        Nothing
+    """
+    if golden_levels is None:
+        return None
+
+    if len(levels) != len(golden_levels):
+        return float("inf")
+
+    return float(
+        np.max(np.abs(np.array(levels) - np.array(golden_levels)), initial=0)
+    )
+
+
+def load_golden(filename: str) -> Dict[str, Dict]:
+    """Reads the golden results, or an empty `dict` if there are none"""
+    if not Path(filename).exists():
+        return {}
+
+    with open(filename, "r") as golden_file:
+        return yaml.safe_load(golden_file)["scenarios"]
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    benchmark_logger = setup_logger(
+        "gprMax_reference_benchmark", global_timestamp
+    )
+
+    benchmark_folder = Path.cwd() / benchmark_folder_name
+    benchmark_folder.mkdir(exist_ok=True)
+
+    # * Each model only uses a grid convergence study made for it
+    grid_densities = {model_name: {} for model_name in REFERENCE_SCENARIOS}
+    if generator.use_grid_convergence:
+        grid_densities = {
+            model_name: generator.load_grid_densities(
+                generator.grid_convergence_filename, model_name
+            )
+            for model_name in REFERENCE_SCENARIOS
+        }
+
+    golden = load_golden(golden_filename)
+    if not golden:
+        benchmark_logger.warning(
+            "No golden values in %s, this run becomes the reference",
+            golden_filename
+        )
+
+    results = {}
+    failures = []
+
+    for model_name, scenarios in REFERENCE_SCENARIOS.items():
+        for params in scenarios:
+            sim_params = reference_sim_params(
+                model_name, params, grid_densities[model_name]
+            )
+            name = generator.scenario_filename(params, model_name)
+            entry, input_file = write_input(
+                benchmark_folder, name, params, sim_params
+            )
+            geometry_view = output_archive.entry_geometry_view(entry)
+
+            benchmark_logger.info("Running %s", input_file.name)
+            return_code, wall_time, peak_memory = run_measured(
+                input_file, benchmark_threads
+            )
+
+            if return_code != 0:
+                benchmark_logger.error(
+                    "gprMax error during %s, see %s",
+                    input_file.name, input_file.with_suffix(".log").name
+                )
+                failures.append(name)
+                continue
+
+            cell_updates = grid_estimates.cell_updates(entry)
+            levels = receiver_levels(
+                input_file.with_suffix(".out"), entry["fund_freq"]
+            )
+            level_change = compare_levels(
+                levels, golden.get(name, {}).get("levels_db")
+            )
+
+            results[name] = {
+                "model": model_name,
+                "delta_d": entry["delta_d"],
+                "pml_cells": entry["pml_cells"],
+                "simulation_runtime": entry["simulation_runtime"],
+                "cell_updates": cell_updates,
+                "wall_time": round(wall_time, 3),
+                "cells_per_second": cell_updates / wall_time,
+                "peak_memory": peak_memory,
+                "output_bytes": output_archive.files_bytes(
+                    output_archive.scenario_output_files(
+                        input_file, geometry_view
+                    )
+                ),
+                "levels_db": [round(level, 4) for level in levels],
+                "level_change_db": (
+                    None if level_change is None else round(level_change, 4)
+                ),
+            }
+
+            speedup = ""
+            if name in golden:
+                speedup = (
+                    f", {golden[name]['wall_time'] / wall_time:.2f}x the "
+                    "speed of the golden run"
+                )
+            benchmark_logger.info(
+                "%s: %.1f s, %.3e cells/s, %.2f GB peak, "
+                "level change %s dB%s",
+                name, wall_time, results[name]["cells_per_second"],
+                peak_memory / 1e9, results[name]["level_change_db"], speedup
+            )
+
+            if level_change is not None and level_change > tolerance_db:
+                benchmark_logger.error(
+                    "%s levels changed by %.3f dB, more than %.3f dB",
+                    name, level_change, tolerance_db
+                )
+                failures.append(name)
+
+    # * The half-domain model is only a saving if it gives the same answer
+    symmetry_results = {}
+    for model_name, scenarios in SYMMETRY_SCENARIOS.items():
+        for params in scenarios:
+            name = generator.scenario_filename(params, model_name)
+
+            levels = {}
+            for half in (False, True):
+                sim_params = reference_sim_params(
+                    model_name, params, grid_densities[model_name],
+                    symmetric=half,
+                )
+                entry, input_file = write_input(
+                    benchmark_folder,
+                    f"{name}_{'half' if half else 'full'}",
+                    params,
+                    sim_params,
+                )
+
+                benchmark_logger.info("Running %s", input_file.name)
+                return_code, wall_time, _ = run_measured(
+                    input_file, benchmark_threads
+                )
+                if return_code != 0:
+                    benchmark_logger.error(
+                        "gprMax error during %s, see %s",
+                        input_file.name, input_file.with_suffix(".log").name
+                    )
+                    break
+
+                levels[half] = receiver_levels(
+                    input_file.with_suffix(".out"),
+                    entry["fund_freq"],
+                    mirror=entry["symmetry"],
+                )
+
+            if len(levels) != 2:
+                failures.append(f"{name}_symmetry")
+                continue
+
+            level_change = compare_levels(levels[True], levels[False])
+            symmetry_results[name] = {
+                "model": model_name,
+                "boundary": entry["symmetry"]["boundary"],
+                "level_change_db": round(level_change, 4),
+            }
+            benchmark_logger.info(
+                "%s: half-domain levels within %.3f dB of the full model",
+                name, level_change
+            )
+
+            if level_change > tolerance_db:
+                benchmark_logger.error(
+                    "%s half-domain levels differ by %.3f dB, more than "
+                    "%.3f dB",
+                    name, level_change, tolerance_db
+                )
+                failures.append(f"{name}_symmetry")
+
+    history = []
+    if Path(history_filename).exists():
+        with open(history_filename, "r") as history_file:
+            history = yaml.safe_load(history_file) or []
+
+    history.append(
+        {
+            "timestamp": global_timestamp,
+            "host": socket.gethostname(),
+            "tolerance_db": tolerance_db,
+            "failures": failures,
+            "scenarios": results,
+            "symmetry": symmetry_results,
+        }
+    )
+    with open(history_filename, "w") as history_file:
+        yaml.safe_dump(history, history_file, sort_keys=False)
+
+    if (update_golden or not golden) and results:
+        with open(golden_filename, "w") as golden_file:
+            yaml.safe_dump(
+                {
+                    "timestamp": global_timestamp,
+                    "level_component": level_component,
+                    "scenarios": results,
+                },
+                golden_file,
+                sort_keys=False,
+            )
+        benchmark_logger.info("Golden values written to %s", golden_filename)
+
+    benchmark_logger.info(
+        "%d of %d reference scenarios within %.3f dB of the golden values",
+        len(results) - len(set(failures) & set(results)),
+        sum(len(scenarios) for scenarios in REFERENCE_SCENARIOS.values()),
+        tolerance_db
+    )
+
+    logging.shutdown()
+
+    sys.exit(1 if failures else 0)
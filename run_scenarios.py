@@ -1,85 +1,556 @@
-import time
-import datetime
-import logging
-from pathlib import Path
-
-import gprMax
-from gprMax.exceptions import GeneralError
-
-
-def setup_logger(filename_base: str, timestamp: str) -> logging.Logger:
-    """Sets up a `Logger` object for diagnostic and debug
-
-    A standard function to set up and configure a Python `Logger` object
-    for recording diagnostic and debug data.
-
-    Args:
-        filename_base: A `str` containing a user-supplied filename to better
-                      identify the logs.
-        timestamp: A `str` with the date and time the logger was started
-                   to differentiate between different runs
-
-    Returns:
-        A `Logger` object with appropriate configurations. All the messages
-        are duplicated to the command prompt as well.
-
-    Raises:
-        Nothing
-    """
-    log_filename = "_".join([timestamp, filename_base])
-    log_filename = ".".join([log_filename, "log"])
-
-    logger = logging.getLogger(filename_base)
-
-    logger_handler = logging.FileHandler(log_filename)
-    logger_handler.setLevel(logging.DEBUG)
-
-    fmt_string = "{asctime:s} {msecs:.3f} \t {levelname:^10s} \t {message:s}"
-    datefmt_string = "%Y-%m-%d %H:%M:%S"
-    logger_formatter = logging.Formatter(
-        fmt=fmt_string, datefmt=datefmt_string, style="{"
-    )
-
-    # * This is to ensure consistent formatting of the miliseconds field
-    logger_formatter.converter = time.gmtime
-
-    logger_handler.setFormatter(logger_formatter)
-    logger.addHandler(logger_handler)
-
-    # * This enables the streaming of messages to stdout
-    logging.basicConfig(
-        format=fmt_string,
-        datefmt=datefmt_string,
-        style="{",
-        level=logging.DEBUG,
-    )
-    logger.info("Logger configuration done")
-
-    return logger
-
-
-global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-gprmax_logger = setup_logger("gprMax_scenario_runner", global_timestamp)
-gprmax_logger.info("Starting gprMax simulations")
-
-# ! Modify this if individual simulation files are elsewhere
-scenarios_folder = Path.cwd() / 'scenarios_empty'
-
-gprmax_logger.info("Processing %s", scenarios_folder)
-
-scenarios_files = list(scenarios_folder.glob("*.py"))
-
-gprmax_logger.info("Found %d files", len(scenarios_files))
-
-for scenario_file in scenarios_files:
-    try:
-        gprmax_logger.info("Running %s", scenario_file)
-        gprMax.gprMax.api(str(scenario_file), write_processed=True)
-    except GeneralError as e:
-        gprmax_logger.exception("gprMax error during simulation")
-    else:
-        gprmax_logger.info("Simulation completed successfully")
-
-gprmax_logger.info("All files processed")
-
-logging.shutdown()
+import os
+import time
+import datetime
+import logging
+from pathlib import Path
+
+import gprmax_jobs
+import job_watchdog
+import grid_estimates
+import memory_check
+import output_archive
+import scenario_plan
+import sweep_status
+from logger_setup import setup_logger
+
+
+# ! Runner settings
+
+# * Model whose generated scenarios are run, one of the keys of
+# * `scenario_plan.SCENARIOS_FOLDER_NAMES`
+model = 'straight_pipe'
+
+# * What to do when a scenario needs more memory than this node has:
+# * `refuse` skips it, `defer` adds it to `deferred_scenarios_filename` for a
+# * bigger node to pick up, and `fallback` applies `memory_fallbacks` in order
+# * and runs the modified scenario, recording the change in the plan. If no
+# * combination of fallbacks fits, the scenario is deferred.
+memory_action = 'fallback'
+memory_safety_factor = 1.2
+memory_fallbacks = ['2D', 'smaller_domain', 'coarser_grid']
+smaller_domain_factor = 0.5
+coarser_grid_factor = 0.8
+
+# * Scenarios which did not fit are deferred here. A bigger node can run just
+# * those by pointing `scenario_list_filename` at this file.
+deferred_scenarios_filename = 'deferred_scenarios.txt'
+scenario_list_filename = None
+
+# * Only run the scenarios the generator reported as new or changed
+run_delta_only = False
+
+# * Threads per run and concurrent runs come from the profile written by
+# * `autotune_threads.py`. Without it, one run at a time uses all the cores.
+thread_profile_filename = 'thread_profile.yml'
+poll_interval = 5.0
+
+# * Processed inputs of `#python:` scenarios are cached by the hash of the
+# * input file, so re-runs go straight to the hash commands
+use_processed_cache = True
+processed_cache_folder = Path.cwd() / 'processed_cache'
+
+# * Progress is served as JSON on http://status_host:status_port/status while
+# * the sweep runs, and summarised in the log every `status_interval` seconds.
+# * Set `status_port` to `None` to only log the summary.
+status_host = '127.0.0.1'
+status_port = 8765
+status_interval = 60.0
+
+# * Running jobs are killed if their iteration count stops moving for
+# * `stall_timeout` seconds, if no progress shows up within `startup_timeout`
+# * seconds, if a snapshot contains NaN or Inf values, or if they take more
+# * than `runtime_factor` times their predicted runtime. The prediction uses
+# * the throughput of the completed jobs, or the thread profile before any
+# * job completes. Set `runtime_factor` to `None` to never kill slow jobs.
+watchdog_enabled = True
+stall_timeout = 900.0
+startup_timeout = 1800.0
+runtime_factor = 3.0
+check_snapshots = True
+
+# * Outputs of completed scenarios are compressed into `archive_folder` in
+# * the background and removed from the scenarios folder. New scenarios
+# * only launch while the scenarios folder, the outputs the running ones are
+# * still predicted to write, and the outputs of the new one fit in
+# * `disk_budget_bytes`. Set either to `None` to disable it.
+archive_folder = None
+archive_workers = 2
+archive_compression_level = 6
+disk_budget_bytes = None
+
+# * Families packed by the generator with `pack_families` run as one gprMax
+# * invocation each, one model per scenario, instead of one invocation per
+# * scenario. A family only runs packed if all its scenarios are due to run
+# * as planned, otherwise they run on their own.
+run_families = False
+
+# * Outputs of completed scenarios are uploaded to `upload_bucket` in the
+# * background, once archived if `archive_folder` is set. The endpoint, key
+# * prefix, part size, and retries are set in `object_upload.py`. Set it to
+# * `None` to disable uploads.
+upload_bucket = None
+
+# ! Runner settings end
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    gprmax_logger = setup_logger("gprMax_scenario_runner", global_timestamp)
+    gprmax_logger.info("Starting gprMax simulations")
+
+    scenarios_folder = Path.cwd() / scenario_plan.SCENARIOS_FOLDER_NAMES[
+        model
+    ]
+
+    gprmax_logger.info("Processing %s", scenarios_folder)
+
+    scenarios_files = gprmax_jobs.discover_scenarios(scenarios_folder)
+
+    if run_delta_only:
+        scenario_list_filename = (
+            scenarios_folder / scenario_plan.DELTA_FILENAME
+        )
+
+    if scenario_list_filename is not None:
+        with open(scenario_list_filename, "r") as list_file:
+            scenario_names = {
+                line.strip() for line in list_file if line.strip()
+            }
+        scenarios_files = [
+            scenario_file for scenario_file in scenarios_files
+            if scenario_file.stem in scenario_names
+        ]
+
+    gprmax_logger.info("Found %d files", len(scenarios_files))
+
+    plan = scenario_plan.load_plan(scenarios_folder)
+    available_memory = memory_check.available_memory_bytes()
+
+    gprmax_logger.info(
+        "%.2f GB of memory available for simulations", available_memory / 1e9
+    )
+
+    cpu_count = os.cpu_count()
+    thread_profiles = gprmax_jobs.load_thread_profile(thread_profile_filename)
+    if thread_profiles:
+        gprmax_logger.info("Using thread profile %s", thread_profile_filename)
+
+    # * Scenarios which passed the pre-flight check, with their thread count,
+    # * share of the cores, and memory requirement
+    pending = []
+
+    for scenario_file in scenarios_files:
+        entry = plan.get(scenario_file.stem)
+        required_memory = 0.0
+
+        # * Pre-flight memory check, only possible for planned scenarios
+        if entry is None:
+            gprmax_logger.warning(
+                "%s is not in the plan, skipping memory check",
+                scenario_file.name
+            )
+        else:
+            fits, required_memory = memory_check.check_memory(
+                entry, available_memory, memory_safety_factor
+            )
+
+            if not fits:
+                gprmax_logger.warning(
+                    "%s needs %.2f GB, only %.2f GB available",
+                    scenario_file.name, required_memory / 1e9,
+                    available_memory / 1e9
+                )
+
+                fallback = None
+                if memory_action == 'fallback':
+                    fallback = memory_check.plan_fallback(
+                        entry, available_memory, memory_safety_factor,
+                        memory_fallbacks, smaller_domain_factor,
+                        coarser_grid_factor
+                    )
+
+                if fallback is not None:
+                    # * Only needed to render the modified input file
+                    import generate_scenario_files as generator
+
+                    new_entry, sim_params, applied = fallback
+                    scenario_text = generator.render_scenario(
+                        sim_params, new_entry["input_format"]
+                    )
+                    scenario_plan.write_if_changed(
+                        scenario_file, scenario_text
+                    )
+                    new_entry["content_hash"] = scenario_plan.content_hash(
+                        scenario_text
+                    )
+                    plan[scenario_file.stem] = new_entry
+                    scenario_plan.save_plan(scenarios_folder, plan)
+                    entry = new_entry
+                    required_memory = new_entry["memory_estimate"]
+
+                    gprmax_logger.warning(
+                        "Applied fallbacks %s to %s, now needs %.2f GB",
+                        ", ".join(applied), scenario_file.name,
+                        new_entry["memory_estimate"] / 1e9
+                    )
+                elif memory_action == 'defer' or memory_action == 'fallback':
+                    with open(
+                        deferred_scenarios_filename, "a"
+                    ) as deferred_file:
+                        deferred_file.write(scenario_file.stem + "\n")
+                    gprmax_logger.warning(
+                        "Deferred %s to %s",
+                        scenario_file.name, deferred_scenarios_filename
+                    )
+                    continue
+                else:
+                    gprmax_logger.error(
+                        "Refusing to run %s", scenario_file.name
+                    )
+                    continue
+
+        threads, workers, profile_rate = None, 1, None
+        if entry is not None:
+            nx, ny, nz = grid_estimates.grid_cells(entry)
+            threads, workers = gprmax_jobs.profile_for_cells(
+                thread_profiles, nx * ny * nz
+            )
+            profile_rate = gprmax_jobs.profile_job_rate(
+                thread_profiles, nx * ny * nz
+            )
+
+        pending.append(
+            (
+                scenario_file, threads, cpu_count / workers, required_memory,
+                profile_rate
+            )
+        )
+
+    status = sweep_status.SweepStatus(
+        {job[0].stem: plan.get(job[0].stem) for job in pending}
+    )
+
+    status_server = None
+    if status_port is not None:
+        try:
+            status_server = sweep_status.start_status_server(
+                status, status_host, status_port
+            )
+            gprmax_logger.info(
+                "Serving sweep status on http://%s:%d/status",
+                status_host, status_server.server_address[1]
+            )
+        except OSError as error:
+            gprmax_logger.warning("Status endpoint not started: %s", error)
+
+    archiver = None
+    if archive_folder is not None:
+        archiver = output_archive.OutputArchiver(
+            Path(archive_folder), archive_workers, archive_compression_level
+        )
+        gprmax_logger.info("Archiving outputs to %s", archive_folder)
+
+    uploader = None
+    if upload_bucket is not None:
+        # * Only needed when uploading, so `boto3` stays optional
+        import object_upload
+
+        uploader = object_upload.UploadSink(
+            upload_bucket,
+            object_upload.object_key(
+                object_upload.key_prefix, Path(scenarios_folder.name)
+            ),
+            object_upload.endpoint_url, object_upload.upload_workers,
+            object_upload.part_size, object_upload.part_threads,
+            object_upload.upload_retries, object_upload.retry_backoff
+        )
+        gprmax_logger.info("Uploading outputs to %s", upload_bucket)
+
+    output_estimates = {
+        job[0].stem: grid_estimates.estimate_output_bytes(plan[job[0].stem])
+        for job in pending if job[0].stem in plan
+    }
+    # * Shared geometry views are written by one scenario each
+    geometry_views = {
+        job[0].stem: output_archive.entry_geometry_view(plan.get(job[0].stem))
+        for job in pending
+    }
+
+    # * Scenario input files of each packed family job, in model order
+    family_members = {}
+    if run_families:
+        family_jobs = {}
+        for job in pending:
+            family = (plan.get(job[0].stem) or {}).get("family")
+            if family is not None:
+                family_jobs.setdefault(
+                    scenarios_folder / scenario_plan.FAMILIES_FOLDER_NAME /
+                    f"{family['name']}.py", []
+                ).append(job)
+
+        packed = {}
+        for family_file, jobs in family_jobs.items():
+            if not family_file.exists() or len(jobs) != (
+                plan[jobs[0][0].stem]["family"]["size"]
+            ):
+                continue
+
+            jobs.sort(key=lambda job: plan[job[0].stem]["family"]["index"])
+            family_members[family_file] = [job[0] for job in jobs]
+            output_estimates[family_file.stem] = sum(
+                output_estimates.get(job[0].stem, 0.0) for job in jobs
+            )
+            for job in jobs:
+                packed[job[0].stem] = (
+                    family_file, jobs[0][1], max(job[2] for job in jobs),
+                    max(job[3] for job in jobs), jobs[0][4]
+                )
+
+        # * Each family takes the place of its first scenario
+        pending = list(
+            dict.fromkeys(packed.get(job[0].stem, job) for job in pending)
+        )
+        gprmax_logger.info(
+            "Running %d scenarios as %d packed families",
+            sum(len(members) for members in family_members.values()),
+            len(family_members)
+        )
+
+    launches_paused = False
+
+    last_summary = time.time()
+
+    # * Launch scenarios whenever enough cores and memory are free. Scenarios
+    # * are started in order, but a smaller one may fill a gap left by a bigger
+    # * one which is still waiting.
+    running = {}
+
+    while pending or running:
+        used_cores = sum(job[2] for job, _, _ in running.values())
+        used_memory = sum(job[3] for job, _, _ in running.values())
+
+        used_disk = 0
+        if disk_budget_bytes is not None:
+            used_disk = output_archive.folder_bytes(scenarios_folder)
+            for job, _, _ in running.values():
+                # * Packed families write numbered outputs until they finish
+                if job[0] in family_members:
+                    written_files = output_archive.family_output_files(
+                        job[0],
+                        [
+                            geometry_views.get(member.stem)
+                            for member in family_members[job[0]]
+                        ]
+                    )
+                else:
+                    written_files = output_archive.scenario_output_files(
+                        job[0], geometry_views.get(job[0].stem)
+                    )
+
+                used_disk += max(
+                    output_estimates.get(job[0].stem, 0.0) -
+                    output_archive.files_bytes(written_files),
+                    0.0
+                )
+
+        for job in list(pending):
+            scenario_file, threads, cores, required_memory, _ = job
+            if running and (
+                used_cores + cores > cpu_count + 1e-9 or
+                used_memory + required_memory > available_memory
+            ):
+                continue
+
+            # * Only wait for disk space if a run or the archiver can free some
+            output_bytes = output_estimates.get(scenario_file.stem, 0.0)
+            if disk_budget_bytes is not None and (
+                used_disk + output_bytes > disk_budget_bytes
+            ):
+                if running or (archiver is not None and archiver.busy()):
+                    if not launches_paused:
+                        gprmax_logger.warning(
+                            "Pausing launches, %.2f GB of the %.2f GB disk "
+                            "budget in use", used_disk / 1e9,
+                            disk_budget_bytes / 1e9
+                        )
+                        launches_paused = True
+                    continue
+
+                gprmax_logger.warning(
+                    "%s may exceed the disk budget, launching anyway since "
+                    "nothing else can free space", scenario_file.name
+                )
+
+            if launches_paused:
+                gprmax_logger.info("Resuming launches")
+                launches_paused = False
+
+            members = family_members.get(scenario_file, [scenario_file])
+
+            # * A multi-model run processes its input once per model, so
+            # * only single scenarios use the processed input cache
+            run_file = scenario_file
+            if use_processed_cache and len(members) == 1:
+                run_file = gprmax_jobs.prepare_run_file(
+                    scenario_file, processed_cache_folder
+                )
+
+            gprmax_logger.info(
+                "Running %s with %s threads", run_file,
+                threads if threads is not None else "all"
+            )
+            process = gprmax_jobs.launch_job(
+                run_file, threads, scenario_file.with_suffix(".log"),
+                write_processed=(
+                    run_file.suffix == ".py" and len(members) == 1
+                ),
+                model_runs=len(members)
+            )
+            watch = None
+            if watchdog_enabled:
+                watch = job_watchdog.JobWatchdog(
+                    scenario_file, scenario_file.with_suffix(".log"),
+                    sum(
+                        grid_estimates.cell_updates(plan[member.stem])
+                        for member in members if member.stem in plan
+                    ),
+                    stall_timeout, startup_timeout, runtime_factor,
+                    check_snapshots, model_runs=len(members)
+                )
+
+            running[process] = (job, run_file, watch)
+            for member in members:
+                status.started(member.stem)
+            pending.remove(job)
+            used_cores += cores
+            used_memory += required_memory
+            used_disk += output_bytes
+
+        time.sleep(
+            poll_interval
+            if running or (archiver is not None and archiver.busy()) else 0
+        )
+
+        for process, (job, run_file, watch) in list(running.items()):
+            kill_reason = None
+            if process.poll() is None:
+                if watch is None:
+                    continue
+
+                kill_reason = watch.check(status.job_rate() or job[4])
+                if kill_reason is None:
+                    continue
+
+                process.kill()
+                process.wait()
+
+            del running[process]
+            if use_processed_cache:
+                gprmax_jobs.finish_run_file(
+                    job[0], run_file, processed_cache_folder
+                )
+
+            members = family_members.get(job[0], [job[0]])
+            if job[0] in family_members and (
+                kill_reason is None and process.returncode == 0
+            ):
+                gprmax_jobs.split_family_outputs(
+                    job[0], members,
+                    [geometry_views.get(member.stem) for member in members]
+                )
+
+            if kill_reason is not None:
+                with job[0].with_suffix(".log").open(mode="a") as log_handle:
+                    log_handle.write(f"\nWatchdog: {kill_reason}\n")
+
+            for member in members:
+                failure = kill_reason
+                if failure is None and process.returncode == 0 and watch:
+                    output_file = member.with_suffix(".out")
+                    bad_receivers = []
+                    if output_file.exists():
+                        bad_receivers = job_watchdog.non_finite_receivers(
+                            output_file
+                        )
+                    if bad_receivers:
+                        failure = (
+                            "NaN or Inf in receivers "
+                            f"{', '.join(bad_receivers)}"
+                        )
+                        with job[0].with_suffix(".log").open(
+                            mode="a"
+                        ) as log_handle:
+                            log_handle.write(f"\nWatchdog: {failure}\n")
+
+                success = failure is None and process.returncode == 0
+                status.finished(member.stem, success, 1.0 / len(members))
+
+                if failure is not None:
+                    gprmax_logger.error(
+                        "Watchdog failed %s: %s", member.name, failure
+                    )
+                elif process.returncode != 0:
+                    gprmax_logger.error(
+                        "gprMax error during simulation of %s, see %s",
+                        member.name, job[0].with_suffix(".log").name
+                    )
+                else:
+                    gprmax_logger.info(
+                        "Simulation of %s completed successfully", member.name
+                    )
+                    if archiver is not None:
+                        archiver.submit(
+                            member, geometry_views.get(member.stem)
+                        )
+                    elif uploader is not None:
+                        uploader.submit(
+                            member.stem,
+                            output_archive.scenario_output_files(
+                                member, geometry_views.get(member.stem)
+                            ),
+                            scenarios_folder
+                        )
+
+        if archiver is not None:
+            for name, future in archiver.collect():
+                output_archive.log_archived(gprmax_logger, name, future)
+                if uploader is not None and future.exception() is None:
+                    uploader.submit(
+                        name, output_archive.archived_output_files(
+                            Path(archive_folder), name,
+                            geometry_views.get(name)
+                        ),
+                        Path(archive_folder)
+                    )
+
+        if uploader is not None:
+            for name, future in uploader.collect():
+                object_upload.log_uploaded(gprmax_logger, name, future)
+
+        if time.time() - last_summary >= status_interval:
+            gprmax_logger.info("Progress: %s", status.summary_line())
+            last_summary = time.time()
+
+    if archiver is not None:
+        archiver.shutdown()
+        for name, future in archiver.collect():
+            output_archive.log_archived(gprmax_logger, name, future)
+            if uploader is not None and future.exception() is None:
+                uploader.submit(
+                    name, output_archive.archived_output_files(
+                        Path(archive_folder), name, geometry_views.get(name)
+                    ),
+                    Path(archive_folder)
+                )
+
+    if uploader is not None:
+        uploader.shutdown()
+        for name, future in uploader.collect():
+            object_upload.log_uploaded(gprmax_logger, name, future)
+
+    if status_server is not None:
+        status_server.shutdown()
+
+    gprmax_logger.info("Progress: %s", status.summary_line())
+    gprmax_logger.info("All files processed")
+
+    logging.shutdown()
@@ -0,0 +1,165 @@
+import json
+import math
+import hashlib
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+
+# * The plan sits next to the generated input files and describes every
+# * scenario in them, so later stages do not need to re-derive anything
+PLAN_FILENAME = "scenarios_plan.yml"
+
+# * Scenarios which are new or changed since the previous generation
+DELTA_FILENAME = "scenarios_delta.txt"
+
+# * Folder the generated inputs of each model are written to, and run from
+SCENARIOS_FOLDER_NAMES = {
+    "straight_pipe": "scenarios_empty",
+    "pipe_to_above_ground": "scenarios_above_ground",
+}
+
+# * YAML file with the values each model is swept over
+PARAMETERS_FILENAMES = {
+    "straight_pipe": "scenarios_empty_pipe.yml",
+    "pipe_to_above_ground": "scenarios_above_ground.yml",
+}
+
+# * Packed inputs of scenario families, run as several gprMax models each
+FAMILIES_FOLDER_NAME = "families"
+
+# * Parsing a large plan takes seconds, so the parsed plan is cached as
+# * JSON, keyed by the hash of the YAML file
+PLAN_CACHE_FILENAME = ".scenarios_plan_cache.json"
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_plan(scenarios_folder: Path) -> Dict[str, Dict]:
+    """Reads the scenario plan written by `generate_scenario_files.py`
+
+    Args:
+        scenarios_folder: A `Path` to the folder with the generated inputs
+
+    Returns:
+        A `dict` mapping scenario names, i.e. input filenames without their
+        extension, to their plan entries. The `dict` is empty if there is no
+        plan in the folder.
+
+    Raises:
+        Nothing
+    """
+    plan_file = scenarios_folder / PLAN_FILENAME
+
+    if not plan_file.exists():
+        return {}
+
+    plan_text = plan_file.read_bytes()
+    plan_hash = hashlib.sha256(plan_text).hexdigest()
+
+    cache_file = scenarios_folder / PLAN_CACHE_FILENAME
+    try:
+        with cache_file.open(mode="r") as input_file:
+            cache = json.load(input_file)
+        if cache.get("hash") == plan_hash:
+            return cache["scenarios"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    plan = yaml.load(plan_text, Loader=YAML_LOADER)
+    scenarios = plan.get("scenarios", {}) if plan else {}
+
+    try:
+        with cache_file.open(mode="w") as output_file:
+            json.dump({"hash": plan_hash, "scenarios": scenarios}, output_file)
+    except OSError:
+        pass
+
+    return scenarios
+
+
+def save_plan(scenarios_folder: Path, scenarios: Dict[str, Dict]) -> Path:
+    """Writes the scenario plan next to the generated inputs
+
+    Args:
+        scenarios_folder: A `Path` to the folder with the generated inputs
+        scenarios: A `dict` mapping scenario names to their plan entries.
+                   The entries must only contain plain Python types.
+
+    Returns:
+        The `Path` of the plan file
+
+    Raises:
+        Nothing
+    """
+    plan_file = scenarios_folder / PLAN_FILENAME
+
+    write_if_changed(
+        plan_file, yaml.safe_dump({"scenarios": scenarios}, sort_keys=False)
+    )
+
+    return plan_file
+
+
+def content_hash(content: str) -> str:
+    """Hashes the contents of an input file, as written to disk"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def write_if_changed(output_file: Path, content: str) -> bool:
+    """Writes a file only if its contents would change
+
+    Leaving unchanged files alone keeps them byte-identical, with their
+    modification times untouched, so anything keyed off them stays valid.
+
+    Args:
+        output_file: A `Path` to the file to write
+        content: The new contents of the file
+
+    Returns:
+        `True` if the file was written, `False` if it was already up to date
+
+    Raises:
+        Nothing
+    """
+    encoded = content.encode("utf-8")
+
+    if output_file.exists() and output_file.read_bytes() == encoded:
+        return False
+
+    output_file.write_bytes(encoded)
+
+    return True
+
+
+def save_delta(scenarios_folder: Path, names: List[str]) -> Path:
+    """Writes the names of the new and changed scenarios, one per line"""
+    delta_file = scenarios_folder / DELTA_FILENAME
+    write_if_changed(delta_file, "".join(name + "\n" for name in names))
+
+    return delta_file
+
+
+def receiver_separations(entry: Dict) -> List[float]:
+    """Calculates the transmitter to receiver distance for each receiver
+
+    Args:
+        entry: A plan entry, with `transmitter_position` and `receivers`
+
+    Returns:
+        A `list` of distances in metres, in the order of the receivers
+
+    Raises:
+        Nothing
+    """
+    transmitter = entry["transmitter_position"]
+
+    return [
+        math.sqrt(
+            sum(
+                (receiver[axis] - transmitter[axis]) ** 2
+                for axis in ("x", "y", "z")
+            )
+        )
+        for receiver in entry["receivers"]
+    ]
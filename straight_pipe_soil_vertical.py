@@ -11,6 +11,8 @@ import rflib
 from itur import p2040
 from itur import p527
 
+import grid_spacing
+
 
 Point = namedtuple('Point', ['x', 'y', 'z'])
 
@@ -27,6 +29,13 @@ snapshots_count = 4
 
 fund_freq = 2.45e9
 max_harmonic = 5
+
+# * `harmonic` resolves `max_harmonic` times `fund_freq`, `waveform` only the
+# * frequencies `waveform_type` contains, with the fewest cells which keep the
+# * phase velocity error of the grid below `max_dispersion_error`. See
+# * `grid_spacing.py`.
+grid_spacing_mode = 'harmonic'
+max_dispersion_error = 0.005
 runtime_multiplier = 3
 pml_cells_number = 20
 
@@ -125,13 +134,16 @@ if include_water:
 else:
     er_max = np.max([pipe_material_er, soil_er])
 
-lambda_min = speed_of_light / (max_harmonic * fund_freq)
-lambda_min_eff = lambda_min / np.sqrt(er_max)
-
-delta_d = lambda_min_eff / 10
-round_digits = int(np.ceil(-np.log10(delta_d))) + 1
-round_digits = np.power(10, round_digits)
-delta_d = np.trunc(delta_d * round_digits) / round_digits
+if grid_spacing_mode == 'waveform':
+    delta_d = grid_spacing.waveform_delta_d(
+        fund_freq, er_max, waveform_type,
+        grid_spacing.dispersion_cells_per_wavelength(
+            max_dispersion_error, 2 if geometry_mode == '2D' else 3
+        ),
+        max_harmonic
+    )
+else:
+    delta_d = grid_spacing.harmonic_delta_d(fund_freq, er_max, max_harmonic)
 
 # * PML command
 # * We use the `.format()` method instead of f-strings because it is more
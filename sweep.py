@@ -0,0 +1,244 @@
+import sys
+import runpy
+import argparse
+from pathlib import Path
+
+
+# ! CLI settings
+
+# * Without `--folder`, the commands use the scenarios folder of `--model`
+default_model = "straight_pipe"
+default_thread_profile_filename = "thread_profile.yml"
+default_status_url = "http://127.0.0.1:8765/status"
+
+# ! CLI settings end
+
+# * Subcommands which run a workflow script as if it was run on its own
+SCRIPT_COMMANDS = {
+    "generate": (
+        "generate_scenario_files",
+        "Render the gprMax input files and the scenario plan",
+    ),
+    "run": ("run_scenarios", "Run the generated scenarios with gprMax"),
+    "reduce": (
+        "reduce_outputs",
+        "Reduce the outputs and write the results table",
+    ),
+    "report": (
+        "aggregate_outputs",
+        "Aggregate receiver statistics across the outputs",
+    ),
+    "store": (
+        "sweep_store",
+        "Consolidate the traces and phasors of the sweep into one file",
+    ),
+    "benchmark": (
+        "reference_benchmark",
+        "Time the reference sweep and check its levels against golden values",
+    ),
+}
+
+
+def scenarios_folder(arguments: argparse.Namespace) -> Path:
+    """Picks the `--folder`, or the scenarios folder of the `--model`"""
+    import scenario_plan
+
+    if arguments.folder is not None:
+        return Path(arguments.folder)
+
+    return Path(scenario_plan.SCENARIOS_FOLDER_NAMES[arguments.model])
+
+
+def plan_command(arguments: argparse.Namespace) -> int:
+    """Prints the estimated work of the scenarios in the plan"""
+    import gprmax_jobs
+    import grid_estimates
+    import scenario_plan
+
+    folder = scenarios_folder(arguments)
+    plan = scenario_plan.load_plan(folder)
+    if not plan:
+        print(f"No scenario plan in {folder}, run `generate` first")
+        return 1
+
+    profiles = gprmax_jobs.load_thread_profile(arguments.profile)
+
+    totals = {}
+    for entry in plan.values():
+        nx, ny, nz = grid_estimates.grid_cells(entry)
+        cell_updates = grid_estimates.cell_updates(entry)
+        job_rate = gprmax_jobs.profile_job_rate(profiles, nx * ny * nz)
+        _, workers = gprmax_jobs.profile_for_cells(profiles, nx * ny * nz)
+
+        group = totals.setdefault(
+            (entry.get("model", "straight_pipe"), entry["fund_freq"]),
+            {
+                "scenarios": 0, "cell_updates": 0.0, "memory": 0.0,
+                "outputs": 0.0, "runtime": 0.0 if profiles else None,
+            }
+        )
+        group["scenarios"] += 1
+        group["cell_updates"] += cell_updates
+        group["memory"] = max(
+            group["memory"], grid_estimates.estimate_memory_bytes(entry)
+        )
+        group["outputs"] += grid_estimates.estimate_output_bytes(entry)
+        if group["runtime"] is not None and job_rate:
+            # * Concurrent runs share the node, so each takes up only a
+            # * fraction of the wall-clock time
+            group["runtime"] += cell_updates / job_rate / workers
+
+    print(
+        f"{'model':<22}{'frequency':>12}{'scenarios':>11}"
+        f"{'cell updates':>15}{'peak memory':>13}{'outputs':>11}"
+        f"{'runtime':>11}"
+    )
+    for (model, fund_freq), group in sorted(totals.items()):
+        runtime = "n/a"
+        if group["runtime"] is not None:
+            runtime = f"{group['runtime'] / 3600:.1f} h"
+        print(
+            f"{model:<22}{fund_freq / 1e9:>9.3f} GHz{group['scenarios']:>11}"
+            f"{group['cell_updates']:>15.3e}"
+            f"{group['memory'] / 1e9:>10.2f} GB"
+            f"{group['outputs'] / 1e9:>8.2f} GB{runtime:>11}"
+        )
+
+    print(
+        f"{len(plan)} scenarios, "
+        f"{sum(g['cell_updates'] for g in totals.values()):.3e} cell updates, "
+        f"{sum(g['outputs'] for g in totals.values()) / 1e9:.2f} GB of outputs"
+    )
+    if not profiles:
+        print(
+            f"No thread profile in {arguments.profile}, run "
+            "`autotune_threads.py` for runtime estimates"
+        )
+
+    return 0
+
+
+def list_command(arguments: argparse.Namespace) -> int:
+    """Prints the scenarios in the plan and whether they have run"""
+    import scenario_plan
+
+    folder = scenarios_folder(arguments)
+    plan = scenario_plan.load_plan(folder)
+    if not plan:
+        print(f"No scenario plan in {folder}, run `generate` first")
+        return 1
+
+    for name in sorted(plan):
+        if (folder / f"{name}.out").exists():
+            state = "done"
+        elif (folder / f"{name}.log").exists():
+            state = "started"
+        else:
+            state = "pending"
+
+        if arguments.state in ("all", state):
+            print(f"{state:<8} {name}")
+
+    return 0
+
+
+def status_command(arguments: argparse.Namespace) -> int:
+    """Prints the progress served by a running `run_scenarios.py`"""
+    import json
+    import urllib.error
+    import urllib.request
+
+    import sweep_status
+
+    try:
+        with urllib.request.urlopen(arguments.url, timeout=5) as response:
+            status = json.loads(response.read().decode("utf-8"))
+    except (urllib.error.URLError, OSError) as error:
+        print(f"No sweep status at {arguments.url}: {error}")
+        return 1
+
+    print(sweep_status.format_summary(status))
+    for fund_freq, progress in sorted(status["frequencies"].items()):
+        print(
+            f"  {fund_freq:>12} Hz: {progress['completed']} completed, "
+            f"{progress['failed']} failed, {progress['total']} total"
+        )
+    for name in status["running"]:
+        print(f"  running {name}")
+
+    return 0
+
+
+def script_command(arguments: argparse.Namespace) -> int:
+    """Runs a workflow script as if it was run on its own"""
+    module_name, _ = SCRIPT_COMMANDS[arguments.command]
+    runpy.run_module(module_name, run_name="__main__")
+
+    return 0
+
+
+def add_folder_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the options which pick the folder with the scenario plan"""
+    import scenario_plan
+
+    parser.add_argument(
+        "--model", default=default_model,
+        choices=sorted(scenario_plan.SCENARIOS_FOLDER_NAMES),
+        help="Model whose scenarios folder to use"
+    )
+    parser.add_argument(
+        "--folder", default=None,
+        help="Folder with the scenario plan, instead of that of the model"
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Sets up the parser for all the subcommands"""
+    parser = argparse.ArgumentParser(
+        prog="sweep.py",
+        description="Generate, run, and post-process gprMax pipe sweeps",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = subparsers.add_parser(
+        "plan", help="Estimate the work of the generated scenarios"
+    )
+    add_folder_arguments(plan_parser)
+    plan_parser.add_argument(
+        "--profile", default=default_thread_profile_filename,
+        help="Thread profile used for runtime estimates"
+    )
+    plan_parser.set_defaults(handler=plan_command)
+
+    list_parser = subparsers.add_parser(
+        "list", help="List the scenarios and whether they have run"
+    )
+    add_folder_arguments(list_parser)
+    list_parser.add_argument(
+        "--state", default="all",
+        choices=("all", "pending", "started", "done"),
+        help="Only list scenarios in this state"
+    )
+    list_parser.set_defaults(handler=list_command)
+
+    status_parser = subparsers.add_parser(
+        "status", help="Show the progress of a running sweep"
+    )
+    status_parser.add_argument(
+        "--url", default=default_status_url,
+        help="Status endpoint of `run_scenarios.py`"
+    )
+    status_parser.set_defaults(handler=status_command)
+
+    for command, (module_name, help_text) in SCRIPT_COMMANDS.items():
+        script_parser = subparsers.add_parser(
+            command, help=f"{help_text}, see `{module_name}.py`"
+        )
+        script_parser.set_defaults(handler=script_command)
+
+    return parser
+
+
+if __name__ == "__main__":
+    cli_arguments = build_parser().parse_args()
+    sys.exit(cli_arguments.handler(cli_arguments))
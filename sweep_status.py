@@ -0,0 +1,243 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import grid_estimates
+
+
+class SweepStatus:
+    """Thread-safe progress tracker for a running sweep
+
+    The cost of a scenario is its number of cell updates, i.e. cells times
+    iterations, taken from the scenario plan. Throughput and the ETA are
+    derived from the cost of the scenarios that have completed so far.
+
+    Args:
+        entries: A `dict` mapping the names of the scenarios to run to their
+                 plan entries. Scenarios without a plan entry map to `None`
+                 and are counted, but do not contribute to the ETA.
+        throughput_window: How far back, in seconds, completed scenarios
+                           count towards the current throughput
+    """
+
+    def __init__(
+        self,
+        entries: Dict[str, Optional[Dict]],
+        throughput_window: float = 3600.0,
+    ):
+        self._lock = threading.Lock()
+        self._start_time = time.time()
+        self._throughput_window = throughput_window
+
+        self._costs = {
+            name: grid_estimates.cell_updates(entry) if entry else 0.0
+            for name, entry in entries.items()
+        }
+        self._frequencies = {
+            name: entry["fund_freq"] if entry else None
+            for name, entry in entries.items()
+        }
+        self._states = {name: "pending" for name in entries}
+        self._started = {}
+        self._completed = []
+
+    def started(self, name: str) -> None:
+        """Marks a scenario as running"""
+        with self._lock:
+            self._states[name] = "running"
+            self._started[name] = time.time()
+
+    def finished(self, name: str, success: bool, share: float = 1.0) -> None:
+        """Marks a scenario as completed or failed
+
+        Failed scenarios do not count towards the throughput, since they
+        may have been killed long before doing all their cell updates. A
+        scenario run as one of `n` models of a packed family only took
+        `share = 1 / n` of the time since the family started.
+        """
+        with self._lock:
+            self._states[name] = "completed" if success else "failed"
+            start_time = self._started.pop(name, time.time())
+            if success:
+                self._completed.append(
+                    (
+                        time.time(), share * (time.time() - start_time),
+                        self._costs[name]
+                    )
+                )
+
+    def job_rate(self) -> Optional[float]:
+        """The average cells per second of a single completed scenario"""
+        with self._lock:
+            return self._job_rate()
+
+    def _job_rate(self) -> Optional[float]:
+        completed_cost = sum(cost for _, _, cost in self._completed)
+        job_durations = sum(duration for _, duration, _ in self._completed)
+
+        if completed_cost <= 0 or job_durations <= 0:
+            return None
+
+        return completed_cost / job_durations
+
+    def snapshot(self) -> Dict:
+        """Summarises the state of the sweep
+
+        Returns:
+            A `dict` with the scenario counts per state, the current and
+            average throughput in cells per second, the progress of each
+            frequency, the ETA in seconds, and the names of the running
+            scenarios. The throughput and ETA are `None` until the first
+            scenario completes.
+        """
+        with self._lock:
+            now = time.time()
+            elapsed = now - self._start_time
+
+            counts = {
+                state: 0
+                for state in ("pending", "running", "completed", "failed")
+            }
+            for state in self._states.values():
+                counts[state] += 1
+
+            completed_cost = sum(cost for _, _, cost in self._completed)
+            recent_cost = sum(
+                cost for end_time, _, cost in self._completed
+                if now - end_time <= self._throughput_window
+            )
+            window = min(self._throughput_window, elapsed)
+
+            average_throughput = None
+            current_throughput = None
+            if completed_cost > 0 and elapsed > 0:
+                average_throughput = completed_cost / elapsed
+                current_throughput = (
+                    recent_cost / window if recent_cost > 0 and window > 0
+                    else average_throughput
+                )
+
+            # * Running scenarios are assumed to progress at the average
+            # * rate of a single completed scenario
+            job_rate = self._job_rate() or 0.0
+            remaining_cost = 0.0
+            for name, state in self._states.items():
+                if state == "pending":
+                    remaining_cost += self._costs[name]
+                elif state == "running":
+                    remaining_cost += max(
+                        self._costs[name] -
+                        job_rate * (now - self._started[name]),
+                        0.0
+                    )
+
+            eta = None
+            if current_throughput:
+                eta = remaining_cost / current_throughput
+
+            frequencies = {}
+            for name, fund_freq in self._frequencies.items():
+                key = "unknown" if fund_freq is None else f"{fund_freq:g}"
+                progress = frequencies.setdefault(
+                    key, {"total": 0, "completed": 0, "failed": 0}
+                )
+                progress["total"] += 1
+                if self._states[name] in ("completed", "failed"):
+                    progress[self._states[name]] += 1
+
+            return {
+                "elapsed": elapsed,
+                "counts": counts,
+                "cells_per_second": current_throughput,
+                "average_cells_per_second": average_throughput,
+                "remaining_cell_updates": remaining_cost,
+                "eta_seconds": eta,
+                "frequencies": frequencies,
+                "running": sorted(
+                    name for name, state in self._states.items()
+                    if state == "running"
+                ),
+            }
+
+    def summary_line(self) -> str:
+        """Formats the sweep state as a single line for the terminal log"""
+        return format_summary(self.snapshot())
+
+
+def format_summary(status: Dict) -> str:
+    """Formats a `SweepStatus.snapshot()` as a single line
+
+    Args:
+        status: The `dict` returned by `SweepStatus.snapshot()`, possibly
+                fetched from the status endpoint
+
+    Returns:
+        A `str` with the scenario counts, the throughput, and the ETA
+
+    Raises:
+        Nothing
+    """
+    counts = status["counts"]
+
+    throughput = "n/a"
+    if status["cells_per_second"] is not None:
+        throughput = f"{status['cells_per_second']:.3e} cells/s"
+
+    eta = "n/a"
+    if status["eta_seconds"] is not None:
+        eta = time.strftime(
+            "%Y-%m-%d %H:%M:%S",
+            time.localtime(time.time() + status["eta_seconds"])
+        )
+
+    return (
+        f"{counts['completed']} completed, {counts['running']} running, "
+        f"{counts['failed']} failed, {counts['pending']} pending, "
+        f"{throughput}, ETA {eta}"
+    )
+
+
+def start_status_server(
+    status: SweepStatus, host: str, port: int
+) -> ThreadingHTTPServer:
+    """Serves the sweep status as JSON from a background thread
+
+    `GET /` and `GET /status` both return `SweepStatus.snapshot()`.
+
+    Args:
+        status: The `SweepStatus` of the running sweep
+        host: The address to listen on, normally `127.0.0.1`
+        port: The port to listen on, `0` picks a free one
+
+    Returns:
+        The running `ThreadingHTTPServer`. Call its `shutdown` method once
+        the sweep is over.
+
+    Raises:
+        OSError: If the port is already in use
+    """
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/", "/status"):
+                self.send_error(404)
+                return
+
+            body = json.dumps(status.snapshot(), indent=2).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # * Keep status requests out of the runner's log
+            pass
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
@@ -0,0 +1,391 @@
+import math
+import datetime
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import yaml
+import numpy as np
+import h5py
+
+import gprmax_outputs
+import reduce_outputs
+import scenario_plan
+from logger_setup import setup_logger
+
+
+# ! Sweep store settings
+
+# * Model whose scenarios are stored, one of the keys of
+# * `scenario_plan.SCENARIOS_FOLDER_NAMES`
+model = "straight_pipe"
+
+# * The store is indexed by the sweep axes of `parameters_values_filename`,
+# * in the order of that file, followed by the receiver, the field
+# * component, and for traces the time step
+scenarios_folder_name = scenario_plan.SCENARIOS_FOLDER_NAMES[model]
+reduced_folder_name = "scenarios_reduced"
+parameters_values_filename = scenario_plan.PARAMETERS_FILENAMES[model]
+store_filename = "sweep_store.h5"
+
+store_components = ("Ex", "Ey", "Ez")
+phasor_periods = 10
+
+# * The largest size of a chunk of the store, before compression
+chunk_bytes = 1 << 20
+
+# ! Sweep store settings end
+
+
+def chunk_shape(
+    shape: Sequence[int], itemsize: int, target_bytes: int
+) -> Tuple[int, ...]:
+    """Splits a dataset into chunks spread evenly across its axes
+
+    Every axis is halved in turn until a chunk fits in `target_bytes`, so
+    each axis is split into a similar number of chunks, and reading a slice
+    along any one of them only reads a few chunks.
+
+    Args:
+        shape: The shape of the dataset
+        itemsize: The size of one element, in bytes
+        target_bytes: The largest size of a chunk, in bytes
+
+    Returns:
+        The chunk shape
+
+    Raises:
+        Nothing
+    """
+    chunks = [max(int(size), 1) for size in shape]
+
+    axis = 0
+    while math.prod(chunks) * itemsize > target_bytes and max(chunks) > 1:
+        chunks[axis] = int(math.ceil(chunks[axis] / 2))
+        axis = (axis + 1) % len(chunks)
+
+    return tuple(chunks)
+
+
+def sweep_axes(filename: str, parameter_names: Sequence[str]) -> Dict:
+    """Reads the values of each sweep axis
+
+    Args:
+        filename: A `str` with the YAML file listing the values of each
+                  sweep parameter, e.g. `scenarios_empty_pipe.yml`
+        parameter_names: The names of the sweep parameters, in the order of
+                         the YAML file, as used in the scenario plan
+
+    Returns:
+        A `dict` mapping each parameter name to its `list` of values
+
+    Raises:
+        ValueError: If the file has a different number of parameters
+    """
+    with open(filename, "r") as input_file:
+        all_params_values = yaml.safe_load(input_file)
+
+    if len(all_params_values) != len(parameter_names):
+        raise ValueError(
+            f"{filename} has {len(all_params_values)} sweep parameters, the "
+            f"plan has {len(parameter_names)}"
+        )
+
+    return dict(zip(parameter_names, all_params_values.values()))
+
+
+def axis_index(values: Sequence, value) -> int:
+    """Finds a value on a sweep axis, comparing numbers with a tolerance
+
+    Raises:
+        ValueError: If the value is not on the axis
+    """
+    for index, axis_value in enumerate(values):
+        if isinstance(axis_value, str) or isinstance(value, str):
+            if axis_value == value:
+                return index
+        elif math.isclose(float(axis_value), float(value), rel_tol=1e-9):
+            return index
+
+    raise ValueError(f"{value} is not one of {list(values)}")
+
+
+def scenario_source(
+    scenarios_folder: Path, reduced_folder: Path, name: str
+) -> Optional[Path]:
+    """Picks the reduced file of a scenario, or its `.out` file without one"""
+    reduced_file = reduced_folder / f"{name}_reduced.h5"
+    if reduced_file.exists():
+        return reduced_file
+
+    output_file = scenarios_folder / f"{name}.out"
+    if output_file.exists():
+        return output_file
+
+    return None
+
+
+def read_source(
+    source: Path, components: Tuple[str, ...]
+) -> Tuple[Dict, Dict[str, Dict[str, np.ndarray]]]:
+    """Reads the metadata and traces of a reduced or `.out` file
+
+    The components of `.out` files are memory-mapped, so only the requested
+    ones are read, see `gprmax_outputs.map_receivers`.
+    """
+    metadata = gprmax_outputs.read_output_metadata(source)
+
+    if source.suffix == ".out":
+        receivers = gprmax_outputs.map_receivers(source, components)
+    else:
+        receivers = reduce_outputs.read_reduced_receivers(source)
+
+    return metadata, receivers
+
+
+def build_store(
+    store_path: Path,
+    plan: Dict[str, Dict],
+    axes: Dict[str, List],
+    sources: Dict[str, Path],
+    components: Tuple[str, ...],
+    periods: int,
+    target_bytes: int,
+    logger: logging.Logger,
+) -> int:
+    """Writes the traces and phasors of a whole sweep into one HDF5 file
+
+    Each scenario is gathered in memory and written with one write per
+    dataset. The chunks span several scenarios, so the scenarios are
+    written in the order of the store, which fills each chunk while it is
+    still in the chunk cache instead of recompressing it for every slice.
+
+    The store holds these datasets, each with a `dims` attribute naming its
+    axes. Scenarios without outputs are left as NaN, or 0 for `iterations`.
+
+    * `axes/<parameter>`: The values of each sweep axis
+    * `scenario`: The scenario names, indexed by the sweep axes
+    * `dt`, `iterations`: The time step and trace length of each scenario
+    * `positions`: The receiver positions, with a last axis of x, y, and z
+    * `phasors`: The complex steady-state amplitude of each component at
+      the excitation frequency, see `gprmax_outputs.receiver_phasor`
+    * `traces`: The receiver traces, padded with NaN to the longest one
+
+    Args:
+        store_path: A `Path` for the store
+        plan: The scenario plan of the sweep
+        axes: The `dict` returned by `sweep_axes`
+        sources: A `dict` mapping scenario names to their reduced or `.out`
+                 files
+        components: The field components to store, e.g. `("Ez",)`
+        periods: How many periods at the end of each trace the phasors use
+        target_bytes: The largest size of a chunk, in bytes
+        logger: The `Logger` to report progress to
+
+    Returns:
+        The number of scenarios written to the store
+
+    Raises:
+        ValueError: If a scenario lies outside the sweep axes
+    """
+    names = list(axes)
+    sweep_shape = tuple(len(values) for values in axes.values())
+
+    receivers, samples = 0, 0
+    for source in sources.values():
+        with h5py.File(source, "r") as source_file:
+            receivers = max(receivers, len(source_file.get("rxs", {})))
+            samples = max(samples, int(source_file.attrs["Iterations"]))
+
+    datasets = {
+        "dt": (sweep_shape, np.float64, np.nan, names),
+        "iterations": (sweep_shape, np.int64, 0, names),
+        "positions": (
+            sweep_shape + (receivers, 3), np.float64, np.nan,
+            names + ["receiver", "position"]
+        ),
+        "phasors": (
+            sweep_shape + (receivers, len(components)), np.complex64,
+            complex(np.nan, np.nan), names + ["receiver", "component"]
+        ),
+        "traces": (
+            sweep_shape + (receivers, len(components), samples),
+            np.float32, np.nan, names + ["receiver", "component", "sample"]
+        ),
+    }
+
+    written = 0
+
+    with h5py.File(store_path, "w", rdcc_nbytes=64 * target_bytes) as store:
+        store.attrs["dims"] = names
+        store.attrs["components"] = list(components)
+        store.attrs["phasor_periods"] = periods
+
+        for name, values in axes.items():
+            store.create_dataset(
+                f"axes/{name}",
+                data=np.array(
+                    values,
+                    dtype=h5py.string_dtype() if isinstance(values[0], str)
+                    else np.float64
+                ),
+            )
+
+        scenario_names = store.create_dataset(
+            "scenario", shape=sweep_shape, dtype=h5py.string_dtype()
+        )
+        scenario_names.attrs["dims"] = names
+
+        for dataset_name, (shape, dtype, fill, dims) in datasets.items():
+            dataset = store.create_dataset(
+                dataset_name,
+                shape=shape,
+                dtype=dtype,
+                fillvalue=np.array(fill).astype(dtype)[()],
+                chunks=chunk_shape(
+                    shape, np.dtype(dtype).itemsize, target_bytes
+                ) if all(shape) else None,
+                compression="gzip",
+                shuffle=True,
+            )
+            dataset.attrs["dims"] = dims
+
+        indices = {}
+        for name in sources:
+            parameters = plan[name]["parameters"]
+            indices[name] = tuple(
+                axis_index(axes[parameter], parameters[parameter])
+                for parameter in names
+            )
+
+        for name in sorted(sources, key=indices.get):
+            index = indices[name]
+            metadata, traces = read_source(sources[name], components)
+            dt = metadata["dt"]
+
+            rows = {
+                dataset_name: np.full(
+                    shape[len(sweep_shape):], fill, dtype=dtype
+                )
+                for dataset_name, (shape, dtype, fill, _) in datasets.items()
+                if dataset_name in ("positions", "phasors", "traces")
+            }
+
+            for rx_index, receiver in enumerate(metadata["receivers"]):
+                rows["positions"][rx_index] = receiver["position"]
+
+                for component_index, component in enumerate(components):
+                    trace = traces[receiver["group"]].get(component)
+                    if trace is None:
+                        continue
+
+                    rows["phasors"][
+                        rx_index, component_index
+                    ] = gprmax_outputs.receiver_phasor(
+                        trace, dt, plan[name]["fund_freq"], periods
+                    )
+                    rows["traces"][
+                        rx_index, component_index, :len(trace)
+                    ] = trace[:]
+
+            store["scenario"][index] = name
+            store["dt"][index] = dt
+            store["iterations"][index] = metadata["iterations"]
+            for dataset_name, row in rows.items():
+                store[dataset_name][index] = row
+
+            written += 1
+            logger.info("Stored %s", name)
+
+    return written
+
+
+def select(
+    store_path: Path, dataset_name: str, **coordinates
+) -> Tuple[np.ndarray, List[str]]:
+    """Reads a slice of a store by the values of its sweep axes
+
+    Sweep axes that are not given are read in full, so fixing all but one
+    returns the trend along that axis in a single read.
+
+    Args:
+        store_path: A `Path` to a store written by `build_store`
+        dataset_name: One of `scenario`, `dt`, `iterations`, `positions`,
+                      `phasors`, or `traces`
+        coordinates: The value of each sweep axis to fix, by parameter name,
+                     plus optionally `receiver` and `component`, e.g.
+                     `soil_name="clay", component="Ez"`
+
+    Returns:
+        A `tuple` with the `numpy` array, and the names of its axes
+
+    Raises:
+        ValueError: If a value is not on its axis, or an axis is unknown
+    """
+    with h5py.File(store_path, "r") as store:
+        dataset = store[dataset_name]
+        dims = list(dataset.attrs["dims"])
+        components = list(store.attrs["components"])
+
+        selection = []
+        for dim in dims:
+            if dim not in coordinates:
+                selection.append(slice(None))
+            elif dim == "component":
+                selection.append(components.index(coordinates[dim]))
+            elif dim in ("receiver", "position", "sample"):
+                selection.append(int(coordinates[dim]))
+            else:
+                selection.append(
+                    axis_index(
+                        [
+                            value.decode() if isinstance(value, bytes)
+                            else value for value in store[f"axes/{dim}"][()]
+                        ],
+                        coordinates[dim]
+                    )
+                )
+
+        unknown = set(coordinates) - set(dims)
+        if unknown:
+            raise ValueError(
+                f"{dataset_name} has no axes {', '.join(sorted(unknown))}"
+            )
+
+        remaining = [dim for dim in dims if dim not in coordinates]
+
+        return dataset[tuple(selection)], remaining
+
+
+if __name__ == "__main__":
+    global_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    store_logger = setup_logger("gprMax_sweep_store", global_timestamp)
+
+    scenarios_folder = Path.cwd() / scenarios_folder_name
+    reduced_folder = Path.cwd() / reduced_folder_name
+    plan = scenario_plan.load_plan(scenarios_folder)
+
+    if not plan:
+        store_logger.error("No scenario plan in %s", scenarios_folder)
+    else:
+        parameter_names = list(next(iter(plan.values()))["parameters"])
+        axes = sweep_axes(parameters_values_filename, parameter_names)
+
+        sources = {}
+        for name in sorted(plan):
+            source = scenario_source(scenarios_folder, reduced_folder, name)
+            if source is None:
+                store_logger.warning("%s has no outputs yet, skipping", name)
+            else:
+                sources[name] = source
+
+        written = build_store(
+            Path.cwd() / store_filename, plan, axes, sources,
+            store_components, phasor_periods, chunk_bytes, store_logger
+        )
+        store_logger.info(
+            "Stored %d of %d scenarios in %s",
+            written, len(plan), store_filename
+        )
+
+    logging.shutdown()
@@ -0,0 +1,164 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import gprmax_outputs
+
+
+# * How each field component transforms when mirrored in a plane of constant
+# * x. Behind a PMC wall, the tangential magnetic field is odd, which is the
+# * case for sources polarised along y or z on the plane. Behind a PEC wall,
+# * the tangential electric field is odd, i.e. sources polarised along x.
+MIRROR_SIGNS = {
+    "pmc": {"Ex": -1, "Ey": 1, "Ez": 1, "Hx": 1, "Hy": -1, "Hz": -1},
+    "pec": {"Ex": 1, "Ey": -1, "Ez": -1, "Hx": -1, "Hy": 1, "Hz": 1},
+}
+
+# * Snapshot arrays gprMax writes, with the components of each
+SNAPSHOT_COMPONENTS = {
+    "E-field": ("Ex", "Ey", "Ez"),
+    "H-field": ("Hx", "Hy", "Hz"),
+}
+
+
+def symmetry_boundary(polarisation: str) -> str:
+    """Picks the wall which mirrors a source on the symmetry plane
+
+    Args:
+        polarisation: The polarisation of the Hertzian dipole, `x`, `y`, or
+                      `z`, where the symmetry plane has constant x
+
+    Returns:
+        `pec` for sources normal to the plane, otherwise `pmc`
+
+    Raises:
+        Nothing
+    """
+    return "pec" if polarisation == "x" else "pmc"
+
+
+def mirror_receivers(
+    receivers: List[Dict],
+    traces: Dict[str, Dict[str, np.ndarray]],
+    plane_x: float,
+    boundary: str,
+    tolerance: float = 1e-9,
+) -> Tuple[List[Dict], Dict[str, Dict[str, np.ndarray]]]:
+    """Adds the mirror image of every receiver of a half-domain model
+
+    Receivers on the plane are not mirrored. The mirror images are named
+    after the last receiver group, i.e. `rx<N + 1>` onwards, in order of
+    increasing x, so the original groups keep their names.
+
+    Args:
+        receivers: The receivers of `gprmax_outputs.read_output_metadata`
+        traces: The traces of `gprmax_outputs.read_receivers`
+        plane_x: The x coordinate of the symmetry plane, in metres
+        boundary: Either `pec` or `pmc`, see `symmetry_boundary`
+        tolerance: How close to the plane a receiver counts as on it, in
+                   metres
+
+    Returns:
+        A `tuple` with the receivers and traces of the full-width model. The
+        mirror images have a `mirror_of` key with their source group.
+
+    Raises:
+        KeyError: If `boundary` is not `pec` or `pmc`
+    """
+    signs = MIRROR_SIGNS[boundary]
+
+    full_receivers = [dict(receiver) for receiver in receivers]
+    full_traces = dict(traces)
+
+    sources = sorted(
+        (
+            receiver for receiver in receivers
+            if receiver["position"][0] < plane_x - tolerance
+        ),
+        key=lambda receiver: -receiver["position"][0]
+    )
+
+    next_number = 1 + max(
+        (
+            int(gprmax_outputs.natural_sort_key(receiver["group"])[1])
+            for receiver in receivers
+        ),
+        default=0
+    )
+
+    for number, receiver in enumerate(sources, start=next_number):
+        x, y, z = receiver["position"]
+        group = f"rx{number}"
+
+        full_receivers.append(
+            {
+                "group": group,
+                "name": f"{receiver['name']}_mirror",
+                "position": (2 * plane_x - x, y, z),
+                "mirror_of": receiver["group"],
+            }
+        )
+        full_traces[group] = {
+            component: signs[component] * values
+            for component, values in traces[receiver["group"]].items()
+        }
+
+    return full_receivers, full_traces
+
+
+def mirror_snapshot(
+    image_info: Dict,
+    arrays: Dict[str, np.ndarray],
+    plane_x: float,
+    boundary: str,
+) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """Reconstructs a full-width snapshot from a half-domain one
+
+    Only the cells on the model side of the plane are kept, i.e. any wall
+    cells beyond it are dropped, and their mirror image is appended.
+
+    Args:
+        image_info: The image information of `gprmax_outputs.read_vti_arrays`
+        arrays: The arrays of `gprmax_outputs.read_vti_arrays`, each of shape
+                `(nz, ny, nx, components)`
+        plane_x: The x coordinate of the symmetry plane, in metres
+        boundary: Either `pec` or `pmc`, see `symmetry_boundary`
+
+    Returns:
+        A `tuple` with the image information and arrays of the full-width
+        snapshot. Arrays other than the E and H fields are mirrored as they
+        are, e.g. material IDs.
+
+    Raises:
+        KeyError: If `boundary` is not `pec` or `pmc`
+    """
+    signs = MIRROR_SIGNS[boundary]
+
+    origin_x = image_info["Origin"][0]
+    spacing_x = image_info["Spacing"][0]
+    kept_cells = int(round((plane_x - origin_x) / spacing_x))
+
+    full_arrays = {}
+    for name, values in arrays.items():
+        kept = values[:, :, :kept_cells, :]
+
+        components = SNAPSHOT_COMPONENTS.get(name)
+        if components is None:
+            component_signs = np.ones(values.shape[3], dtype=values.dtype)
+        else:
+            component_signs = np.array(
+                [signs[component] for component in components],
+                dtype=values.dtype,
+            )
+
+        full_arrays[name] = np.concatenate(
+            [kept, kept[:, :, ::-1, :] * component_signs], axis=2
+        )
+
+    extent = list(image_info["WholeExtent"])
+    extent[1] = extent[0] + 2 * kept_cells
+
+    full_info = dict(image_info)
+    full_info["WholeExtent"] = extent
+
+    return full_info, full_arrays
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+
+# * The workflow scripts are top-level modules run from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,39 @@
+import gprmax_outputs
+import output_archive
+
+
+def touch(path, size=1):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+    return path
+
+
+def test_find_snapshot_files_of_multi_model_runs(tmp_path):
+    first = touch(tmp_path / "family_snaps1" / "snapshot1.vti")
+    second = touch(tmp_path / "family_snaps2" / "snapshot1.vti")
+    touch(tmp_path / "family_snaps" / "snapshot1.vti")
+
+    assert set(
+        gprmax_outputs.find_snapshot_files(tmp_path, "family", 2)
+    ) == {first, second}
+    assert gprmax_outputs.find_snapshot_files(tmp_path, "family") == [
+        tmp_path / "family_snaps" / "snapshot1.vti"
+    ]
+
+
+def test_family_output_files(tmp_path):
+    family_file = touch(tmp_path / "families" / "family.py")
+    outputs = [
+        touch(family_file.with_name("family1.out"), 10),
+        touch(family_file.with_name("family2.out"), 20),
+        touch(family_file.with_name("view1.vti"), 30),
+        touch(family_file.with_name("family_snaps2") / "snapshot1.vti", 40),
+    ]
+    # * Outputs of other models and views of other families are ignored
+    touch(family_file.with_name("family3.out"))
+    touch(family_file.with_name("view2.vti"))
+
+    written = output_archive.family_output_files(family_file, ["view", None])
+
+    assert sorted(written) == sorted(outputs)
+    assert output_archive.files_bytes(written) == 100
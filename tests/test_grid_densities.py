@@ -0,0 +1,72 @@
+import yaml
+import pytest
+
+# * The generator needs the dielectric models of the scenario files
+pytest.importorskip("rflib")
+pytest.importorskip("itur")
+
+import generate_scenario_files as generator
+
+
+CLASSES = [
+    {"fund_freq": 868e6, "soil_name": "clay", "cells_per_wavelength": 6},
+]
+
+
+def write_results(path, **recorded):
+    with open(path, "w") as results_file:
+        yaml.safe_dump(dict(recorded, classes=CLASSES), results_file)
+
+
+def test_load_grid_densities_matching_study(tmp_path):
+    path = tmp_path / "grid_convergence.yml"
+    write_results(
+        path, model="straight_pipe", grid_spacing_mode="waveform"
+    )
+
+    assert generator.load_grid_densities(
+        str(path), "straight_pipe", "waveform"
+    ) == {(868e6, "clay"): 6}
+
+
+def test_load_grid_densities_ignores_other_mode(tmp_path):
+    path = tmp_path / "grid_convergence.yml"
+    write_results(
+        path, model="straight_pipe", grid_spacing_mode="harmonic"
+    )
+
+    with pytest.warns(UserWarning, match="harmonic grid spacing mode"):
+        assert generator.load_grid_densities(
+            str(path), "straight_pipe", "waveform"
+        ) == {}
+
+
+def test_load_grid_densities_ignores_other_model(tmp_path):
+    path = tmp_path / "grid_convergence.yml"
+    write_results(
+        path, model="straight_pipe", grid_spacing_mode="harmonic"
+    )
+
+    with pytest.warns(UserWarning, match="straight_pipe model"):
+        assert generator.load_grid_densities(
+            str(path), "pipe_to_above_ground", "harmonic"
+        ) == {}
+
+
+def test_load_grid_densities_older_studies_are_harmonic(tmp_path):
+    path = tmp_path / "grid_convergence.yml"
+    write_results(path, tolerance_db=0.5)
+
+    assert generator.load_grid_densities(
+        str(path), "straight_pipe", "harmonic"
+    ) == {(868e6, "clay"): 6}
+    with pytest.warns(UserWarning):
+        assert generator.load_grid_densities(
+            str(path), "straight_pipe", "waveform"
+        ) == {}
+
+
+def test_load_grid_densities_missing_file(tmp_path):
+    assert generator.load_grid_densities(
+        str(tmp_path / "missing.yml"), "straight_pipe", "harmonic"
+    ) == {}
@@ -0,0 +1,60 @@
+import pytest
+
+import grid_spacing
+
+
+@pytest.mark.parametrize(
+    "dimensions, cells_per_wavelength", [(2, 12.96), (3, 14.92)]
+)
+def test_dispersion_cells_per_wavelength(dimensions, cells_per_wavelength):
+    assert grid_spacing.dispersion_cells_per_wavelength(
+        0.005, dimensions
+    ) == pytest.approx(cells_per_wavelength)
+
+    # * The result is the coarsest grid which still meets the target
+    assert grid_spacing.yee_phase_velocity_error(
+        cells_per_wavelength, dimensions
+    ) <= 0.005
+    assert grid_spacing.yee_phase_velocity_error(
+        cells_per_wavelength - 0.01, dimensions
+    ) > 0.005
+
+
+def test_yee_phase_velocity_error():
+    # * The error falls roughly with the square of the cells per wavelength
+    coarse = grid_spacing.yee_phase_velocity_error(10, 2)
+    fine = grid_spacing.yee_phase_velocity_error(20, 2)
+    assert 0 < fine < coarse
+    assert coarse / fine == pytest.approx(4, rel=0.05)
+
+    # * At the Courant limit the error grows with the number of dimensions
+    assert grid_spacing.yee_phase_velocity_error(10, 3) > coarse
+
+    # * Below about two cells per wavelength waves no longer propagate
+    assert grid_spacing.yee_phase_velocity_error(2, 2) == float("inf")
+
+
+def test_round_down_spacing():
+    assert grid_spacing.round_down_spacing(0.0123456) == 0.012
+    assert grid_spacing.round_down_spacing(0.00999) == 0.0099
+    assert grid_spacing.round_down_spacing(0.003) <= 0.003
+
+
+def test_waveform_max_frequency():
+    assert grid_spacing.waveform_max_frequency("contsine", 1e9) == 1.25e9
+    assert grid_spacing.waveform_max_frequency("ricker", 1e9) == 3e9
+    assert grid_spacing.waveform_max_frequency("sine", 1e9, 5) == 5e9
+
+
+def test_waveform_delta_d_matches_harmonic_for_unknown_waveforms():
+    assert grid_spacing.waveform_delta_d(
+        2.45e9, 20.0, "sine", 10, max_harmonic=5
+    ) == grid_spacing.harmonic_delta_d(2.45e9, 20.0, 5, 10)
+
+    # * A continuous sine only needs its own wavelength resolved, i.e. a grid
+    # * about 5 / 1.25 * 10 / 12.96 times coarser than its fifth harmonic
+    assert grid_spacing.waveform_delta_d(
+        2.45e9, 20.0, "contsine", 12.96
+    ) / grid_spacing.harmonic_delta_d(2.45e9, 20.0, 5, 10) == pytest.approx(
+        3.09, rel=0.1
+    )
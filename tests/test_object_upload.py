@@ -0,0 +1,85 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+import object_upload
+
+
+BUCKET = "test-bucket"
+
+# * The smallest part size S3 allows
+PART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+    with moto.mock_aws():
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(Bucket=BUCKET)
+        yield s3_client
+
+
+def test_expected_etag_single_part(tmp_path):
+    path = tmp_path / "small.out"
+    path.write_bytes(b"gprMax" * 1000)
+
+    assert object_upload.expected_etag(path, PART_SIZE) == (
+        hashlib.md5(path.read_bytes()).hexdigest()
+    )
+
+
+def test_upload_multipart_matches_etag(client, tmp_path):
+    path = tmp_path / "large.out"
+    path.write_bytes(bytes(range(256)) * (11 * 1024 * 1024 // 256))
+
+    expected = object_upload.expected_etag(path, PART_SIZE)
+    assert expected.endswith("-3")
+
+    uploaded = object_upload.upload_file(
+        client, path, BUCKET, "sweeps/large.out", PART_SIZE, retries=1
+    )
+
+    assert uploaded == path.stat().st_size
+    assert object_upload.stored_etag(
+        client, BUCKET, "sweeps/large.out"
+    ) == expected
+
+
+def test_upload_skips_unchanged(client, tmp_path):
+    path = tmp_path / "scenario.out"
+    path.write_bytes(b"first")
+
+    assert object_upload.upload_file(
+        client, path, BUCKET, "scenario.out", PART_SIZE, retries=1
+    ) == 5
+    assert object_upload.upload_file(
+        client, path, BUCKET, "scenario.out", PART_SIZE, retries=1
+    ) == 0
+
+    # * A changed file is uploaded again
+    path.write_bytes(b"second")
+    assert object_upload.upload_file(
+        client, path, BUCKET, "scenario.out", PART_SIZE, retries=1
+    ) == 6
+    assert client.get_object(
+        Bucket=BUCKET, Key="scenario.out"
+    )["Body"].read() == b"second"
+
+
+def test_stored_etag_missing(client):
+    assert object_upload.stored_etag(client, BUCKET, "missing.out") is None
+
+
+def test_object_key():
+    assert object_upload.object_key(
+        "/sweeps/", Path("scenarios_empty/a.out")
+    ) == "sweeps/scenarios_empty/a.out"
+    assert object_upload.object_key("", Path("a.out")) == "a.out"
@@ -0,0 +1,42 @@
+import h5py
+import numpy as np
+import pytest
+
+import reduce_outputs
+
+
+TRACE = np.sin(np.linspace(0, 40 * np.pi, 2000)) * 1e-3
+
+
+@pytest.mark.parametrize("precision", reduce_outputs.PRECISION_MODES)
+def test_reduce_array_keeps_its_error_bound(precision):
+    stored, attributes = reduce_outputs.reduce_array(TRACE, precision, 16)
+    restored = reduce_outputs.restore_array(stored, attributes)
+
+    assert np.max(np.abs(restored - TRACE)) <= (
+        attributes["error_bound"] + 1e-18
+    )
+
+
+@pytest.mark.parametrize("bits", [8, 16, 32])
+def test_quantised_storage_width(bits):
+    stored, _ = reduce_outputs.reduce_array(TRACE, "quantised", bits)
+
+    assert stored.dtype.itemsize * 8 == bits
+
+
+@pytest.mark.parametrize("bits", [0, 4, 12, 24, 64])
+def test_quantised_rejects_other_widths(bits):
+    with pytest.raises(ValueError):
+        reduce_outputs.reduce_array(TRACE, "quantised", bits)
+
+
+def test_write_rejects_non_finite_errors(tmp_path):
+    values = TRACE.copy()
+    values[10] = np.nan
+
+    with h5py.File(tmp_path / "reduced.h5", "w") as reduced_file:
+        with pytest.raises(ValueError):
+            reduce_outputs._write_reduced_dataset(
+                reduced_file, "Ez", values, "single", 16
+            )
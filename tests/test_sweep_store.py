@@ -0,0 +1,135 @@
+import math
+import logging
+
+import h5py
+import numpy as np
+import pytest
+
+import sweep_store
+
+
+FUND_FREQ = 1e9
+DT = 1e-11
+
+
+def write_output(path, amplitude, iterations):
+    """Writes a minimal gprMax output file with one sine receiver"""
+    times = np.arange(iterations) * DT
+    with h5py.File(path, "w") as output_file:
+        output_file.attrs["Iterations"] = iterations
+        output_file.attrs["dt"] = DT
+        output_file.attrs["dx_dy_dz"] = (1e-3, 1e-3, 1e-3)
+        receiver = output_file.create_group("rxs/rx1")
+        receiver.attrs["Name"] = "rx1"
+        receiver.attrs["Position"] = (0.1, 0.2, 0.0)
+        receiver["Ez"] = amplitude * np.sin(2 * np.pi * FUND_FREQ * times)
+
+
+@pytest.mark.parametrize(
+    "shape, itemsize, target_bytes",
+    [((64, 64, 64), 8, 4096), ((3, 1000), 4, 1024), ((7, 5, 3), 16, 1)],
+)
+def test_chunk_shape_fits_and_is_balanced(shape, itemsize, target_bytes):
+    chunks = sweep_store.chunk_shape(shape, itemsize, target_bytes)
+
+    assert len(chunks) == len(shape)
+    assert all(1 <= chunk <= size for chunk, size in zip(chunks, shape))
+    assert (
+        math.prod(chunks) * itemsize <= target_bytes or max(chunks) == 1
+    )
+
+    # * Axes are halved in turn, so no axis is split much more than another
+    splits = [size / chunk for chunk, size in zip(chunks, shape) if size > 1]
+    assert max(splits) <= 2 * min(splits) + 1
+
+
+def test_chunk_shape_keeps_small_datasets_whole():
+    assert sweep_store.chunk_shape((4, 5), 8, 1 << 20) == (4, 5)
+    assert sweep_store.chunk_shape((0, 3), 8, 1 << 20) == (1, 3)
+
+
+def test_axis_index():
+    assert sweep_store.axis_index([868e6, 2.45e9], 2.4500000001e9) == 1
+    assert sweep_store.axis_index(["sand", "clay"], "clay") == 1
+
+    with pytest.raises(ValueError):
+        sweep_store.axis_index([868e6, 2.45e9], 1e9)
+    with pytest.raises(ValueError):
+        sweep_store.axis_index(["sand", "clay"], 0.1)
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    axes = {
+        "pipe_diameter": [0.1, 0.2],
+        "soil_name": ["sand", "clay"],
+    }
+    plan, sources = {}, {}
+    for diameter_index, diameter in enumerate(axes["pipe_diameter"]):
+        for soil_index, soil_name in enumerate(axes["soil_name"]):
+            name = f"pipe_{diameter}_{soil_name}"
+            plan[name] = {
+                "fund_freq": FUND_FREQ,
+                "parameters": {
+                    "pipe_diameter": diameter, "soil_name": soil_name
+                },
+            }
+
+            # * One scenario has not run, and one has a shorter trace
+            if (diameter, soil_name) == (0.2, "clay"):
+                continue
+            sources[name] = tmp_path / f"{name}.out"
+            write_output(
+                sources[name],
+                amplitude=1 + diameter_index + 2 * soil_index,
+                iterations=500 if soil_index else 1000,
+            )
+
+    path = tmp_path / "store.h5"
+    written = sweep_store.build_store(
+        path, plan, axes, sources, ("Ez",), 10, 4096,
+        logging.getLogger("test_sweep_store")
+    )
+    assert written == 3
+
+    return path
+
+
+def test_select_fixes_axes(store_path):
+    phasors, dims = sweep_store.select(
+        store_path, "phasors", soil_name="sand", component="Ez"
+    )
+
+    assert dims == ["pipe_diameter", "receiver"]
+    assert phasors.shape == (2, 1)
+    np.testing.assert_allclose(np.abs(phasors[:, 0]), [1, 2], rtol=1e-3)
+
+
+def test_select_pads_and_leaves_missing_scenarios_empty(store_path):
+    traces, dims = sweep_store.select(
+        store_path, "traces", pipe_diameter=0.1, receiver=0, component="Ez"
+    )
+
+    assert dims == ["soil_name", "sample"]
+    assert traces.shape == (2, 1000)
+    assert not np.isnan(traces[0]).any()
+    assert np.isnan(traces[1, 500:]).all()
+
+    iterations, _ = sweep_store.select(
+        store_path, "iterations", pipe_diameter=0.2
+    )
+    np.testing.assert_array_equal(iterations, [1000, 0])
+
+    phasor, dims = sweep_store.select(
+        store_path, "phasors", pipe_diameter=0.2, soil_name="clay",
+        receiver=0, component="Ez"
+    )
+    assert dims == []
+    assert np.isnan(phasor)
+
+
+def test_select_rejects_unknown_axes(store_path):
+    with pytest.raises(ValueError):
+        sweep_store.select(store_path, "dt", pipe_length=2.0)
+    with pytest.raises(ValueError):
+        sweep_store.select(store_path, "dt", soil_name="loam")
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import symmetry
+
+
+@pytest.mark.parametrize(
+    "polarisation, boundary", [("x", "pec"), ("y", "pmc"), ("z", "pmc")]
+)
+def test_symmetry_boundary(polarisation, boundary):
+    assert symmetry.symmetry_boundary(polarisation) == boundary
+
+
+def test_mirror_signs_follow_field_parity():
+    # * E is a polar vector, so its normal component flips in the mirror,
+    # * while H is an axial vector, so its tangential components flip
+    pmc = symmetry.MIRROR_SIGNS["pmc"]
+    assert [pmc[c] for c in ("Ex", "Ey", "Ez")] == [-1, 1, 1]
+    assert [pmc[c] for c in ("Hx", "Hy", "Hz")] == [1, -1, -1]
+
+    # * The odd source of a PEC wall is the even source of a PMC one
+    pec = symmetry.MIRROR_SIGNS["pec"]
+    assert pec == {component: -sign for component, sign in pmc.items()}
+
+
+def test_mirror_receivers():
+    receivers = [
+        {"group": "rx1", "name": "a", "position": (0.1, 0.5, 0.0)},
+        {"group": "rx2", "name": "b", "position": (0.2, 0.5, 0.0)},
+        {"group": "rx3", "name": "c", "position": (0.3, 0.5, 0.0)},
+    ]
+    traces = {
+        receiver["group"]: {
+            "Ex": np.full(3, number, dtype=np.float32),
+            "Ez": np.full(3, number, dtype=np.float32),
+        }
+        for number, receiver in enumerate(receivers, start=1)
+    }
+
+    full_receivers, full_traces = symmetry.mirror_receivers(
+        receivers, traces, 0.3, "pmc"
+    )
+
+    # * The receiver on the plane is not mirrored, and the images are
+    # * numbered on from the last group in order of increasing x
+    assert [receiver["group"] for receiver in full_receivers] == [
+        "rx1", "rx2", "rx3", "rx4", "rx5"
+    ]
+    assert full_receivers[3]["mirror_of"] == "rx2"
+    assert full_receivers[4]["mirror_of"] == "rx1"
+    assert full_receivers[3]["position"] == pytest.approx((0.4, 0.5, 0.0))
+    assert full_receivers[4]["position"] == pytest.approx((0.5, 0.5, 0.0))
+
+    np.testing.assert_array_equal(full_traces["rx4"]["Ex"], -2.0)
+    np.testing.assert_array_equal(full_traces["rx4"]["Ez"], 2.0)
+    np.testing.assert_array_equal(full_traces["rx5"]["Ex"], -1.0)
+
+    # * The inputs are left as they were
+    assert len(receivers) == 3
+    assert set(traces) == {"rx1", "rx2", "rx3"}
+
+
+def test_mirror_snapshot_drops_wall_and_mirrors():
+    # * Three model cells, then one wall cell beyond the plane
+    e_field = np.arange(4 * 3, dtype=np.float32).reshape(1, 1, 4, 3) + 1
+    material = np.arange(4, dtype=np.float32).reshape(1, 1, 4, 1)
+    image_info = {
+        "Origin": (0.0, 0.0, 0.0),
+        "Spacing": (0.1, 0.1, 0.1),
+        "WholeExtent": [0, 4, 0, 1, 0, 1],
+    }
+
+    full_info, full_arrays = symmetry.mirror_snapshot(
+        image_info, {"E-field": e_field, "Material": material}, 0.3, "pec"
+    )
+
+    assert full_info["WholeExtent"] == [0, 6, 0, 1, 0, 1]
+    assert image_info["WholeExtent"] == [0, 4, 0, 1, 0, 1]
+
+    full_e = full_arrays["E-field"]
+    assert full_e.shape == (1, 1, 6, 3)
+    np.testing.assert_array_equal(full_e[:, :, :3], e_field[:, :, :3])
+    np.testing.assert_array_equal(
+        full_e[:, :, 3:], e_field[:, :, 2::-1] * np.array([1, -1, -1])
+    )
+
+    np.testing.assert_array_equal(
+        full_arrays["Material"].ravel(), [0, 1, 2, 2, 1, 0]
+    )
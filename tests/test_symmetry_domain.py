@@ -0,0 +1,60 @@
+import pytest
+
+# * The generator needs the dielectric models of the scenario files
+pytest.importorskip("rflib")
+pytest.importorskip("itur")
+
+import generate_scenario_files as generator
+
+
+PARAMS = (868.0e6, 100.0e-3, 0.5, "loam", 0.1)
+
+
+def half_model(monkeypatch, polarisation):
+    monkeypatch.setattr(generator, "dipole_polarisation", polarisation)
+    return generator.above_ground_sim_params(
+        PARAMS, geometry_mode="2D", soil_depth=0.25, air_depth=0.25,
+        symmetric=True,
+    )
+
+
+def wall_box(sim_params):
+    rendered = generator.render_scenario(sim_params, "native")
+    boxes = [
+        line.split() for line in rendered.splitlines()
+        if line.startswith("#box:")
+    ]
+    return boxes[-1]
+
+
+@pytest.mark.parametrize(
+    "polarisation, material", [("z", "pmc_wall"), ("x", "pec")]
+)
+def test_wall_starts_past_the_plane(monkeypatch, polarisation, material):
+    sim_params = half_model(monkeypatch, polarisation)
+    plane_x = sim_params["symmetry"]["plane_x"]
+    delta_d = sim_params["delta_d"]
+
+    box = wall_box(sim_params)
+    assert box[-2] == material
+    assert float(box[1]) == pytest.approx(plane_x + delta_d)
+    assert float(box[4]) == pytest.approx(sim_params["domain_x"])
+    assert sim_params["domain_x"] == pytest.approx(
+        plane_x + (1 + generator.symmetry_wall_cells) * delta_d
+    )
+
+
+def test_half_model_keeps_the_receivers_up_to_the_plane(monkeypatch):
+    full = generator.above_ground_sim_params(
+        PARAMS, geometry_mode="2D", soil_depth=0.25, air_depth=0.25,
+        symmetric=False,
+    )
+    half = half_model(monkeypatch, "z")
+    plane_x = half["symmetry"]["plane_x"]
+
+    assert full["symmetry"] is None
+    assert [receiver["x"] for receiver in half["receivers"]] == [
+        receiver["x"] for receiver in full["receivers"]
+        if receiver["x"] <= plane_x + half["delta_d"] / 2
+    ]
+    assert half["receivers"][-1]["x"] == pytest.approx(plane_x)